@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,14 +46,19 @@ INSTALLED_APPS = [
     "inventory",
     "customers",
     "sales",
+    "reports",
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its latency covers every other middleware too.
+    "core.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Routes @replica_reads views to the replica; needs the session.
+    "core.replica.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -80,13 +86,58 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Run on every new SQLite connection. WAL lets readers and the writer work at
+# the same time; synchronous=NORMAL is safe with WAL (a power cut can lose the
+# last commits, never corrupt the file); busy_timeout makes a second writer wait
+# for the lock instead of failing with "database is locked". mmap_size is bytes,
+# a negative cache_size is KiB per connection.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32 * 1024,
+    "temp_store": "memory",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep each worker's connection (and its page cache and mmap) between
+        # requests instead of reopening the file every time.
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            # Transactions take the write lock at BEGIN, so concurrent checkouts queue
+            # on busy_timeout; with the default (DEFERRED) a transaction that read
+            # first fails outright when it can't upgrade to a write.
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Optional read replica for the report and list pages (see core.replica): a
+# copy of the database refreshed with `manage.py refresh_replica --every 30`.
+# Off unless DB_REPLICA_NAME is set. When the copy is older than
+# REPLICA_MAX_LAG_SECONDS (the refresh stopped), reads go back to the primary.
+DB_REPLICA_NAME = os.environ.get("DB_REPLICA_NAME", "")
+if DB_REPLICA_NAME:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": DB_REPLICA_NAME,
+        "OPTIONS": {
+            "init_command": ";".join(
+                [f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items() if name != "journal_mode"]
+                + ["PRAGMA query_only=1"]
+            ),
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+REPLICA_MAX_LAG_SECONDS = 120
+DATABASE_ROUTERS = ["core.replica.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -130,4 +181,45 @@ TEMPLATES[0]["DIRS"] = [BASE_DIR / "templates"]
 
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
-LOGOUT_REDIRECT_URL = "/accounts/login/"
\ No newline at end of file
+LOGOUT_REDIRECT_URL = "/accounts/login/"
+
+# Upper bound (seconds) on how stale a cached dashboard metric can be.
+# Writes invalidate the affected metrics right away; this covers the rest.
+DASHBOARD_CACHE_SECONDS = 60
+
+# Upper bound (seconds) on cached report results; sale/payment writes already
+# move reports onto fresh cache keys, this covers e.g. cost price edits.
+REPORTS_CACHE_SECONDS = 60 * 15
+
+# core.SiteSettings (default low-stock threshold, dashboard windows) is cached
+# per process this long; the process that saves it drops its copy right away.
+SITE_SETTINGS_CACHE_SECONDS = 60
+
+# Threads (each with its own DB connection) that async views like the
+# dashboard use to run independent queries at once; 1 runs them one by one.
+# Overlap needs spare cores (SQLite releases the GIL while it works), so the
+# default follows the CPU count; on one core the threads only add overhead.
+PARALLEL_QUERY_THREADS = int(os.environ.get("PARALLEL_QUERY_THREADS", min(4, os.cpu_count() or 1)))
+
+# Months of detailed stock movements kept in the hot ledger; older ones are
+# archived and replaced by opening balances by `manage.py compact_stock_ledger`.
+STOCK_LEDGER_RETENTION_MONTHS = 24
+
+# /metrics (Prometheus text format). With a token, send "Authorization: Bearer
+# <token>"; without one only logged-in managers can read it. Scrapers on
+# 127.0.0.1/::1 get in without either only if METRICS_ALLOW_LOCALHOST is on:
+# behind a reverse proxy on the same host every request comes from there.
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOW_LOCALHOST = os.environ.get("METRICS_ALLOW_LOCALHOST", "") == "1"
+
+# Background jobs (core.jobs), run by `manage.py run_jobs`. Cache invalidations
+# done by a job only reach the web processes through a shared CACHES backend;
+# with the default per-process cache, pages catch up within the cache timeouts above.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_WORKER_MODE = os.environ.get("JOB_WORKER_MODE", "threads")  # or "processes"
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF_SECONDS = 30  # doubled after every failed attempt
+JOB_STALE_SECONDS = 60 * 60  # a RUNNING job older than this lost its worker; keep above the slowest task
+JOB_KEEP_DAYS = 30
+JOB_FILES_DIR = BASE_DIR / "job_files"
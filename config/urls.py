@@ -24,5 +24,6 @@ urlpatterns = [
     path("sales/", include("sales.urls", namespace="sales")),
     path("inventory/", include("inventory.urls", namespace="inventory")),
     path("customers/", include("customers.urls", namespace="customers")),
+    path("reports/", include("reports.urls", namespace="reports")),
     path("accounts/", include("django.contrib.auth.urls")),
 ]
@@ -1,3 +1,24 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import Job, SiteSettings
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "priority", "attempts", "max_attempts", "created_at", "finished_at", "worker")
+    list_filter = ("status", "name")
+    search_fields = ("name", "error")
+    readonly_fields = ("started_at", "finished_at", "worker", "result", "error", "created_by")
+
+
+@admin.register(SiteSettings)
+class SiteSettingsAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "default_low_stock_threshold", "best_sellers_days", "best_customers_days", "updated_at")
+
+    def has_add_permission(self, request):
+        # One row; the first save creates it.
+        return not SiteSettings.objects.exists()
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        # Each app's tasks.py registers its background tasks (core.jobs).
+        autodiscover_modules("tasks")
@@ -0,0 +1,559 @@
+"""
+Timings for the main views and services at the current data size.
+
+Each target is run `warmup` times, then `iterations` times under
+CaptureQueriesContext, and reported as wall-clock percentiles plus query
+counts. Views go through the test Client as a logged-in manager, so
+middleware, templates and the cache are all included. The checkout POST runs
+inside a transaction that is rolled back, so the data doesn't drift between
+runs.
+
+`concurrency()` is the other half: reader and writer threads hammering copies
+of the database under each connection profile (stock Django SQLite vs. the
+configured one), reporting throughput, latency and "database is locked" errors.
+
+`asgi_latency()` serves the app with uvicorn and times the async pages
+(dashboard with its cache off, customer_detail) with different
+PARALLEL_QUERY_THREADS, i.e. queries one after another vs. at the same time.
+"""
+import http.client
+import importlib.util
+import math
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.dashboard import INVALIDATES, METRICS, invalidate_dashboard
+from core.replica import copy_database
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class BenchmarkError(RuntimeError):
+    """A target didn't respond the way it should (so its timing means nothing)."""
+
+
+def percentile(values: list, p: float) -> float:
+    """Linear interpolation between closest ranks; `values` must be sorted."""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def measure(fn, iterations: int = 20, warmup: int = 2, setup=None) -> dict:
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    times, queries = [], []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - started) * 1000)
+        queries.append(len(ctx.captured_queries))
+
+    times.sort()
+    return {
+        "iterations": iterations,
+        "ms": {
+            "mean": round(sum(times) / len(times), 3),
+            "min": round(times[0], 3),
+            **{f"p{p}": round(percentile(times, p), 3) for p in PERCENTILES},
+            "max": round(times[-1], 3),
+        },
+        "queries": {"min": min(queries), "max": max(queries), "mean": round(sum(queries) / len(queries), 2)},
+    }
+
+
+def _host() -> str:
+    # The Client's default "testserver" isn't in ALLOWED_HOSTS outside the test runner.
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != "*" and not host.startswith("."):
+            return host
+    return "localhost"
+
+
+def _get(client, url, expected=200):
+    def run():
+        response = client.get(url)
+        if response.status_code != expected:
+            raise BenchmarkError(f"GET {url} returned {response.status_code}")
+        if getattr(response, "streaming", False):
+            for _ in response.streaming_content:
+                pass
+    return run
+
+
+def _checkout(client, url, payload):
+    def run():
+        with transaction.atomic():
+            response = client.post(url, payload)
+            if response.status_code != 302:
+                raise BenchmarkError(f"POST {url} returned {response.status_code} (no sale was created)")
+            transaction.set_rollback(True)
+    return run
+
+
+def _checkout_payload(lines: int = 3) -> dict | None:
+    from inventory.models import Item
+
+    items = list(
+        Item.objects.filter(is_active=True, stock_balance__quantity__gte=5)
+        .order_by("-stock_balance__quantity")
+        .values_list("id", flat=True)[:lines]
+    )
+    if not items:
+        return None
+    payload = {
+        "customer": "",
+        "notes": "benchmark",
+        "items-TOTAL_FORMS": str(len(items)),
+        "items-INITIAL_FORMS": "0",
+        "items-MIN_NUM_FORMS": "0",
+        "items-MAX_NUM_FORMS": "1000",
+    }
+    for n, item_id in enumerate(items):
+        payload.update({f"items-{n}-item": str(item_id), f"items-{n}-quantity": "1", f"items-{n}-unit_price": ""})
+    return payload
+
+
+def targets(user) -> dict:
+    """name -> (callable, setup or None). Views first, then services."""
+    from core.search import ranked_search
+    from customers.models import Customer
+    from inventory.models import Item
+    from inventory.services import catalog_price_map, stock_as_of
+    from reports.services import build_report
+
+    client = Client(HTTP_HOST=_host())
+    client.force_login(user)
+
+    def cold_dashboard():
+        # Outside a transaction on_commit runs right away, so every metric is recomputed.
+        invalidate_dashboard(*INVALIDATES)
+
+    found = {
+        "view:dashboard": (_get(client, reverse("dashboard")), None),
+        "view:dashboard (cold cache)": (_get(client, reverse("dashboard")), cold_dashboard),
+        "view:items_list": (_get(client, reverse("inventory:items")), None),
+        "view:items_list ?q=": (_get(client, reverse("inventory:items") + "?q=cla"), None),
+        "view:low_stock": (_get(client, reverse("inventory:low_stock")), None),
+        "view:sales_list": (_get(client, reverse("sales:list")), None),
+        "view:debts_view": (_get(client, reverse("sales:debts")), None),
+        "view:customers_list": (_get(client, reverse("customers:list")), None),
+        "view:sale_create GET": (_get(client, reverse("sales:create")), None),
+        "view:price_map": (_get(client, reverse("inventory:price_map")), None),
+    }
+
+    busiest = (
+        Customer.objects.annotate(n=Count("sales")).order_by("-n").values_list("pk", flat=True).first()
+    )
+    if busiest:
+        found["view:customer_detail"] = (_get(client, reverse("customers:detail", args=[busiest])), None)
+
+    payload = _checkout_payload()
+    if payload:
+        found["view:sale_create POST"] = (_checkout(client, reverse("sales:create"), payload), None)
+
+    end = timezone.now()
+    for name, fn in METRICS.items():
+        found[f"service:dashboard.{name}"] = (fn, None)
+    found["service:build_report 30d/day"] = (lambda: build_report(end - timedelta(days=30), end, "day", "none"), None)
+    found["service:build_report 365d/month by item"] = (
+        lambda: build_report(end - timedelta(days=365), end, "month", "item"), None,
+    )
+    found["service:stock_as_of 30d ago"] = (lambda: stock_as_of(timezone.localdate() - timedelta(days=30)), None)
+    found["service:catalog_price_map"] = (catalog_price_map, None)
+    found["service:ranked_search items"] = (
+        lambda: ranked_search(Item.objects.all(), "cla", "inventory_item_fts", ["name", "sku"], 10), None,
+    )
+    return found
+
+
+def data_size() -> dict:
+    from customers.models import Customer
+    from inventory.models import Item, StockMovement
+    from sales.models import Payment, Sale, SaleItem
+
+    return {
+        model._meta.label: model.objects.count()
+        for model in (Item, Customer, Sale, SaleItem, Payment, StockMovement)
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run(user, iterations: int = 20, warmup: int = 2, only=None, log=None) -> dict:
+    """
+    Runs every target (or those whose name contains one of `only`) and
+    returns a JSON-ready dict: environment, data size and per-target results.
+    """
+    log = log or (lambda name, result: None)
+    results = {}
+    for name, (fn, setup) in targets(user).items():
+        if only and not any(part in name for part in only):
+            continue
+        results[name] = measure(fn, iterations=iterations, warmup=warmup, setup=setup)
+        log(name, results[name])
+
+    return {
+        "started_at": timezone.now().isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": {"vendor": connection.vendor, "name": str(connection.settings_dict["NAME"])},
+        "iterations": iterations,
+        "warmup": warmup,
+        "data": data_size(),
+        "results": results,
+    }
+
+
+def compare(current: dict, previous: dict) -> list[tuple]:
+    """(name, p50 before, p50 now, change %, queries before, queries now) for targets in both runs."""
+    rows = []
+    for name, now in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        old, new = before["ms"]["p50"], now["ms"]["p50"]
+        change = ((new - old) / old * 100) if old else 0.0
+        rows.append((name, old, new, change, before["queries"]["max"], now["queries"]["max"]))
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Concurrency: reader and writer threads on one SQLite file
+# ---------------------------------------------------------------------------
+
+def sqlite_profiles() -> dict:
+    """
+    name -> (journal mode, connection settings). "django-default" is what a
+    stock settings.py gets: rollback journal, deferred transactions and a new
+    connection per request. "configured" is DATABASES["default"] as set up.
+    """
+    configured = settings.DATABASES["default"]
+    mode = getattr(settings, "SQLITE_PRAGMAS", {}).get("journal_mode", "delete")
+    return {
+        "django-default": ("delete", {"OPTIONS": {}, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}),
+        "configured": (mode, {
+            "OPTIONS": configured.get("OPTIONS", {}),
+            "CONN_MAX_AGE": configured.get("CONN_MAX_AGE", 0),
+            "CONN_HEALTH_CHECKS": configured.get("CONN_HEALTH_CHECKS", False),
+        }),
+    }
+
+
+@contextmanager
+def _default_database(overrides):
+    """Points the default alias at other settings for connections opened inside the block."""
+    connection.close()
+    del connections["default"]
+    original = connections.settings["default"]
+    connections.settings["default"] = {**original, **overrides}
+    try:
+        yield
+    finally:
+        connection.close()
+        del connections["default"]
+        connections.settings["default"] = original
+
+
+def _summary(times, seconds, **extra) -> dict:
+    times.sort()
+    return {
+        "ops": len(times),
+        "per_second": round(len(times) / seconds, 1),
+        "ms": {
+            **{f"p{p}": round(percentile(times, p), 2) for p in PERCENTILES},
+            "max": round(times[-1], 2) if times else 0.0,
+        },
+        **extra,
+    }
+
+
+def _workload(readers, writers, seconds, item_ids, hot_item=False):
+    from core.dashboard import METRICS
+    from inventory.models import Item, StockBalance
+    from inventory.services import InsufficientStock
+    from sales.models import Sale, SaleItem
+    from sales.services import create_sale
+
+    reads = [
+        *METRICS.values(),
+        lambda: list(Item.objects.select_related("category", "stock_balance").order_by("name")[:50]),
+    ]
+    state = {
+        "read": [], "write": [], "hot": [], "read_errors": 0, "write_errors": 0, "hot_errors": 0,
+        "rejected": 0, "hot_rejected": 0, "messages": set(),
+    }
+    # hot_item: half the writers sell one unit of item_ids[0] per checkout (the
+    # last-unit race), the rest sell the other items.
+    hot, others = (item_ids[:1], item_ids[1:] or item_ids) if hot_item else ([], item_ids)
+    lock = threading.Lock()
+    start = threading.Barrier(readers + writers + 1)
+
+    def worker(kind, seed):
+        rng = random.Random(seed)
+        times, errors, rejected = [], 0, 0
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        try:
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                try:
+                    if kind == "read":
+                        rng.choice(reads)()
+                    else:
+                        pool = hot if kind == "hot" else others
+                        k = 1 if kind == "hot" else min(len(pool), rng.randint(1, 3))
+                        lines = [
+                            SaleItem(item_id=pk, quantity=1, unit_price=price) for pk, price in rng.sample(pool, k=k)
+                        ]
+                        create_sale(Sale(notes="concurrency benchmark"), lines)
+                    times.append((time.perf_counter() - began) * 1000)
+                except InsufficientStock:
+                    rejected += 1
+                except OperationalError as e:
+                    errors += 1
+                    with lock:
+                        state["messages"].add(str(e))
+                # What the end of a request does: close unless CONN_MAX_AGE keeps it.
+                close_old_connections()
+        finally:
+            connection.close()
+        with lock:
+            state[kind].extend(times)
+            state[f"{kind}_errors"] += errors
+            state["hot_rejected" if kind == "hot" else "rejected"] += rejected
+
+    threads = [threading.Thread(target=worker, args=("read", n)) for n in range(readers)]
+    threads += [
+        threading.Thread(target=worker, args=("hot" if hot and n % 2 == 0 else "write", 1000 + n))
+        for n in range(writers)
+    ]
+    for t in threads:
+        t.start()
+    start.wait()
+    for t in threads:
+        t.join()
+
+    result = {
+        "reads": _summary(state["read"], seconds, errors=state["read_errors"]),
+        "writes": _summary(state["write"], seconds, errors=state["write_errors"], rejected=state["rejected"]),
+        "error_messages": sorted(state["messages"]),
+    }
+    if hot:
+        result["hot_writes"] = _summary(
+            state["hot"], seconds, errors=state["hot_errors"], rejected=state["hot_rejected"],
+            oversold=StockBalance.objects.filter(item_id=hot[0][0], quantity__lt=0).exists(),
+        )
+    return result
+
+
+def concurrency(readers: int = 4, writers: int = 4, seconds: float = 10, profiles=None, log=None,
+                hot_item: bool = False) -> dict:
+    """
+    Runs the same mixed workload (readers computing dashboard metrics and item
+    pages, writers checking out 1-3 line sales) once per connection profile,
+    each against a fresh copy of the current SQLite database, so the real
+    database is never written. hot_item=True points half the writers at a
+    single item (stock reservation under contention; reported as hot_writes,
+    with whether it went below zero). Returns a JSON-ready dict.
+    """
+    from inventory.models import Item
+
+    if connection.vendor != "sqlite":
+        raise BenchmarkError("The concurrency benchmark compares SQLite connection profiles.")
+    log = log or (lambda name, result: None)
+    available = sqlite_profiles()
+    unknown = set(profiles or ()) - set(available)
+    if unknown:
+        raise BenchmarkError(f"Unknown profile(s): {', '.join(sorted(unknown))}")
+
+    item_ids = list(
+        Item.objects.filter(is_active=True, stock_balance__quantity__gte=100).values_list("id", "sell_price")[:200]
+    )
+    if not item_ids:
+        raise BenchmarkError("No active items with 100+ in stock to sell; seed some data first (seed_data).")
+    source = str(connection.settings_dict["NAME"])
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=Path(source).parent) as tmp:
+        for name, (journal_mode, overrides) in available.items():
+            if profiles and name not in profiles:
+                continue
+            copy = str(Path(tmp) / f"{name}.sqlite3")
+            copy_database(source, copy, journal_mode)
+            with _default_database({**overrides, "NAME": copy}):
+                results[name] = {
+                    "journal_mode": journal_mode,
+                    "conn_max_age": overrides["CONN_MAX_AGE"],
+                    "options": overrides["OPTIONS"],
+                    **_workload(readers, writers, seconds, item_ids, hot_item),
+                }
+            log(name, results[name])
+
+    return {
+        "started_at": timezone.now().isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "readers": readers,
+        "writers": writers,
+        "seconds": seconds,
+        "hot_item": item_ids[0][0] if hot_item else None,
+        "data": data_size(),
+        "results": results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# ASGI: the async views under uvicorn
+# ---------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(settings_dir, threads, port):
+    # A settings module on top of the current one: dashboard cache off, so every
+    # request computes every card, and the thread count under test.
+    name = f"asgibench_{threads}"
+    Path(settings_dir, f"{name}.py").write_text(
+        f"from {settings.SETTINGS_MODULE} import *  # noqa\n"
+        f"DASHBOARD_CACHE_SECONDS = 0\n"
+        f"PARALLEL_QUERY_THREADS = {threads}\n"
+        f"ALLOWED_HOSTS = ['127.0.0.1']\n"
+    )
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": name,
+        "PYTHONPATH": os.pathsep.join([settings_dir, str(settings.BASE_DIR), os.environ.get("PYTHONPATH", "")]),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "config.asgi:application", "--port", str(port), "--log-level", "warning"],
+        cwd=settings.BASE_DIR, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise BenchmarkError(f"uvicorn exited with {server.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise BenchmarkError("uvicorn didn't start within 30s")
+
+
+def _timed_gets(port, path, cookie, iterations, warmup) -> dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    times = []
+    try:
+        for n in range(warmup + iterations):
+            started = time.perf_counter()
+            conn.request("GET", path, headers={"Cookie": cookie})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise BenchmarkError(f"GET {path} returned {response.status}")
+            if n >= warmup:
+                times.append((time.perf_counter() - started) * 1000)
+    finally:
+        conn.close()
+    times.sort()
+    return {
+        "iterations": iterations,
+        "ms": {
+            "mean": round(sum(times) / len(times), 3),
+            "min": round(times[0], 3),
+            **{f"p{p}": round(percentile(times, p), 3) for p in PERCENTILES},
+            "max": round(times[-1], 3),
+        },
+    }
+
+
+def asgi_latency(user, thread_counts=(1, 4), iterations: int = 30, warmup: int = 3, log=None) -> dict:
+    """
+    {threads: {page: timings}} for the async pages served by uvicorn, one
+    server per PARALLEL_QUERY_THREADS value (1 = queries one after another).
+    Requests are sequential, so the numbers are per-page latency.
+    """
+    from customers.models import Customer
+
+    if importlib.util.find_spec("uvicorn") is None:
+        raise BenchmarkError("uvicorn isn't installed (pip install uvicorn).")
+    log = log or (lambda threads, page, result: None)
+
+    client = Client(HTTP_HOST=_host())
+    client.force_login(user)
+    cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    pages = {"dashboard (no cache)": reverse("dashboard")}
+    busiest = Customer.objects.annotate(n=Count("sales")).order_by("-n").values_list("pk", flat=True).first()
+    if busiest:
+        pages["customer_detail"] = reverse("customers:detail", args=[busiest])
+
+    results = {}
+    with tempfile.TemporaryDirectory() as settings_dir:
+        for threads in thread_counts:
+            port = _free_port()
+            server = _serve(settings_dir, threads, port)
+            try:
+                results[threads] = {}
+                for page, path in pages.items():
+                    results[threads][page] = _timed_gets(port, path, cookie, iterations, warmup)
+                    log(threads, page, results[threads][page])
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+
+    return {
+        "started_at": timezone.now().isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "server": "uvicorn",
+        "iterations": iterations,
+        "warmup": warmup,
+        "data": data_size(),
+        "results": {str(threads): pages for threads, pages in results.items()},
+    }
@@ -0,0 +1,199 @@
+"""
+Dashboard metrics, each cached on its own in Django's cache.
+
+Writers call invalidate_dashboard(<event>) from the same places that keep the
+denormalized tables in sync (Sale/Payment/Item saves, apply_stock_deltas), and
+only the metrics that event can change are dropped, after commit.
+DASHBOARD_CACHE_SECONDS bounds how stale anything can get regardless (sliding
+windows like "last 30 days", writes that bypass the hooks).
+"""
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.parallel import gather_queries
+from core.replica import primary_reads, replica_has
+
+
+# Which metrics each kind of write can change.
+INVALIDATES = {
+    "sale": ("sales_today", "outstanding_debt", "best_sellers", "best_customers"),
+    "payment": ("outstanding_debt", "best_customers"),
+    "stock": ("low_stock_count",),
+    "item": ("low_stock_count", "best_sellers"),
+    "customer": ("best_customers",),
+    "settings": ("low_stock_count", "best_sellers", "best_customers"),
+}
+
+_HITS_KEY = "dashboard:stats:hits"
+_MISSES_KEY = "dashboard:stats:misses"
+# When the last invalidation ran; a replica copy older than that can't refill the cache.
+_INVALIDATED_AT_KEY = "dashboard:invalidated_at"
+
+
+def staleness_bound() -> int:
+    return getattr(settings, "DASHBOARD_CACHE_SECONDS", 60)
+
+
+# ---------------------------------------------------------------------------
+# Metrics (plain picklable values)
+# ---------------------------------------------------------------------------
+
+def low_stock_count() -> int:
+    from inventory.models import Item
+
+    # The stored flag (see inventory.services.refresh_low_stock); an index-only count.
+    return Item.objects.filter(is_active=True, is_low=True).count()
+
+
+def sales_today() -> dict:
+    from sales.models import DailySales
+
+    # One indexed row from the daily rollup.
+    row = DailySales.objects.filter(day=timezone.localdate()).values("sale_count", "revenue").first()
+    if row is None:
+        return {"count": 0, "total": Decimal("0.00")}
+    return {"count": row["sale_count"], "total": row["revenue"]}
+
+
+def outstanding_debt() -> Decimal:
+    from sales.models import Sale
+
+    # What the debts page lists: unpaid/partial sales (status index) less the
+    # stored paid_amount, so no Payment aggregate and no scan of paid sales.
+    owed = Sale.objects.exclude(status=Sale.Status.PAID).aggregate(s=Sum(F("total") - F("paid_amount")))["s"]
+    return owed or Decimal("0.00")
+
+
+def best_sellers() -> list:
+    from core.site_settings import get_site_settings
+    from sales.models import DailyItemSales
+
+    # Last N local days (today included), summed from the per-item daily rollup.
+    start = timezone.localdate() - timedelta(days=get_site_settings().best_sellers_days - 1)
+    return list(
+        DailyItemSales.objects
+        .filter(day__gte=start)
+        .values("item__id", "item__name", "item__sku")
+        .annotate(qty=Sum("units"), revenue=Sum("revenue"))
+        .filter(qty__gt=0)
+        .order_by("-qty")[:10]
+    )
+
+
+def best_customers() -> list:
+    from core.site_settings import get_site_settings
+    from customers.models import CustomerAccount
+
+    # Bought in the last N days, ranked by lifetime spend
+    start = timezone.now() - timedelta(days=get_site_settings().best_customers_days)
+    return list(
+        CustomerAccount.objects.filter(last_sale_at__gte=start, customer__is_active=True)
+        .select_related("customer")
+        .order_by("-lifetime_spent")[:10]
+    )
+
+
+METRICS = {
+    "low_stock_count": low_stock_count,
+    "sales_today": sales_today,
+    "outstanding_debt": outstanding_debt,
+    "best_sellers": best_sellers,
+    "best_customers": best_customers,
+}
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def _key(name) -> str:
+    # The local date is part of the key so "today" rolls over at midnight.
+    return f"dashboard:{name}:{timezone.localdate().isoformat()}"
+
+
+def _incr(key, n):
+    if not n:
+        return
+    try:
+        cache.incr(key, n)
+    except ValueError:
+        if not cache.add(key, n, None):
+            cache.incr(key, n)
+
+
+def _lookup(names):
+    # One get_many for the lot (plus the last invalidation time, see core.replica).
+    keys = {name: _key(name) for name in names}
+    cached = cache.get_many([*keys.values(), _INVALIDATED_AT_KEY])
+    values = {name: cached[key] for name, key in keys.items() if key in cached}
+    missing = [name for name in names if name not in values]
+    return keys, values, missing, replica_has(cached.get(_INVALIDATED_AT_KEY))
+
+
+def _store(names, keys, values, fresh):
+    if fresh:
+        cache.set_many({keys[name]: value for name, value in fresh.items()}, staleness_bound())
+    _incr(_HITS_KEY, len(names) - len(fresh))
+    _incr(_MISSES_KEY, len(fresh))
+    values.update(fresh)
+    return values
+
+
+def get_metrics(names=None) -> dict:
+    """
+    {name: value} for the requested metrics (all by default). One get_many
+    for the lot; only the misses are computed and written back.
+    """
+    names = list(names or METRICS)
+    keys, values, missing, replica_ok = _lookup(names)
+    fresh = {}
+    if missing:
+        with nullcontext() if replica_ok else primary_reads():
+            fresh = {name: METRICS[name]() for name in missing}
+    return _store(names, keys, values, fresh)
+
+
+async def aget_metrics(names=None) -> dict:
+    """get_metrics for async views: the misses are computed concurrently (core.parallel)."""
+    names = list(names or METRICS)
+    keys, values, missing, replica_ok = await sync_to_async(_lookup)(names)
+    fresh = {}
+    if missing:
+        with nullcontext() if replica_ok else primary_reads():
+            results = await gather_queries(*(METRICS[name] for name in missing))
+        fresh = dict(zip(missing, results))
+    return await sync_to_async(_store)(names, keys, values, fresh)
+
+
+def invalidate_dashboard(*events):
+    """
+    Drops the metrics the given write events ("sale", "payment", "stock",
+    "item", "customer") can change, once the current transaction commits so
+    a reader can't re-cache pre-commit numbers.
+    """
+    keys = sorted({_key(name) for event in events for name in INVALIDATES[event]})
+
+    def invalidate():
+        cache.delete_many(keys)
+        cache.set(_INVALIDATED_AT_KEY, time.time(), None)
+    transaction.on_commit(invalidate)
+
+
+def cache_stats() -> dict:
+    hits = cache.get(_HITS_KEY, 0)
+    misses = cache.get(_MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": (hits / lookups) if lookups else None,
+    }
@@ -0,0 +1,9 @@
+from django import forms
+
+from .models import SiteSettings
+
+
+class SiteSettingsForm(forms.ModelForm):
+    class Meta:
+        model = SiteSettings
+        fields = ["default_low_stock_threshold", "best_sellers_days", "best_customers_days"]
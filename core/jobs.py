@@ -0,0 +1,288 @@
+"""
+Background jobs on the database, without a broker.
+
+Work that shouldn't run inside a request (rollup rebuilds, big exports,
+ledger compaction, reconciliations) is registered as a task in an app's
+tasks.py:
+
+    @task("sales.rebuild_rollups", label="Rebuild sales rollups", manual=True)
+    def rebuild_rollups(job, start=None, end=None):
+        ...
+        return {"days": days}   # stored as the job's result (JSON)
+
+A view calls enqueue("sales.rebuild_rollups", {...}) and returns; the row
+is committed with the request's transaction, so a rolled-back request never
+leaves a job behind. `manage.py run_jobs` picks jobs up by priority (higher
+first), then age, with threads or processes.
+
+- Claiming is a conditional UPDATE (status QUEUED -> RUNNING), so two workers
+  never run the same job; it works the same on SQLite and Postgres.
+- A task that raises is retried with exponential backoff up to max_attempts;
+  JobError fails it right away (bad arguments, nothing that a retry fixes).
+- A job left RUNNING by a worker that died is queued again after
+  JOB_STALE_SECONDS (so that has to be longer than the slowest task).
+- Files a task produces (exports) go to JOB_FILES_DIR and are served from the
+  job's page; finished jobs and their files are purged after JOB_KEEP_DAYS.
+"""
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .csv_export import csv_chunks
+from .models import Job
+
+
+class JobError(Exception):
+    """Fails the job without retrying."""
+
+
+class Task(NamedTuple):
+    name: str
+    func: Callable
+    label: str
+    manual: bool  # offered on the jobs page (runs without arguments)
+    max_attempts: int | None
+
+
+_tasks: dict[str, Task] = {}
+
+
+def task(name: str, label: str = "", manual: bool = False, max_attempts: int | None = None):
+    """Registers `func(job, **args)` as the task `name`."""
+    def register(func):
+        _tasks[name] = Task(name, func, label or name, manual, max_attempts)
+        return func
+    return register
+
+
+def registered() -> dict[str, Task]:
+    return dict(_tasks)
+
+
+def manual_tasks() -> list[Task]:
+    return sorted((t for t in _tasks.values() if t.manual), key=lambda t: t.label)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_backoff() -> int:
+    return _setting("JOB_RETRY_BACKOFF_SECONDS", 30)
+
+
+def stale_after() -> int:
+    return _setting("JOB_STALE_SECONDS", 60 * 60)
+
+
+def keep_days() -> int:
+    return _setting("JOB_KEEP_DAYS", 30)
+
+
+def files_dir() -> Path:
+    return Path(_setting("JOB_FILES_DIR", settings.BASE_DIR / "job_files"))
+
+
+# ---------------------------------------------------------------------------
+# Queueing
+# ---------------------------------------------------------------------------
+
+def enqueue(name: str, args: dict | None = None, *, priority: int = 0, user=None,
+            delay: float = 0, max_attempts: int | None = None, unique: bool = False) -> Job:
+    """
+    Queues task `name` with JSON-able keyword `args`. unique=True returns the
+    already queued job with the same arguments instead of adding another
+    (a second "rebuild rollups" click shouldn't rebuild twice).
+    """
+    if name not in _tasks:
+        raise ValueError(f"No task is registered as {name!r}.")
+    args = args or {}
+    if unique:
+        for job in Job.objects.filter(name=name, status=Job.Status.QUEUED):
+            if job.args == args:
+                return job
+
+    return Job.objects.create(
+        name=name,
+        args=args,
+        priority=priority,
+        max_attempts=max_attempts or _tasks[name].max_attempts or _setting("JOB_MAX_ATTEMPTS", 3),
+        run_after=timezone.now() + timedelta(seconds=delay),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def cancel(job: Job) -> bool:
+    """Cancels a job that hasn't started. False if it already has."""
+    return bool(
+        Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED)
+        .update(status=Job.Status.CANCELLED, finished_at=timezone.now())
+    )
+
+
+def requeue(job: Job) -> bool:
+    """Runs a failed or cancelled job again, with a fresh set of attempts."""
+    return bool(
+        Job.objects.filter(pk=job.pk, status__in=[Job.Status.FAILED, Job.Status.CANCELLED])
+        .update(
+            status=Job.Status.QUEUED, attempts=0, run_after=timezone.now(),
+            started_at=None, finished_at=None, worker="", result=None, error="",
+        )
+    )
+
+
+def status_counts() -> dict:
+    rows = Job.objects.order_by().values_list("status").annotate(n=Count("id"))
+    counts = {status: 0 for status in Job.Status.values}
+    counts.update(dict(rows))
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Files produced by jobs
+# ---------------------------------------------------------------------------
+
+def write_csv(job: Job, filename: str, header, rows) -> dict:
+    """Writes an export to JOB_FILES_DIR; the dict is meant as the job's result."""
+    directory = files_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stored = f"{job.pk}-{filename}"
+    partial = directory / f"{stored}.part"
+    written = 0
+
+    def counted():
+        nonlocal written
+        for row in rows:
+            written += 1
+            yield row
+
+    with open(partial, "w", newline="", encoding="utf-8") as out:
+        for chunk in csv_chunks(header, counted()):
+            out.write(chunk)
+    partial.replace(directory / stored)  # the download never sees half a file
+    return {"file": stored, "filename": filename, "rows": written}
+
+
+def result_file(job: Job) -> Path | None:
+    stored = (job.result or {}).get("file") if isinstance(job.result, dict) else None
+    if not stored:
+        return None
+    path = files_dir() / Path(stored).name
+    return path if path.is_file() else None
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+def claim_next(worker: str) -> Job | None:
+    """Marks the next ready job RUNNING for `worker` and returns it (None if there's none)."""
+    now = timezone.now()
+    ready = (
+        Job.objects.filter(status=Job.Status.QUEUED, run_after__lte=now)
+        .order_by("-priority", "run_after", "id")
+        .values_list("pk", flat=True)
+    )
+    # Another worker can take a candidate between the SELECT and the UPDATE;
+    # then the UPDATE matches nothing and we try the next one.
+    for pk in ready[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING, worker=worker, started_at=now, finished_at=None,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _finish(job: Job, **fields) -> bool:
+    # Only if it's still ours: a job requeued as stale may be running elsewhere.
+    return bool(
+        Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, worker=job.worker).update(**fields)
+    )
+
+
+def run_job(job: Job, log=None) -> str:
+    """Runs a claimed job and records the outcome. Returns the new status."""
+    log = log or (lambda msg: None)
+    started = time.monotonic()
+    entry = _tasks.get(job.name)
+    try:
+        if entry is None:
+            raise JobError(f"No task is registered as {job.name!r}.")
+        result = entry.func(job, **job.args)
+    except JobError as exc:
+        status, fields = Job.Status.FAILED, {"error": str(exc)}
+    except Exception:
+        if job.attempts < job.max_attempts:
+            delay = retry_backoff() * 2 ** (job.attempts - 1)
+            status = Job.Status.QUEUED
+            fields = {"run_after": timezone.now() + timedelta(seconds=delay), "error": traceback.format_exc()}
+        else:
+            status, fields = Job.Status.FAILED, {"error": traceback.format_exc()}
+    else:
+        status, fields = Job.Status.SUCCEEDED, {"result": result, "error": ""}
+
+    now = timezone.now()
+    _finish(job, status=status, finished_at=None if status == Job.Status.QUEUED else now, **fields)
+    outcome = "retry queued" if status == Job.Status.QUEUED else status.lower()
+    log(f"job #{job.pk} {job.name} (attempt {job.attempts}/{job.max_attempts}): "
+        f"{outcome} in {time.monotonic() - started:.2f}s")
+    return status
+
+
+def recover_stale() -> int:
+    """Queues again (or fails, if out of attempts) jobs whose worker stopped mid-run."""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.Status.RUNNING, started_at__lt=now - timedelta(seconds=stale_after()))
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED, finished_at=now, error="The worker stopped before the job finished.",
+    )
+    requeued = stale.update(
+        status=Job.Status.QUEUED, run_after=now, error="The worker stopped before the job finished; retrying.",
+    )
+    return failed + requeued
+
+
+def purge_finished() -> int:
+    """Deletes finished jobs older than JOB_KEEP_DAYS, and their files."""
+    old = Job.objects.filter(
+        status__in=[Job.Status.SUCCEEDED, Job.Status.FAILED, Job.Status.CANCELLED],
+        finished_at__lt=timezone.now() - timedelta(days=keep_days()),
+    )
+    for job in old.only("pk", "result"):
+        path = result_file(job)
+        if path:
+            path.unlink(missing_ok=True)
+    deleted, _ = old.delete()
+    return deleted
+
+
+def work(worker: str, stop, poll: float = 1.0, once: bool = False, log=None):
+    """
+    One worker's loop: claim, run, repeat, until `stop` (a threading or
+    multiprocessing Event) is set; with once=True also when nothing is ready.
+    """
+    log = log or (lambda msg: None)
+    while not stop.is_set():
+        try:
+            job = claim_next(worker)
+        except OperationalError as exc:  # locked for longer than busy_timeout
+            log(f"{worker}: could not claim a job ({exc}); waiting")
+            job = None
+        if job is None:
+            close_old_connections()
+            if once:
+                return
+            stop.wait(poll)
+            continue
+        run_job(job, log)
+        # What the end of a request does for this thread's connection (CONN_MAX_AGE).
+        close_old_connections()
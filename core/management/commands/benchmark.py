@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.benchmark import BenchmarkError, compare, run
+from core.permissions import is_manager
+
+
+class Command(BaseCommand):
+    help = "Time the main views and services (percentiles + query counts) and write the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", nargs="+", help="Run only targets whose name contains one of these")
+        parser.add_argument("--user", help="Username to run the views as (default: first manager)")
+        parser.add_argument("-o", "--output", help="JSON file (default: benchmarks/<timestamp>.json)")
+        parser.add_argument("--compare", help="Previous JSON result to compare medians against")
+
+    def _user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user {username!r}.")
+        for user in User.objects.filter(is_active=True).order_by("-is_superuser", "pk"):
+            if is_manager(user):
+                return user
+        raise CommandError("No manager user to run the views as; create one (createsuperuser) or pass --user.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        user = self._user(options["user"])
+
+        def log(name, result):
+            ms, q = result["ms"], result["queries"]
+            queries = q["max"] if q["min"] == q["max"] else f"{q['min']}-{q['max']}"
+            self.stdout.write(
+                f"{name:<42} p50 {ms['p50']:>9.2f}ms  p95 {ms['p95']:>9.2f}ms  max {ms['max']:>9.2f}ms  "
+                f"queries {queries}"
+            )
+
+        try:
+            report = run(user, iterations=options["iterations"], warmup=options["warmup"], only=options["only"], log=log)
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        path = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / f"{timezone.now():%Y%m%d-%H%M%S}.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
+
+        if options["compare"]:
+            try:
+                previous = json.loads(Path(options["compare"]).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read {options['compare']}: {e}")
+            self.stdout.write(f"\nMedian vs {options['compare']}:")
+            for name, old, new, change, old_q, new_q in compare(report, previous):
+                queries = f"queries {old_q} -> {new_q}" if old_q != new_q else ""
+                self.stdout.write(f"{name:<42} {old:>9.2f}ms -> {new:>9.2f}ms  {change:+6.1f}%  {queries}")
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.benchmark import BenchmarkError, asgi_latency
+from core.management.commands.benchmark import Command as BenchmarkCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app with uvicorn and time the async pages (dashboard, customer_detail) with their "
+        "queries run one after another vs. concurrently; write the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--threads", type=int, nargs="+", default=[1, 4],
+            help="PARALLEL_QUERY_THREADS values to compare (1 = sequential)",
+        )
+        parser.add_argument("--user", help="Username to run the pages as (default: first manager)")
+        parser.add_argument("-o", "--output", help="JSON file (default: benchmarks/asgi-<timestamp>.json)")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        if any(n < 1 for n in options["threads"]):
+            raise CommandError("--threads values must be at least 1.")
+        user = BenchmarkCommand()._user(options["user"])
+
+        def log(threads, page, result):
+            ms = result["ms"]
+            self.stdout.write(
+                f"threads={threads:<3} {page:<22} p50 {ms['p50']:>9.2f}ms  p95 {ms['p95']:>9.2f}ms  "
+                f"mean {ms['mean']:>9.2f}ms"
+            )
+
+        try:
+            report = asgi_latency(
+                user, thread_counts=options["threads"], iterations=options["iterations"],
+                warmup=options["warmup"], log=log,
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        default = Path(settings.BASE_DIR) / "benchmarks" / f"asgi-{timezone.now():%Y%m%d-%H%M%S}.json"
+        path = Path(options["output"] or default)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.benchmark import BenchmarkError, concurrency, sqlite_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and checkout writers against copies of the SQLite database, once per "
+        "connection profile (stock Django vs. configured), and write the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10, help="Duration per profile")
+        parser.add_argument(
+            "--hot-item", action="store_true",
+            help="Half the writers race for one item (stock reservation under contention); "
+                 "reports that item's checkout throughput separately.",
+        )
+        parser.add_argument("--profiles", nargs="+", choices=sorted(sqlite_profiles()), help="Default: all")
+        parser.add_argument("-o", "--output", help="JSON file (default: benchmarks/concurrency-<timestamp>.json)")
+
+    def handle(self, *args, **options):
+        if options["readers"] < 0 or options["writers"] < 0 or not (options["readers"] + options["writers"]):
+            raise CommandError("Need at least one reader or writer.")
+        if options["seconds"] <= 0:
+            raise CommandError("--seconds must be positive.")
+
+        def log(name, result):
+            self.stdout.write(
+                f"{name} (journal_mode={result['journal_mode']}, CONN_MAX_AGE={result['conn_max_age']})"
+            )
+            for kind in ("reads", "writes", "hot_writes"):
+                if kind not in result:
+                    continue
+                r = result[kind]
+                self.stdout.write(
+                    f"  {kind:<10} {r['per_second']:>8.1f}/s  p50 {r['ms']['p50']:>8.2f}ms  "
+                    f"p95 {r['ms']['p95']:>8.2f}ms  p99 {r['ms']['p99']:>8.2f}ms  max {r['ms']['max']:>8.2f}ms  "
+                    f"errors {r['errors']}"
+                    + (f"  rejected {r['rejected']}" if "rejected" in r else "")
+                    + ("  OVERSOLD" if r.get("oversold") else "")
+                )
+            for message in result["error_messages"]:
+                self.stdout.write(f"  error: {message}")
+
+        try:
+            report = concurrency(
+                readers=options["readers"], writers=options["writers"], seconds=options["seconds"],
+                profiles=options["profiles"], log=log, hot_item=options["hot_item"],
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        default = Path(settings.BASE_DIR) / "benchmarks" / f"concurrency-{timezone.now():%Y%m%d-%H%M%S}.json"
+        path = Path(options["output"] or default)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,63 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.csv_export import csv_chunks
+from inventory.exports import export_movements
+from sales.exports import EXPORTS as SALES_EXPORTS
+
+
+KINDS = [*SALES_EXPORTS, "movements"]
+
+
+class Command(BaseCommand):
+    help = "Stream sales, sale lines, payments or stock movements to CSV (stdout or --output)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("-o", "--output", help="File to write (default: stdout).")
+
+        sales = parser.add_argument_group("sales / lines / payments (same filters as the sales list)")
+        sales.add_argument("--q", default="", help="Sale id or customer name.")
+        sales.add_argument("--status", default="")
+        sales.add_argument("--customer", default="", help="Customer id.")
+        sales.add_argument("--from", dest="date_from", default="", help="YYYY-MM-DD, inclusive.")
+        sales.add_argument("--to", dest="date_to", default="", help="YYYY-MM-DD, inclusive.")
+        sales.add_argument("--with-balance", action="store_true", help="Only sales with an outstanding balance.")
+
+        movements = parser.add_argument_group("movements (same filters as item detail)")
+        movements.add_argument("--item", type=int, help="Item id (default: every item).")
+        movements.add_argument("--as-of", help="Only movements up to the end of this day, YYYY-MM-DD.")
+        movements.add_argument("--archived", action="store_true", help="The movements archived by ledger compaction.")
+
+    def handle(self, *args, **options):
+        kind = options["kind"]
+        if kind == "movements":
+            as_of = None
+            if options["as_of"]:
+                try:
+                    as_of = datetime.strptime(options["as_of"], "%Y-%m-%d").date()
+                except ValueError:
+                    raise CommandError("--as-of must be YYYY-MM-DD")
+            _, header, rows = export_movements(
+                item_id=options["item"], as_of=as_of, archived=options["archived"],
+            )
+        else:
+            params = {
+                "q": options["q"],
+                "status": options["status"],
+                "customer": options["customer"],
+                "from": options["date_from"],
+                "to": options["date_to"],
+                "with_balance": "1" if options["with_balance"] else "",
+            }
+            _, header, rows = SALES_EXPORTS[kind](params)
+
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            for chunk in csv_chunks(header, rows):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
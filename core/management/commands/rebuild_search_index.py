@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.search import SEARCH_INDEXES, fts_create_sql, supports_fts
+
+
+class Command(BaseCommand):
+    help = "(Re)create the SQLite FTS5 search tables and refill them from the source tables."
+
+    def handle(self, *args, **options):
+        if not supports_fts(connection):
+            raise CommandError("This database has no FTS5; search falls back to icontains.")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for fts_table in SEARCH_INDEXES:
+                for sql in fts_create_sql(fts_table):
+                    cursor.execute(sql)
+                self.stdout.write(f"Rebuilt {fts_table}")
+
+        self.stdout.write(self.style.SUCCESS("Search indexes rebuilt."))
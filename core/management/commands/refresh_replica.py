@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import replica
+
+
+class Command(BaseCommand):
+    help = "Copy the primary database over the read replica (SQLite backup API), once or every N seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=float, help="Keep refreshing, every this many seconds")
+
+    def handle(self, *args, **options):
+        if not replica.configured():
+            raise CommandError("No replica database is configured (set DB_REPLICA_NAME).")
+        every = options["every"]
+        if every is not None and every <= 0:
+            raise CommandError("--every must be positive.")
+        if every is not None and every >= replica.max_lag():
+            self.stderr.write(
+                f"--every {every:g} is not below REPLICA_MAX_LAG_SECONDS ({replica.max_lag()}); "
+                "reads will fall back to the primary between refreshes."
+            )
+
+        while True:
+            seconds = replica.refresh_replica()
+            self.stdout.write(f"{timezone.now():%H:%M:%S} replica refreshed in {seconds:.2f}s")
+            if every is None:
+                return
+            time.sleep(max(every - seconds, 0))
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+# core.jobs is imported inside the functions: spawned worker processes load
+# this module before Django is set up.
+
+MAINTENANCE_EVERY = 60  # seconds between stale-job recovery / purge passes
+
+
+def _process_main(worker, stop, poll, once):
+    # Entry point of a worker process ("spawn": a fresh interpreter, so set Django up first).
+    import django
+    django.setup()
+    from core.jobs import work
+
+    # Ctrl-C reaches the whole process group; the parent sets `stop` instead,
+    # so the current job gets to finish.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(worker, stop, poll=poll, once=once, log=lambda msg: print(msg, flush=True))
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (core.jobs) with N worker threads or processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-c", "--concurrency", type=int, default=getattr(settings, "JOB_WORKERS", 1),
+            help="Jobs run at the same time (default: JOB_WORKERS).",
+        )
+        parser.add_argument(
+            "--mode", choices=["threads", "processes"], default=getattr(settings, "JOB_WORKER_MODE", "threads"),
+            help="Threads share one process (fine for jobs that mostly wait on SQL); "
+                 "processes sidestep the GIL for CPU-heavy ones (default: JOB_WORKER_MODE).",
+        )
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between looks at an empty queue.")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is ready instead of waiting.")
+
+    def handle(self, *args, **options):
+        from core import jobs
+
+        concurrency, mode, poll, once = options["concurrency"], options["mode"], options["poll"], options["once"]
+        self.verbosity = options["verbosity"]
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        if poll <= 0:
+            raise CommandError("--poll must be positive.")
+
+        log = self.stdout.write
+        if mode == "processes":
+            context = multiprocessing.get_context("spawn")
+            stop = context.Event()
+
+            def start(i):
+                worker = context.Process(
+                    target=_process_main, args=(self._name(i), stop, poll, once), name=f"jobs-{i}", daemon=True,
+                )
+                worker.start()
+                return worker
+        else:
+            stop = threading.Event()
+
+            def start(i):
+                worker = threading.Thread(
+                    target=jobs.work, args=(self._name(i), stop),
+                    kwargs={"poll": poll, "once": once, "log": log}, name=f"jobs-{i}", daemon=True,
+                )
+                worker.start()
+                return worker
+
+        # The handler only flags; setting `stop` from inside it can deadlock
+        # with the Event's own lock.
+        interrupted = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: interrupted.append(True))
+
+        self._maintain(jobs)
+        log(f"{concurrency} worker {mode} started (Ctrl-C finishes the running jobs and stops)")
+        workers = [start(i) for i in range(concurrency)]
+        last_maintenance = time.monotonic()
+
+        while not interrupted and any(w.is_alive() for w in workers):
+            time.sleep(poll)
+            if interrupted:
+                break
+            if not once:
+                # A worker only dies on a bug or a kill; keep the pool at its size.
+                workers = [w if w.is_alive() else start(i) for i, w in enumerate(workers)]
+            if time.monotonic() - last_maintenance >= MAINTENANCE_EVERY:
+                self._maintain(jobs)
+                last_maintenance = time.monotonic()
+
+        stop.set()
+        for w in workers:
+            w.join()
+        log("workers stopped")
+
+    def _name(self, i):
+        return f"{socket.gethostname()}:{os.getpid()}:{i}"
+
+    def _maintain(self, jobs):
+        recovered = jobs.recover_stale()
+        if recovered:
+            self.stderr.write(f"{recovered} job(s) left running by a stopped worker were requeued or failed")
+        purged = jobs.purge_finished()
+        if purged and self.verbosity > 1:
+            self.stdout.write(f"purged {purged} finished job(s)")
+        close_old_connections()
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seed import SCALES, generate
+
+
+class Command(BaseCommand):
+    help = "Generate seeded synthetic items, customers, sales, payments and movements for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Preset sizes (default: small)")
+        parser.add_argument("--seed", type=int, default=1, help="Same seed + sizes = same data")
+        parser.add_argument("--items", type=int)
+        parser.add_argument("--customers", type=int)
+        parser.add_argument("--sales", type=int)
+        parser.add_argument("--restocks", type=int, help="Extra restock/adjustment movements")
+        parser.add_argument("--lines-per-sale", type=int, default=3, help="Average lines per sale")
+        parser.add_argument("--days", type=int, default=365, help="History length, ending today")
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options["scale"]])
+        for key in sizes:
+            if options[key] is not None:
+                sizes[key] = options[key]
+        if min(sizes.values()) < 0 or options["days"] < 1 or options["lines_per_sale"] < 1:
+            raise CommandError("Sizes must be positive.")
+
+        self.stdout.write(f"Seed {options['seed']}: {sizes}, {options['days']} day(s)")
+        try:
+            counts = generate(
+                seed=options["seed"],
+                lines_per_sale=options["lines_per_sale"],
+                days=options["days"],
+                log=self.stdout.write,
+                **sizes,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        summary = ", ".join(f"{n} {name}" for name, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary}."))
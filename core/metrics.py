@@ -0,0 +1,235 @@
+"""
+In-process metrics, served at /metrics in the Prometheus text format.
+
+No client library and no external service: counters and histograms are plain
+dicts behind one lock, updated with a few additions per request, and only
+formatted when something scrapes /metrics. Each worker process keeps its own
+numbers (like prometheus_client without multiprocess mode), so with several
+workers every scrape sees one process.
+
+Business counters are bumped from the same places that maintain the
+denormalized tables (create_sale, Payment.save, create_movements, ...) and only
+once the transaction commits, so rolled-back checkouts aren't counted.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core.permissions import is_manager
+
+
+# Seconds; view latencies, SQL time per request, checkout duration
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_lock = threading.Lock()
+_registry = []
+_started_at = time.time()
+
+
+def enabled() -> bool:
+    return getattr(settings, "METRICS_ENABLED", True)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        slot = bisect_left(self.buckets, value)  # first bucket with le >= value
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][slot] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the block's duration; adds outcome="ok"/"error" if that's one of the labels."""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            if "outcome" in self.labelnames:
+                labels["outcome"] = outcome
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with _lock:
+            values = sorted((key, ([*counts], total, n)) for key, (counts, total, n) in self._values.items())
+        for key, (counts, total, n) in values:
+            running = 0
+            for le, count in zip((*self.buckets, float("inf")), counts):
+                running += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(le))])} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {n}"
+
+
+# ---------------------------------------------------------------------------
+# The metrics
+# ---------------------------------------------------------------------------
+
+REQUESTS = Counter("matyz_http_requests_total", "HTTP requests by view, method and status.", ["view", "method", "status"])
+REQUEST_SECONDS = Histogram(
+    "matyz_http_request_duration_seconds", "Time to produce the response, per view.", ["view", "method"],
+)
+REQUEST_QUERIES = Histogram(
+    "matyz_db_queries_per_request", "SQL queries run while handling one request.", ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "matyz_db_query_seconds_per_request", "Time spent in SQL while handling one request.", ["view"],
+)
+CHECKOUT_SECONDS = Histogram(
+    "matyz_checkout_duration_seconds", "Sale checkout (create/edit) including commit.", ["operation", "outcome"],
+)
+
+SALES = Counter("matyz_sales_total", "Sales committed, by operation (created/edited/deleted).", ["operation"])
+SALES_REVENUE = Counter("matyz_sales_revenue_total", "Total of the sales created.")
+PAYMENTS = Counter("matyz_payments_total", "Payments posted, by method.", ["method"])
+PAYMENTS_AMOUNT = Counter("matyz_payments_amount_total", "Amount of the payments posted, by method.", ["method"])
+STOCK_MOVEMENTS = Counter("matyz_stock_movements_total", "Stock movements written, by type.", ["type"])
+STOCK_REJECTIONS = Counter("matyz_insufficient_stock_total", "Checkouts refused for lack of stock.")
+
+
+def count_on_commit(counter: Counter, amount=1, **labels):
+    """counter.inc(...) once the current transaction commits (right away outside one)."""
+    if amount and enabled():
+        transaction.on_commit(lambda: counter.inc(amount, **labels))
+
+
+def count_movements_on_commit(movements):
+    """One on_commit for a batch of StockMovements, counted per type."""
+    per_type = {}
+    for m in movements:
+        per_type[m.movement_type] = per_type.get(m.movement_type, 0) + 1
+    for movement_type, n in per_type.items():
+        count_on_commit(STOCK_MOVEMENTS, n, type=movement_type)
+
+
+def render() -> str:
+    lines = [
+        "# HELP matyz_process_start_time_seconds Start time of this process since the Unix epoch.",
+        "# TYPE matyz_process_start_time_seconds gauge",
+        f"matyz_process_start_time_seconds {_started_at}",
+    ]
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def scrape_allowed(request) -> bool:
+    """
+    METRICS_TOKEN set: the scraper must send "Authorization: Bearer <token>".
+    Otherwise only logged-in managers get in, plus local scrapers when
+    METRICS_ALLOW_LOCALHOST is on (never by default: behind a reverse proxy
+    on the same host, REMOTE_ADDR is loopback for every visitor).
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        sent = request.headers.get("Authorization", "")
+        return hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+    if getattr(settings, "METRICS_ALLOW_LOCALHOST", False) and request.META.get("REMOTE_ADDR") in ("127.0.0.1", "::1"):
+        return True
+    return is_manager(request.user)
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    Per-view latency, status and SQL count/time. The SQL numbers come from an
+    execute_wrapper on every configured database for the duration of the
+    request; nothing is formatted until /metrics is scraped. Streaming
+    responses are timed until the view returns, not until the body is sent.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+
+        sql = [0, 0.0]
+
+        def record_sql(execute, sql_text, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, context)
+            finally:
+                sql[0] += 1
+                sql[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(record_sql))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        if view == "metrics":
+            return response
+
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_SECONDS.observe(elapsed, view=view, method=request.method)
+        REQUEST_QUERIES.observe(sql[0], view=view)
+        REQUEST_SQL_SECONDS.observe(sql[1], view=view)
+        return response
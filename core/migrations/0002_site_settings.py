@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:35
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SiteSettings",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "default_low_stock_threshold",
+                    models.PositiveIntegerField(
+                        default=5,
+                        help_text="Low stock level for items without a threshold of their own.",
+                    ),
+                ),
+                (
+                    "best_sellers_days",
+                    models.PositiveSmallIntegerField(
+                        default=30,
+                        help_text="Days of sales behind the dashboard's best sellers.",
+                        validators=[django.core.validators.MinValueValidator(1)],
+                    ),
+                ),
+                (
+                    "best_customers_days",
+                    models.PositiveSmallIntegerField(
+                        default=90,
+                        help_text="Customers who bought within this many days make the dashboard's best customers.",
+                        validators=[django.core.validators.MinValueValidator(1)],
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "site settings",
+                "verbose_name_plural": "site settings",
+            },
+        ),
+    ]
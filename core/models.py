@@ -1,3 +1,91 @@
-from django.db import models
+from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
 
-# Create your models here.
+
+class Job(models.Model):
+    """
+    One unit of background work (see core.jobs): a registered task name plus
+    its JSON arguments, picked up by `manage.py run_jobs`.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "Queued"
+        RUNNING = "RUNNING", "Running"
+        SUCCEEDED = "SUCCEEDED", "Succeeded"
+        FAILED = "FAILED", "Failed"
+        CANCELLED = "CANCELLED", "Cancelled"
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    # Higher runs first; same priority runs oldest first.
+    priority = models.SmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Not picked up before this (retries back off through it).
+    run_after = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default="")
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # The worker's "next job" query
+            models.Index(fields=["status", "priority", "run_after"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED, self.Status.CANCELLED)
+
+
+class SiteSettings(models.Model):
+    """
+    Shop-wide knobs managers can change without a deploy; a single row
+    (pk=1). Read it with core.site_settings.get_site_settings(), which keeps
+    it cached in-process.
+    """
+    default_low_stock_threshold = models.PositiveIntegerField(
+        default=5, help_text="Low stock level for items without a threshold of their own.",
+    )
+    best_sellers_days = models.PositiveSmallIntegerField(
+        default=30, validators=[MinValueValidator(1)], help_text="Days of sales behind the dashboard's best sellers.",
+    )
+    best_customers_days = models.PositiveSmallIntegerField(
+        default=90, validators=[MinValueValidator(1)],
+        help_text="Customers who bought within this many days make the dashboard's best customers.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "site settings"
+        verbose_name_plural = "site settings"
+
+    def __str__(self):
+        return "Site settings"
+
+    def save(self, *args, **kwargs):
+        from .site_settings import settings_saved
+
+        self.pk = 1
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            settings_saved(self)
@@ -0,0 +1,77 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Returns the list of raw key values, or None for a missing/garbled cursor."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or not all(isinstance(v, (str, int, float)) for v in values):
+        return None  # keys are never null, lists or objects
+    return values
+
+
+def _after(model, ordering: list[str], values: list) -> Q:
+    """
+    Rows strictly after `values` in `ordering`, expanded to
+    (a > x) OR (a = x AND b > y) OR ... so the ordering index can seek to it.
+    """
+    condition = Q()
+    equal = Q()
+    for key, raw in zip(ordering, values):
+        name = key.lstrip("-")
+        value = model._meta.get_field(name).to_python(raw)
+        op = "lt" if key.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{op}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(request, queryset, ordering: list[str], page_size: int = PAGE_SIZE):
+    """
+    Cursor (keyset) pagination: ?cursor= holds the last row's ordering keys,
+    so page N costs the same as page 1. `ordering` must end in a unique key
+    (e.g. ["-created_at", "-id"]).
+
+    Returns (rows, next_url). next_url keeps every other GET param (the
+    filters) and swaps in the next cursor; None on the last page.
+    """
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(request.GET.get("cursor", ""))
+    if values and len(values) == len(ordering):
+        try:
+            queryset = queryset.filter(_after(queryset.model, ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            # Tampered cursor (wrong types, unparseable dates): start from the top rather than 500.
+            pass
+
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    params = request.GET.copy()
+    params["cursor"] = encode_cursor([getattr(last, key.lstrip("-")) for key in ordering])
+    return rows, f"{request.path}?{params.urlencode()}"
+
+
+def is_htmx(request) -> bool:
+    return request.headers.get("HX-Request") == "true"
@@ -0,0 +1,51 @@
+"""
+Independent read queries at the same time, for async views.
+
+Django's async ORM (aget, aaggregate, ...) runs every query on the one
+thread-sensitive worker thread, so awaiting several together doesn't overlap
+anything. gather_queries() runs each callable on a small pool of threads
+instead, each with its own database connection (WAL lets SQLite serve them
+at once), so a page waits for its slowest query rather than the sum of all.
+
+Only for reads outside a transaction: the pool's connections don't see
+uncommitted writes of the caller. The request's routing (core.replica) is
+carried over to the pool threads.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_lock = threading.Lock()
+_executor = None
+
+
+def pool_size() -> int:
+    return getattr(settings, "PARALLEL_QUERY_THREADS", 4)
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=pool_size(), thread_name_prefix="queries")
+        return _executor
+
+
+def _run(fn):
+    try:
+        return fn()
+    finally:
+        # What the end of a request does for this thread's connection (CONN_MAX_AGE).
+        close_old_connections()
+
+
+async def gather_queries(*fns) -> list:
+    """Runs the callables concurrently and returns their results in order."""
+    if pool_size() <= 1:
+        return await sync_to_async(lambda: [fn() for fn in fns])()
+    run = sync_to_async(_run, thread_sensitive=False, executor=_pool())
+    return list(await asyncio.gather(*(run(fn) for fn in fns)))
@@ -0,0 +1,204 @@
+"""
+Read replica for the report and list pages.
+
+The replica is a copy of the primary SQLite file refreshed with the online
+backup API (`manage.py refresh_replica --every 30`); the time each copy was
+taken is kept in a small sidecar file next to it. Views opt in with
+@replica_reads, and only their GET/HEAD requests read from it:
+
+- writes always go to the primary;
+- a session that wrote something keeps reading from the primary until a
+  replica copy taken after that write is in place ("sticky" reads);
+- if the replica is missing or older than REPLICA_MAX_LAG_SECONDS (the refresh
+  stopped), everybody reads from the primary;
+- auth, sessions and the like never leave the primary.
+
+Caches filled from the replica check that it is newer than their last
+invalidation (see core.dashboard and reports.services), so a stale copy
+can't be cached past a write.
+"""
+import contextvars
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+
+REPLICA = "replica"
+PRIMARY = "default"
+
+# Apps whose reads stay on the primary (login, permissions, sessions).
+PRIMARY_ONLY_APPS = {"auth", "sessions", "contenttypes", "admin"}
+
+# Session key: when this session last wrote (time.time()).
+WROTE_AT_SESSION_KEY = "_db_wrote_at"
+
+_SAFE_METHODS = ("GET", "HEAD")
+
+# Per-request routing state, set by ReplicaMiddleware: {"replica", "snapshot_at", "wrote"}.
+_state = contextvars.ContextVar("db_routing", default=None)
+
+
+def configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+def max_lag() -> int:
+    return getattr(settings, "REPLICA_MAX_LAG_SECONDS", 120)
+
+
+def _snapshot_file() -> Path:
+    return Path(f"{settings.DATABASES[REPLICA]['NAME']}.snapshot")
+
+
+def snapshot_at() -> float | None:
+    """When the current replica copy was taken, or None if there isn't one."""
+    try:
+        return _snapshot_file().stat().st_mtime
+    except OSError:
+        return None
+
+
+def reading_from_replica() -> float | None:
+    """The snapshot time if this request's reads currently go to the replica, else None."""
+    state = _state.get()
+    return state["snapshot_at"] if state and state["replica"] else None
+
+
+def replica_has(since: float | None) -> bool:
+    """
+    Would a read right now see what was committed at `since`? True when reads
+    go to the primary, or the replica copy was taken after it.
+    """
+    at = reading_from_replica()
+    return at is None or since is None or at >= since
+
+
+@contextmanager
+def primary_reads():
+    """Reads inside the block go to the primary even in a @replica_reads view."""
+    state = _state.get()
+    if not state or not state["replica"]:
+        yield
+        return
+    state["replica"] = False
+    try:
+        yield
+    finally:
+        state["replica"] = True
+
+
+def replica_reads(view):
+    """Marks a view whose GET/HEAD requests may read from the replica."""
+    view.replica_reads = True
+    return view
+
+
+def copy_database(source, target, journal_mode=None):
+    """Consistent copy through SQLite's online backup API (safe while others write)."""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+        if journal_mode:
+            dst.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        src.close()
+        dst.close()
+
+
+def refresh_replica() -> float:
+    """
+    Copies the primary over the replica and records the copy's time. Returns
+    the seconds it took. Readers of the old copy just wait for the swap
+    (busy_timeout); the backup retries while they hold it.
+    """
+    if not configured():
+        raise RuntimeError("No replica database is configured (set DB_REPLICA_NAME).")
+    started = time.time()
+    replica = settings.DATABASES[REPLICA]["NAME"]
+    copy_database(settings.DATABASES[PRIMARY]["NAME"], replica)
+
+    # The copy is at least as new as `started`; stamp it with that, not with now.
+    marker = _snapshot_file()
+    marker.touch()
+    os.utime(marker, (started, started))
+    return time.time() - started
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state and state["replica"] and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label != "sessions":
+            state["wrote"] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema with the copy.
+        return False if db == REPLICA else None
+
+
+def _within(state, chunks):
+    # Streaming bodies (CSV exports) run their queries after the view returned.
+    chunks = iter(chunks)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+class ReplicaMiddleware:
+    """
+    Decides per request where reads go (see the module docstring) and
+    remembers in the session when it last wrote. Needs the session, so it
+    sits after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not configured():
+            return self.get_response(request)
+
+        state = {"replica": False, "snapshot_at": None, "wrote": False}
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state["replica"] and response.streaming:
+            response.streaming_content = _within(state, response.streaming_content)
+        if (state["wrote"] or request.method not in _SAFE_METHODS) and hasattr(request, "session"):
+            request.session[WROTE_AT_SESSION_KEY] = time.time()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None or request.method not in _SAFE_METHODS or not getattr(view_func, "replica_reads", False):
+            return None
+        at = snapshot_at()
+        if at is None or time.time() - at > max_lag():
+            return None
+        if hasattr(request, "session") and request.session.get(WROTE_AT_SESSION_KEY, 0) > at:
+            return None
+        state["replica"], state["snapshot_at"] = True, at
+        return None
@@ -0,0 +1,209 @@
+"""
+Indexed search for the counter search boxes.
+
+On SQLite we keep an FTS5 table per searchable model, filled by triggers on
+the source table (so bulk_create/update keep it in sync too). Queries become
+ranked prefix matches ("ink bla" -> "ink"* "bla"*). Anywhere FTS5 isn't
+available we fall back to the old icontains filters.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+_PHONE_DIGITS_SQL = (
+    "replace(replace(replace(replace(replace(replace({col}, ' ', ''), '-', ''), '(', ''), ')', ''), '+', ''), '.', '')"
+)
+
+# fts table -> source table and {fts column: SQL expression over the source row}
+SEARCH_INDEXES = {
+    "inventory_item_fts": {
+        "source": "inventory_item",
+        "columns": {
+            "name": "{row}.name",
+            "sku": "{row}.sku",
+            "brand": "{row}.brand",
+            "vendor": "{row}.vendor",
+        },
+    },
+    "customers_customer_fts": {
+        "source": "customers_customer",
+        "columns": {
+            "name": "{row}.name",
+            "phone": "{row}.phone",
+            "email": "{row}.email",
+            "instagram_handle": "{row}.instagram_handle",
+            "phone_digits": _PHONE_DIGITS_SQL.format(col="{row}.phone"),
+        },
+    },
+}
+
+# bm25 is computed per matching row, so only the first N hits get ranked;
+# keeps typeahead latency flat even for one-letter queries.
+RANK_CANDIDATES = 1000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_PHONE_RE = re.compile(r"^[\d\s\-\(\)\+\.]+$")
+
+_available = {}
+
+
+def _columns(fts_table, row):
+    cols = SEARCH_INDEXES[fts_table]["columns"]
+    return list(cols), [expr.format(row=row) for expr in cols.values()]
+
+
+def _source_columns(fts_table) -> list[str]:
+    """The source table's columns the index is built from (in first-use order)."""
+    found = re.findall(r"\{row\}\.(\w+)", " ".join(SEARCH_INDEXES[fts_table]["columns"].values()))
+    return list(dict.fromkeys(found))
+
+
+def _insert_new_sql(fts_table) -> str:
+    names, new_exprs = _columns(fts_table, "new")
+    return f"INSERT INTO {fts_table}(rowid, {', '.join(names)}) VALUES (new.id, {', '.join(new_exprs)});"
+
+
+def _update_trigger_sql(fts_table) -> str:
+    # Only updates of indexed columns re-index the row; stock flags, prices,
+    # timestamps etc. are rewritten often and don't change what search finds.
+    source = SEARCH_INDEXES[fts_table]["source"]
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {', '.join(_source_columns(fts_table))} "
+        f"ON {source} BEGIN DELETE FROM {fts_table} WHERE rowid = old.id; {_insert_new_sql(fts_table)} END"
+    )
+
+
+def fts_create_sql(fts_table) -> list[str]:
+    """DDL for the FTS table, its sync triggers and the initial fill."""
+    source = SEARCH_INDEXES[fts_table]["source"]
+    names, _ = _columns(fts_table, "new")
+    _, src_exprs = _columns(fts_table, source)
+    cols = ", ".join(names)
+
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{cols}, prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source} BEGIN {_insert_new_sql(fts_table)} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source} BEGIN "
+        f"DELETE FROM {fts_table} WHERE rowid = old.id; END",
+        _update_trigger_sql(fts_table),
+        f"DELETE FROM {fts_table}",
+        f"INSERT INTO {fts_table}(rowid, {cols}) SELECT {source}.id, {', '.join(src_exprs)} FROM {source}",
+    ]
+
+
+def fts_drop_sql(fts_table) -> list[str]:
+    return [
+        f"DROP TRIGGER IF EXISTS {fts_table}_ai",
+        f"DROP TRIGGER IF EXISTS {fts_table}_ad",
+        f"DROP TRIGGER IF EXISTS {fts_table}_au",
+        f"DROP TABLE IF EXISTS {fts_table}",
+    ]
+
+
+def supports_fts(conn) -> bool:
+    if conn.vendor != "sqlite":
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def install_fts(fts_table, schema_editor):
+    """Migration helper: no-op where FTS5 isn't available (fallback search is used)."""
+    if not supports_fts(schema_editor.connection):
+        return
+    for sql in fts_create_sql(fts_table):
+        schema_editor.execute(sql)
+
+
+def uninstall_fts(fts_table, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in fts_drop_sql(fts_table):
+        schema_editor.execute(sql)
+
+
+def reinstall_fts(fts_table, schema_editor):
+    """
+    Migration helper: drops and recreates the FTS table, its triggers and its
+    contents. Needed after any migration SQLite runs as a table rebuild
+    (AddField with a default, AlterField, ...) on the source table, since
+    that drops the triggers along with the old table.
+    """
+    uninstall_fts(fts_table, schema_editor)
+    install_fts(fts_table, schema_editor)
+
+
+def fts_enabled(fts_table) -> bool:
+    """Is the FTS table there on the current connection? Checked once per process."""
+    if fts_table not in _available:
+        _available[fts_table] = (
+            connection.vendor == "sqlite" and fts_table in connection.introspection.table_names()
+        )
+    return _available[fts_table]
+
+
+def match_expression(q: str, phone_column: str | None = None) -> str | None:
+    """
+    FTS5 MATCH expression for user input, or None if nothing searchable.
+    Every word becomes a quoted prefix term (so punctuation can't break the
+    syntax). Phone-looking input searches the normalized digits column;
+    e-mail-looking input is matched as a phrase on its parts.
+    """
+    q = (q or "").strip()
+    if phone_column and _PHONE_RE.match(q):
+        digits = re.sub(r"\D", "", q)
+        if len(digits) >= 3:
+            return f'{phone_column} : "{digits}"*'
+
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return None
+    if "@" in q:
+        return '"' + " ".join(tokens) + '"*'
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _fallback_q(q, fields):
+    cond = Q()
+    for field in fields:
+        cond |= Q(**{f"{field}__icontains": q})
+    return cond
+
+
+def search_filter(queryset, q, fts_table, fallback_fields, phone_column=None):
+    """
+    Narrows `queryset` to rows matching `q` (ordering untouched, so it still
+    pages by name). Uses the FTS index when present, icontains otherwise.
+    """
+    expr = match_expression(q, phone_column) if fts_enabled(fts_table) else None
+    if expr is None:
+        return queryset.filter(_fallback_q(q, fallback_fields))
+    return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s", [expr]))
+
+
+def ranked_search(queryset, q, fts_table, fallback_fields, limit, phone_column=None) -> list:
+    """
+    Top `limit` rows of `queryset` matching `q`, best match first (bm25 rank
+    over the first RANK_CANDIDATES hits).
+    Falls back to icontains ordered by the queryset's own ordering.
+    """
+    expr = match_expression(q, phone_column) if fts_enabled(fts_table) else None
+    if expr is None:
+        return list(queryset.filter(_fallback_q(q, fallback_fields))[:limit])
+
+    with connections[queryset.db].cursor() as cursor:
+        # Over-fetch a little: the queryset may filter some hits out (e.g. inactive).
+        cursor.execute(
+            f"SELECT rowid FROM (SELECT rowid, rank AS r FROM {fts_table} WHERE {fts_table} MATCH %s LIMIT %s) "
+            f"ORDER BY r LIMIT %s",
+            [expr, RANK_CANDIDATES, limit * 3],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    found = queryset.in_bulk(ids)
+    return [found[i] for i in ids if i in found][:limit]
@@ -0,0 +1,242 @@
+"""
+Seeded synthetic data for benchmarking: a catalog, customers and a history of
+sales (lines, payments, SALE movements) spread over the last N days.
+
+Everything is bulk-inserted, bypassing the model save() hooks, and the
+denormalized state (balances, checkpoints, customer accounts, rollups) is
+rebuilt afterwards with the same services the repair commands use. The same seed and sizes always produce the same data.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.dashboard import INVALIDATES, invalidate_dashboard
+from customers.models import Customer
+from customers.services import rebuild_customer_accounts
+from inventory.models import Category, Item, StockMovement
+from inventory.services import bump_catalog_version, build_stock_checkpoints, rebuild_stock_balances
+from sales.models import Payment, Sale, SaleItem
+from sales.services import rebuild_sales_rollups
+
+
+SCALES = {
+    "small": {"items": 500, "customers": 200, "sales": 5_000, "restocks": 1_000},
+    "medium": {"items": 5_000, "customers": 2_000, "sales": 50_000, "restocks": 10_000},
+    "large": {"items": 50_000, "customers": 20_000, "sales": 500_000, "restocks": 100_000},
+}
+
+# Sales generated (and inserted) per transaction
+SEED_CHUNK = 2_000
+
+_CENT = Decimal("0.01")
+
+_ADJECTIVES = [
+    "Classic", "Mini", "Deluxe", "Soft", "Matte", "Glossy", "Vintage", "Urban", "Pocket", "Silk",
+    "Linen", "Cotton", "Leather", "Crystal", "Golden", "Silver", "Pastel", "Neon", "Rustic", "Slim",
+]
+_NOUNS = [
+    "Scarf", "Notebook", "Candle", "Mug", "Tote", "Wallet", "Keychain", "Bracelet", "Necklace", "Earrings",
+    "Cap", "Socks", "Poster", "Sticker pack", "Planner", "Pen set", "Hair clip", "Phone case", "Pouch", "Lip balm",
+]
+_CATEGORIES = [
+    "Accessories", "Stationery", "Home", "Jewelry", "Beauty", "Apparel", "Gifts", "Bags", "Tech", "Seasonal",
+]
+_BRANDS = ["Matyz", "Luma", "Nova", "Kiri", "Bosque", "Aurora", "Mar", "Sol", ""]
+_VENDORS = ["Distribuidora Central", "Importadora Sur", "Taller Local", "Mayorista Norte", ""]
+_FIRST = [
+    "Ana", "Luis", "María", "José", "Carla", "Diego", "Sofía", "Pedro", "Valentina", "Andrés",
+    "Camila", "Jorge", "Lucía", "Mateo", "Isabella", "Daniel", "Gabriela", "Miguel", "Paula", "Ricardo",
+]
+_LAST = [
+    "Pérez", "González", "Rodríguez", "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Morales",
+    "Herrera", "Castro", "Vargas", "Rojas", "Medina", "Suárez", "Romero", "Navarro", "Silva", "Mendoza",
+]
+_METHODS = [Payment.Method.CASH, Payment.Method.CARD, Payment.Method.TRANSFER, Payment.Method.OTHER]
+_METHOD_WEIGHTS = [45, 30, 20, 5]
+
+
+def sku_prefix(seed: int) -> str:
+    return f"SEED{seed}-"
+
+
+def _money(value) -> Decimal:
+    return Decimal(value).quantize(_CENT)
+
+
+def _moment(rng, day):
+    # Shop hours, busier in the afternoon.
+    minutes = int(min(max(rng.gauss(15 * 60, 150), 9 * 60), 21 * 60 - 1))
+    return timezone.make_aware(datetime.combine(day, time(minutes // 60, minutes % 60, rng.randrange(60))))
+
+
+def _items(rng, seed, count, categories):
+    items = []
+    for n in range(count):
+        cost = _money(rng.uniform(1, 80))
+        items.append(Item(
+            sku=f"{sku_prefix(seed)}{n:06d}",
+            name=f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {n}",
+            category_id=rng.choice(categories) if rng.random() < 0.9 else None,
+            cost_price=cost,
+            sell_price=_money(cost * Decimal(str(round(rng.uniform(1.3, 2.2), 2)))),
+            brand=rng.choice(_BRANDS),
+            vendor=rng.choice(_VENDORS),
+            low_stock_threshold=rng.choice([None, None, None, 2, 5, 10]),
+            is_active=rng.random() < 0.95,
+        ))
+    return items
+
+
+def _customers(rng, count, since):
+    customers = []
+    for n in range(count):
+        first, last = rng.choice(_FIRST), rng.choice(_LAST)
+        customers.append(Customer(
+            name=f"{first} {last} {n}",
+            phone=f"+58 412 {rng.randrange(1_000_000, 9_999_999)}",
+            email=f"{first.lower()}.{last.lower()}{n}@example.com" if rng.random() < 0.6 else "",
+            instagram_handle=f"@{first.lower()}{n}" if rng.random() < 0.4 else "",
+            created_at=since,
+        ))
+    return customers
+
+
+def generate(seed: int = 1, items: int = 500, customers: int = 200, sales: int = 5_000,
+             lines_per_sale: int = 3, restocks: int = 1_000, days: int = 365, log=None) -> dict:
+    """
+    Inserts the data set and rebuilds the derived tables. Returns the row
+    counts per model. Raises ValueError if this seed was already generated.
+    """
+    log = log or (lambda msg: None)
+    if Item.objects.filter(sku__startswith=sku_prefix(seed)).exists():
+        raise ValueError(f"Seed {seed} is already in this database; use another --seed or a fresh database.")
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    opening_at = timezone.make_aware(datetime.combine(first_day, time(8, 0)))
+    counts = {}
+
+    with transaction.atomic():
+        names = [f"{name} {seed}" for name in _CATEGORIES]
+        Category.objects.bulk_create([Category(name=n) for n in names], ignore_conflicts=True)
+        category_ids = list(Category.objects.filter(name__in=names).order_by("name").values_list("id", flat=True))
+
+        catalog = Item.objects.bulk_create(_items(rng, seed, items, category_ids), batch_size=1000)
+        people = Customer.objects.bulk_create(_customers(rng, customers, opening_at), batch_size=1000)
+    counts["items"], counts["customers"] = len(catalog), len(people)
+    log(f"{len(catalog)} items, {len(people)} customers")
+
+    # A few items sell a lot and most sell a little (Zipf-like popularity).
+    active = [it for it in catalog if it.is_active] or catalog
+    rng.shuffle(active)
+    cum_weights = list(accumulate(1 / (rank + 1) ** 0.9 for rank in range(len(active))))
+    customer_ids = [c.pk for c in people]
+    sold = {}
+    counts.update(sales=0, lines=0, payments=0, movements=0)
+
+    for start in range(0, sales, SEED_CHUNK):
+        batch = min(SEED_CHUNK, sales - start)
+        drafts = []
+        for _ in range(batch):
+            day = first_day + timedelta(days=min(int(rng.triangular(0, days, days)), days - 1))
+            at = min(_moment(rng, day), now)
+            # Mostly small baskets, the occasional big one; averages about lines_per_sale.
+            k = 1 + int(rng.expovariate(1 / max(lines_per_sale - 0.5, 0.5)))
+            picks = {it.pk: it for it in rng.choices(active, cum_weights=cum_weights, k=k)}
+            lines = [(it, rng.choice((1, 1, 1, 2, 2, 3))) for it in picks.values()]
+            total = sum((it.sell_price * qty for it, qty in lines), Decimal("0.00"))
+
+            roll = rng.random()
+            if roll < 0.65:
+                paid = total
+            elif roll < 0.85:
+                paid = _money(total * Decimal(str(round(rng.uniform(0.2, 0.8), 2))))
+            else:
+                paid = Decimal("0.00")
+            customer_id = rng.choice(customer_ids) if customer_ids and rng.random() < 0.7 else None
+            if customer_id is None:
+                paid = total  # walk-ins pay up front
+            drafts.append((at, customer_id, lines, total, paid))
+
+        with transaction.atomic():
+            sale_rows = Sale.objects.bulk_create([
+                Sale(
+                    customer_id=customer_id, created_at=at, subtotal=total, total=total, paid_amount=paid,
+                    status=(
+                        Sale.Status.PAID if paid >= total and total > 0
+                        else Sale.Status.PARTIAL if paid > 0 else Sale.Status.UNPAID
+                    ),
+                )
+                for at, customer_id, lines, total, paid in drafts
+            ], batch_size=1000)
+
+            sale_items, payments, movements = [], [], []
+            for sale, (at, customer_id, lines, total, paid) in zip(sale_rows, drafts):
+                for it, qty in lines:
+                    sale_items.append(SaleItem(
+                        sale=sale, item=it, quantity=qty, unit_price=it.sell_price, line_total=it.sell_price * qty,
+                    ))
+                    movements.append(StockMovement(
+                        item=it, movement_type=StockMovement.MovementType.SALE, quantity_change=-qty,
+                        note=f"Sale #{sale.pk}", sale_id=sale.pk, created_at=at,
+                    ))
+                    sold[it.pk] = sold.get(it.pk, 0) + qty
+                if paid:
+                    # Part of the debt is settled a few days later.
+                    paid_at = at
+                    if paid != total:
+                        paid_at += timedelta(days=rng.randrange(0, 20), minutes=rng.randrange(600))
+                    payments.append(Payment(
+                        sale=sale, amount=paid, method=rng.choices(_METHODS, _METHOD_WEIGHTS)[0],
+                        created_at=min(paid_at, now),
+                    ))
+
+            SaleItem.objects.bulk_create(sale_items, batch_size=1000)
+            Payment.objects.bulk_create(payments, batch_size=1000)
+            StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+        counts["sales"] += len(sale_rows)
+        counts["lines"] += len(sale_items)
+        counts["payments"] += len(payments)
+        counts["movements"] += len(movements)
+        log(f"{counts['sales']}/{sales} sales")
+
+    # Opening stock covers what was sold plus a margin, so stock never went
+    # negative; some items end up near or under their low-stock threshold.
+    movements = [
+        StockMovement(
+            item=it, movement_type=StockMovement.MovementType.RESTOCK,
+            quantity_change=sold.get(it.pk, 0) + rng.randrange(0, 40),
+            note="Opening stock (seed)", created_at=opening_at,
+        )
+        for it in catalog
+    ]
+    for _ in range(restocks):
+        it = rng.choice(catalog)
+        day = first_day + timedelta(days=rng.randrange(days))
+        kind = StockMovement.MovementType.RESTOCK if rng.random() < 0.8 else StockMovement.MovementType.ADJUSTMENT
+        qty = rng.randrange(5, 60) if kind == StockMovement.MovementType.RESTOCK else rng.choice((1, 2, 3))
+        movements.append(StockMovement(
+            item=it, movement_type=kind, quantity_change=qty, note="Seed", created_at=min(_moment(rng, day), now),
+        ))
+    movements = [m for m in movements if m.quantity_change]
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+    counts["movements"] += len(movements)
+    log(f"{counts['movements']} movements")
+
+    # The bulk inserts skipped every save() hook; rebuild what they maintain.
+    log("rebuilding stock balances, checkpoints, customer accounts and rollups")
+    rebuild_stock_balances()
+    build_stock_checkpoints()
+    rebuild_customer_accounts()
+    rebuild_sales_rollups()
+    bump_catalog_version()
+    invalidate_dashboard(*INVALIDATES)
+    return counts
@@ -0,0 +1,61 @@
+"""
+The SiteSettings row, cached in-process.
+
+The knobs (the default low-stock threshold, the dashboard windows) are read
+on busy pages, so get_site_settings() reads the row once and keeps it for
+SITE_SETTINGS_CACHE_SECONDS. Saving drops the copy of the process that
+saved, after commit; other processes (more web workers, run_jobs) see the
+change once their copy expires.
+
+Nothing stored is computed from the cached copy: Item.is_low reads the
+default threshold from the table inside its UPDATE (see
+inventory.services.low_stock_expression), so a stale copy can only show an
+old number on a page for a moment, never persist it.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from core.dashboard import invalidate_dashboard
+
+from .models import SiteSettings
+
+_lock = threading.Lock()
+_cached = None  # (SiteSettings, time.monotonic() when loaded)
+
+
+def cache_seconds() -> int:
+    return getattr(settings, "SITE_SETTINGS_CACHE_SECONDS", 60)
+
+
+def get_site_settings() -> SiteSettings:
+    """The settings row (defaults if it was never saved). Don't modify the returned instance."""
+    global _cached
+    with _lock:
+        cached = _cached
+    if cached is not None and time.monotonic() - cached[1] < cache_seconds():
+        return cached[0]
+
+    current = SiteSettings.objects.filter(pk=1).first() or SiteSettings(pk=1)
+    with _lock:
+        _cached = (current, time.monotonic())
+    return current
+
+
+def clear_cache():
+    global _cached
+    with _lock:
+        _cached = None
+
+
+def settings_saved(site_settings: SiteSettings):
+    """SiteSettings.save() hook: everything derived from the knobs, in the saving transaction."""
+    from inventory.models import Item
+    from inventory.services import refresh_low_stock
+
+    # Items on the default threshold may have crossed it either way.
+    refresh_low_stock(Item.objects.filter(low_stock_threshold__isnull=True))
+    invalidate_dashboard("settings")
+    transaction.on_commit(clear_cache)
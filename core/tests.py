@@ -1,3 +1,352 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer
+from inventory.models import Item, StockMovement
+from inventory.services import create_movements
+from sales.models import Payment, Sale, SaleItem
+from sales.services import create_sale
+
+from . import jobs, replica
+from .dashboard import cache_stats, get_metrics
+from .models import Job
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="", METRICS_ALLOW_LOCALHOST=False)
+class MetricsScrapeTests(TestCase):
+    """Who may read /metrics (the test client connects from 127.0.0.1)."""
+
+    def _get(self, **headers):
+        return self.client.get(reverse("metrics"), headers=headers)
+
+    def test_loopback_alone_is_not_enough_by_default(self):
+        self.assertEqual(self._get().status_code, 403)
+
+    @override_settings(METRICS_ALLOW_LOCALHOST=True)
+    def test_loopback_opt_in(self):
+        self.assertEqual(self._get().status_code, 200)
+
+    def test_manager(self):
+        self.client.force_login(get_user_model().objects.create_user("boss", password="x", is_staff=True))
+        self.assertEqual(self._get().status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret", METRICS_ALLOW_LOCALHOST=True)
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self._get().status_code, 403)
+        self.assertEqual(self._get(Authorization="Bearer wrong").status_code, 403)
+        self.assertEqual(self._get(Authorization="Bearer s3cret").status_code, 200)
+
+
+calls = []
+
+
+@jobs.task("tests.ok")
+def ok_task(job, value=None):
+    calls.append(job.pk)
+    return {"value": value}
+
+
+@jobs.task("tests.flaky")
+def flaky_task(job):
+    raise RuntimeError("try again")
+
+
+@jobs.task("tests.bad_args")
+def bad_args_task(job):
+    raise jobs.JobError("missing item")
+
+
+@override_settings(JOB_RETRY_BACKOFF_SECONDS=10, JOB_STALE_SECONDS=60, JOB_MAX_ATTEMPTS=3)
+class JobQueueTests(TestCase):
+    """core.jobs: claim order, retries with backoff, failures and stale-claim recovery."""
+
+    def _run_next(self, worker="w1"):
+        job = jobs.claim_next(worker)
+        self.assertIsNotNone(job)
+        return job, jobs.run_job(job)
+
+    def _make_ready(self, job):
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    def test_claims_by_priority_then_age(self):
+        low = jobs.enqueue("tests.ok")
+        first_high = jobs.enqueue("tests.ok", priority=5)
+        second_high = jobs.enqueue("tests.ok", priority=5)
+        jobs.enqueue("tests.ok", priority=9, delay=60)  # not ready yet
+
+        claimed = [jobs.claim_next("w1") for _ in range(4)]
+        self.assertEqual(claimed[:3], [first_high, second_high, low])
+        self.assertIsNone(claimed[3])
+        self.assertEqual({j.status for j in claimed[:3]}, {Job.Status.RUNNING})
+        self.assertEqual({j.attempts for j in claimed[:3]}, {1})
+
+    def test_a_claimed_job_is_not_claimed_again(self):
+        job = jobs.enqueue("tests.ok")
+        self.assertEqual(jobs.claim_next("w1"), job)
+        self.assertIsNone(jobs.claim_next("w2"))
+
+    def test_success_stores_the_result(self):
+        job = jobs.enqueue("tests.ok", {"value": 7})
+        job, status = self._run_next()
+        job.refresh_from_db()
+        self.assertEqual((status, job.result, job.error), (Job.Status.SUCCEEDED, {"value": 7}, ""))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retries_with_backoff_up_to_max_attempts(self):
+        job = jobs.enqueue("tests.flaky")
+        for attempt, backoff in ((1, 10), (2, 20)):
+            before = timezone.now()
+            job, status = self._run_next()
+            job.refresh_from_db()
+            self.assertEqual((status, job.attempts), (Job.Status.QUEUED, attempt))
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=backoff))
+            self.assertLess(job.run_after, before + timedelta(seconds=backoff + 5))
+            self.assertIn("try again", job.error)
+            self.assertIsNone(jobs.claim_next("w1"), "not picked up again before run_after")
+            self._make_ready(job)
+
+        job, status = self._run_next()
+        job.refresh_from_db()
+        self.assertEqual((status, job.attempts), (Job.Status.FAILED, 3))
+        self.assertIn("RuntimeError", job.error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(jobs.claim_next("w1"))
+
+    def test_job_error_fails_without_retry(self):
+        jobs.enqueue("tests.bad_args")
+        job, status = self._run_next()
+        job.refresh_from_db()
+        self.assertEqual((status, job.attempts, job.error), (Job.Status.FAILED, 1, "missing item"))
+
+    def test_unregistered_task_fails(self):
+        Job.objects.create(name="tests.gone")
+        job, status = self._run_next()
+        job.refresh_from_db()
+        self.assertEqual(status, Job.Status.FAILED)
+        self.assertIn("No task is registered", job.error)
+
+    def test_stale_claims_are_requeued_or_failed(self):
+        requeued = jobs.enqueue("tests.ok")
+        exhausted = jobs.enqueue("tests.ok", max_attempts=1)
+        fresh = jobs.enqueue("tests.ok")
+        for _ in range(3):
+            jobs.claim_next("dead-worker")
+        long_ago = timezone.now() - timedelta(seconds=120)
+        Job.objects.exclude(pk=fresh.pk).update(started_at=long_ago)
+
+        self.assertEqual(jobs.recover_stale(), 2)
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            requeued.pk: Job.Status.QUEUED, exhausted.pk: Job.Status.FAILED, fresh.pk: Job.Status.RUNNING,
+        })
+
+        # The dead worker's late result doesn't overwrite the new claim.
+        stale_copy = Job.objects.get(pk=requeued.pk)
+        stale_copy.worker = "dead-worker"
+        reclaimed = jobs.claim_next("w2")
+        self.assertEqual(reclaimed.pk, requeued.pk)
+        jobs.run_job(stale_copy)
+        self.assertEqual(Job.objects.get(pk=requeued.pk).status, Job.Status.RUNNING)
+        jobs.run_job(reclaimed)
+        self.assertEqual(Job.objects.get(pk=requeued.pk).status, Job.Status.SUCCEEDED)
+
+
+class DashboardCacheTests(TestCase):
+    """A sale or payment write drops the cached metrics it changes once it commits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = Item.objects.create(name="Ink", sku="INK-001", sell_price=Decimal("10.00"))
+        create_movements([
+            StockMovement(item=cls.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=100),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _sale(self, qty=1):
+        return create_sale(Sale(), [SaleItem(item=self.item, quantity=qty, unit_price=self.item.sell_price)])
+
+    def _read(self, name):
+        before = cache_stats()
+        value = get_metrics([name])[name]
+        after = cache_stats()
+        return value, after["misses"] - before["misses"]
+
+    def test_sale_write_drops_cached_metrics_on_commit(self):
+        self.assertEqual(self._read("sales_today"), ({"count": 0, "total": Decimal("0.00")}, 1))
+        self.assertEqual(self._read("sales_today")[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._sale(2)
+        # Not dropped until the write commits.
+        self.assertEqual(self._read("sales_today"), ({"count": 0, "total": Decimal("0.00")}, 0))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._read("sales_today"), ({"count": 1, "total": Decimal("20.00")}, 1))
+        self.assertEqual(self._read("sales_today")[1], 0)
+
+    def test_payment_write_drops_outstanding_debt(self):
+        sale = self._sale(3)
+        self.assertEqual(self._read("outstanding_debt"), (Decimal("30.00"), 1))
+        self.assertEqual(self._read("low_stock_count")[1], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(sale=sale, amount=Decimal("12.00"))
+        self.assertEqual(self._read("outstanding_debt"), (Decimal("18.00"), 1))
+        # Metrics a payment can't change stay cached.
+        self.assertEqual(self._read("low_stock_count")[1], 0)
+
+
+def _reads_from(request):
+    return HttpResponse(f"{router.db_for_read(Sale)},{router.db_for_read(get_user_model())}")
+
+
+@replica.replica_reads
+def _replica_view(request):
+    if request.method == "POST" or request.GET.get("write"):
+        Item.objects.create(name="Written", sku=f"WRT-{time.monotonic_ns()}")
+    return _reads_from(request)
+
+
+@replica.replica_reads
+def _replica_primary_block_view(request):
+    with replica.primary_reads():
+        return _reads_from(request)
+
+
+@replica.replica_reads
+def _replica_streaming_view(request):
+    # The body runs after the view (and the middleware) returned, like the CSV exports.
+    return StreamingHttpResponse(router.db_for_read(Sale) for _ in range(2))
+
+
+@override_settings(REPLICA_MAX_LAG_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    """Where ReplicaMiddleware and ReplicaRouter send each read."""
+
+    def setUp(self):
+        self.snapshot_at = time.time() - 5
+        patches = [
+            mock.patch.object(replica, "configured", lambda: True),
+            mock.patch.object(replica, "snapshot_at", lambda: self.snapshot_at),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _request(self, view=_replica_view, method="get", session=None, data=None):
+        request = getattr(RequestFactory(), method)("/", data or {})
+        request.session = {} if session is None else session
+        middleware = replica.ReplicaMiddleware(
+            lambda r: middleware.process_view(r, view, (), {}) or view(r),
+        )
+        response = middleware(request)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return body.decode(), request.session
+
+    def test_replica_reads_views_read_from_the_replica(self):
+        # Auth and the like stay on the primary.
+        self.assertEqual(self._request()[0], "replica,default")
+        self.assertEqual(self._request(_reads_from)[0], "default,default")
+        self.assertEqual(self._request(_replica_primary_block_view)[0], "default,default")
+        self.assertEqual(self._request(_replica_streaming_view)[0], "replicareplica")
+
+    def test_writes_and_unsafe_methods_use_the_primary(self):
+        body, session = self._request(method="post")
+        self.assertEqual(body, "default,default")
+        self.assertGreater(session[replica.WROTE_AT_SESSION_KEY], self.snapshot_at)
+
+        # A GET that wrote marks the session too.
+        _, session = self._request(data={"write": "1"})
+        self.assertIn(replica.WROTE_AT_SESSION_KEY, session)
+        self.assertNotIn(replica.WROTE_AT_SESSION_KEY, self._request()[1])
+
+    def test_session_that_wrote_reads_from_the_primary_until_a_newer_copy(self):
+        session = {replica.WROTE_AT_SESSION_KEY: time.time()}
+        self.assertEqual(self._request(session=session)[0], "default,default")
+        self.assertEqual(self._request(session={})[0], "replica,default")
+
+        # A copy taken after that write is in place: back on the replica.
+        self.snapshot_at = time.time() + 1
+        self.assertEqual(self._request(session=session)[0], "replica,default")
+
+    def test_missing_or_stale_replica_falls_back_to_the_primary(self):
+        self.snapshot_at = None
+        self.assertEqual(self._request()[0], "default,default")
+        self.snapshot_at = time.time() - 61
+        self.assertEqual(self._request()[0], "default,default")
+        self.snapshot_at = time.time() - 59
+        self.assertEqual(self._request()[0], "replica,default")
+
+    def test_caches_only_trust_a_replica_copy_newer_than_their_invalidation(self):
+        seen = []
+
+        @replica.replica_reads
+        def view(request):
+            seen.append((replica.replica_has(self.snapshot_at - 1), replica.replica_has(self.snapshot_at + 1)))
+            return HttpResponse()
+
+        self._request(view)
+        self.assertEqual(seen, [(True, False)])
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    """
+    The async dashboard renders the same numbers through the async and the
+    sync client, with its cache misses computed inline or on the query pool
+    (committed data: the pool threads use their own connections).
+    """
+
+    CONTEXT = (
+        "low_stock_count", "sales_today_count", "sales_today_total", "outstanding_debt",
+        "best_sellers", "best_customers", "cache_stats",
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.pen = Item.objects.create(name="Pen", sku="DSH-001", sell_price=Decimal("4.00"), low_stock_threshold=5)
+        create_movements([
+            StockMovement(item=self.pen, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=7),
+        ])
+        Item.objects.create(name="Nib", sku="DSH-002", low_stock_threshold=5)
+        self.ana = Customer.objects.create(name="Ana")
+        sale = create_sale(Sale(customer=self.ana), [SaleItem(item=self.pen, quantity=3, unit_price=Decimal("4.00"))])
+        Payment.objects.create(sale=sale, amount=Decimal("5.00"))
+        self.user = get_user_model().objects.create_user("till", password="x")
+
+    def _context(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {key: response.context[key] for key in self.CONTEXT}
+
+    async def test_async_and_sync_clients_render_the_same_context(self):
+        await self.async_client.aforce_login(self.user)
+        await sync_to_async(self.client.force_login)(self.user)
+        for threads in (1, 3):
+            with self.subTest(threads=threads), override_settings(PARALLEL_QUERY_THREADS=threads):
+                await sync_to_async(cache.clear)()
+                context = self._context(await self.async_client.get(reverse("dashboard")))
+                self.assertEqual(context["low_stock_count"], 2)
+                self.assertEqual((context["sales_today_count"], context["sales_today_total"]), (1, Decimal("12.00")))
+                self.assertEqual(context["outstanding_debt"], Decimal("7.00"))
+                self.assertEqual([(r["item__sku"], r["qty"]) for r in context["best_sellers"]], [("DSH-001", 3)])
+                self.assertEqual([a.customer_id for a in context["best_customers"]], [self.ana.pk])
+                self.assertIsNone(context["cache_stats"])
+
+                # Served from the cache this time; same values either way.
+                sync_context = await sync_to_async(lambda: self._context(self.client.get(reverse("dashboard"))))()
+                self.assertEqual(sync_context, context)
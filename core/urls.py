@@ -1,6 +1,12 @@
 from django.urls import path
-from .views import dashboard
+from .views import dashboard, job_action, job_detail, job_file, jobs_list, metrics, site_settings_edit
 
 urlpatterns = [
     path("", dashboard, name="dashboard"),
-]
\ No newline at end of file
+    path("metrics", metrics, name="metrics"),
+    path("settings/", site_settings_edit, name="site_settings"),
+    path("jobs/", jobs_list, name="jobs"),
+    path("jobs/<int:pk>/", job_detail, name="job_detail"),
+    path("jobs/<int:pk>/<str:action>/", job_action, name="job_action"),
+    path("jobs/<int:pk>/file", job_file, name="job_file"),
+]
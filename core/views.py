@@ -1,105 +1,132 @@
-from datetime import timedelta
-from decimal import Decimal
-
+from asgiref.sync import sync_to_async
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, F
-from django.shortcuts import render
-from django.utils import timezone
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
-from inventory.models import Item
-from sales.models import Sale, SaleItem, Payment
-from customers.models import Customer
+from core.permissions import is_manager
+from core.replica import replica_reads
 
+from . import jobs
+from . import metrics as app_metrics
+from .dashboard import aget_metrics, cache_stats
+from .forms import SiteSettingsForm
+from .models import Job, SiteSettings
+from .site_settings import get_site_settings
 
-DEFAULT_LOW_STOCK = 5  # later we’ll move this into a Settings table
+JOBS_PAGE_SIZE = 100
 
 
 @login_required
-def dashboard(request):
-    now = timezone.now()
-    today = timezone.localdate()
-
-    # --- Low stock count ---
-    # Stock is aggregated; threshold is per-item so we finalize in Python.
-    items = (
-        Item.objects.filter(is_active=True)
-        .annotate(stock=Sum("movements__quantity_change"))
-        .only("id", "low_stock_threshold", "is_active")
-    )
-
-    low_stock_count = 0
-    for it in items:
-        stock = int(it.stock or 0)
-        threshold = it.low_stock_threshold if it.low_stock_threshold is not None else DEFAULT_LOW_STOCK
-        if stock <= threshold:
-            low_stock_count += 1
-
-    # --- Sales today ---
-    sales_today = Sale.objects.filter(created_at__date=today)
-    sales_today_count = sales_today.count()
-    sales_today_total = sales_today.aggregate(s=Sum("total"))["s"] or Decimal("0.00")
-
-    # --- Outstanding debt (all-time) ---
-    # Total owed = total sales - total payments (simple + accurate)
-    total_sales = Sale.objects.aggregate(s=Sum("total"))["s"] or Decimal("0.00")
-    total_paid = Payment.objects.aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    outstanding_debt = total_sales - total_paid
-
-    # --- Best sellers (last 30 days) ---
-    start_30 = now - timedelta(days=30)
-    best_sellers = (
-        SaleItem.objects
-        .filter(sale__created_at__gte=start_30)
-        .values("item__id", "item__name", "item__sku")
-        .annotate(
-            qty=Sum("quantity"),
-            revenue=Sum("line_total"),
-        )
-        .order_by("-qty")[:10]
-    )
-
-    # --- Best customers (last 90 days) ---
-    start_90 = now - timedelta(days=90)
-
-    # spent by customer (ignore walk-ins)
-    spent_rows = (
-        Sale.objects.filter(created_at__gte=start_90, customer__isnull=False)
-        .values("customer_id")
-        .annotate(spent=Sum("total"))
-    )
-    spent_map = {r["customer_id"]: (r["spent"] or Decimal("0.00")) for r in spent_rows}
-
-    # paid by customer (same window, based on payment time)
-    paid_rows = (
-        Payment.objects.filter(created_at__gte=start_90, sale__customer__isnull=False)
-        .values("sale__customer_id")
-        .annotate(paid=Sum("amount"))
-    )
-    paid_map = {r["sale__customer_id"]: (r["paid"] or Decimal("0.00")) for r in paid_rows}
-
-    customer_ids = list(spent_map.keys())
-    customers = Customer.objects.filter(id__in=customer_ids, is_active=True).only("id", "name")
-
-    best_customers = []
-    for c in customers:
-        spent = spent_map.get(c.id, Decimal("0.00"))
-        paid = paid_map.get(c.id, Decimal("0.00"))
-        balance = spent - paid
-        best_customers.append({
-            "customer": c,
-            "spent": spent,
-            "paid": paid,
-            "balance": balance,
-        })
-
-    best_customers.sort(key=lambda x: x["spent"], reverse=True)
-    best_customers = best_customers[:10]
+@replica_reads
+async def dashboard(request):
+    # Every card is cached separately and dropped when a write touches it
+    # (see core.dashboard), so refreshing the page is mostly cache reads; the
+    # cards that do need computing run at the same time (core.parallel).
+    metrics = await aget_metrics()
+    return await sync_to_async(_render_dashboard)(request, metrics)
+
 
+def _render_dashboard(request, metrics):
+    knobs = get_site_settings()
     return render(request, "core/dashboard.html", {
-        "low_stock_count": low_stock_count,
-        "sales_today_count": sales_today_count,
-        "sales_today_total": sales_today_total,
-        "outstanding_debt": outstanding_debt,
-        "best_sellers": best_sellers,
-        "best_customers": best_customers,
-    })
\ No newline at end of file
+        "best_sellers_days": knobs.best_sellers_days,
+        "best_customers_days": knobs.best_customers_days,
+        "low_stock_count": metrics["low_stock_count"],
+        "sales_today_count": metrics["sales_today"]["count"],
+        "sales_today_total": metrics["sales_today"]["total"],
+        "outstanding_debt": metrics["outstanding_debt"],
+        "best_sellers": metrics["best_sellers"],
+        "best_customers": metrics["best_customers"],
+        "cache_stats": cache_stats() if is_manager(request.user) else None,
+    })
+
+
+def metrics(request):
+    # Prometheus scrape endpoint; formatting happens only here.
+    if not app_metrics.scrape_allowed(request):
+        return HttpResponseForbidden("Forbidden\n", content_type="text/plain")
+    return HttpResponse(app_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _require_manager(request):
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can change settings or see background jobs.")
+
+
+@login_required
+def site_settings_edit(request):
+    _require_manager(request)
+    current = SiteSettings.objects.filter(pk=1).first() or SiteSettings(pk=1)
+    form = SiteSettingsForm(request.POST or None, instance=current)
+    if request.method == "POST" and form.is_valid():
+        form.save()
+        messages.success(request, "Settings saved.")
+        return redirect("site_settings")
+    return render(request, "core/settings_form.html", {"form": form})
+
+
+@login_required
+def jobs_list(request):
+    _require_manager(request)
+    tasks = {t.name: t for t in jobs.manual_tasks()}
+    if request.method == "POST":
+        entry = tasks.get(request.POST.get("task", ""))
+        if entry is None:
+            raise Http404("Unknown task")
+        job = jobs.enqueue(entry.name, priority=10 if request.POST.get("urgent") else 0, user=request.user, unique=True)
+        messages.success(request, f"{entry.label}: job #{job.pk} queued.")
+        return redirect("job_detail", pk=job.pk)
+
+    status = request.GET.get("status", "")
+    job_rows = Job.objects.select_related("created_by")
+    if status in Job.Status.values:
+        job_rows = job_rows.filter(status=status)
+    counts = jobs.status_counts()
+    return render(request, "core/jobs.html", {
+        "jobs": job_rows[:JOBS_PAGE_SIZE],
+        "statuses": [(value, label, counts[value]) for value, label in Job.Status.choices],
+        "status": status,
+        "tasks": tasks.values(),
+    })
+
+
+@login_required
+def job_detail(request, pk: int):
+    _require_manager(request)
+    job = get_object_or_404(Job.objects.select_related("created_by"), pk=pk)
+    task = jobs.registered().get(job.name)
+    return render(request, "core/job_detail.html", {
+        "job": job,
+        "label": task.label if task else job.name,
+        "has_file": jobs.result_file(job) is not None,
+    })
+
+
+@login_required
+@require_POST
+def job_action(request, pk: int, action: str):
+    # cancel (still queued) or retry (failed / cancelled)
+    _require_manager(request)
+    job = get_object_or_404(Job, pk=pk)
+    if action == "cancel":
+        done = jobs.cancel(job)
+    elif action == "retry":
+        done = jobs.requeue(job)
+    else:
+        raise Http404("Unknown action")
+    if not done:
+        messages.error(request, f"Job #{job.pk} is {job.get_status_display().lower()}; can't {action} it now.")
+    return redirect("job_detail", pk=job.pk)
+
+
+@login_required
+def job_file(request, pk: int):
+    _require_manager(request)
+    job = get_object_or_404(Job, pk=pk, status=Job.Status.SUCCEEDED)
+    path = jobs.result_file(job)
+    if path is None:
+        raise Http404("This job has no file (or it was purged).")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=job.result.get("filename") or path.name)
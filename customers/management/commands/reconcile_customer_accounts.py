@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.services import find_account_drift, rebuild_customer_accounts
+
+
+class Command(BaseCommand):
+    help = "Diff CustomerAccount rows against a full recompute from sales and payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rebuild all accounts if any drift is found.")
+        parser.add_argument("--limit", type=int, default=50, help="Max mismatches to print.")
+
+    def handle(self, *args, **options):
+        drift = find_account_drift()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Customer accounts match a full recompute."))
+            return
+
+        for customer_id, have, want in drift[:options["limit"]]:
+            self.stdout.write(
+                f"customer {customer_id}: stored spent/paid/balance/last={have}, expected={want}"
+            )
+
+        if not options["fix"]:
+            raise CommandError(f"{len(drift)} account(s) out of sync. Re-run with --fix to rebuild.")
+
+        count = rebuild_customer_accounts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} customer account(s)."))
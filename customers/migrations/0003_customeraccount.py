@@ -0,0 +1,105 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Max, Sum
+
+
+def backfill_accounts(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    Payment = apps.get_model("sales", "Payment")
+    CustomerAccount = apps.get_model("customers", "CustomerAccount")
+
+    totals = {}
+    for customer_id, spent, last in (
+        Sale.objects.filter(customer__isnull=False)
+        .order_by()
+        .values("customer_id")
+        .annotate(spent=Sum("total"), last=Max("created_at"))
+        .values_list("customer_id", "spent", "last")
+    ):
+        totals[customer_id] = [spent or Decimal("0.00"), Decimal("0.00"), last]
+
+    for customer_id, paid in (
+        Payment.objects.filter(sale__customer__isnull=False)
+        .order_by()
+        .values("sale__customer_id")
+        .annotate(paid=Sum("amount"))
+        .values_list("sale__customer_id", "paid")
+    ):
+        totals.setdefault(customer_id, [Decimal("0.00"), Decimal("0.00"), None])[1] = paid or Decimal("0.00")
+
+    CustomerAccount.objects.bulk_create(
+        [
+            CustomerAccount(
+                customer_id=customer_id,
+                lifetime_spent=spent,
+                lifetime_paid=paid,
+                balance=spent - paid,
+                last_sale_at=last,
+            )
+            for customer_id, (spent, paid, last) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0002_customer_is_active"),
+        ("sales", "0003_sale_paid_amount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerAccount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "lifetime_spent",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "lifetime_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("last_sale_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="account",
+                        to="customers.customer",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["balance"], name="customers_c_balance_10d653_idx"
+                    ),
+                    models.Index(
+                        fields=["last_sale_at"], name="customers_c_last_sa_443bfd_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_accounts, migrations.RunPython.noop),
+    ]
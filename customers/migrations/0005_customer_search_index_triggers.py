@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:45
+
+from django.db import migrations
+
+from core.search import reinstall_fts
+
+
+def reinstall_customer_search_index(apps, schema_editor):
+    # The update trigger now only fires for the indexed columns.
+    reinstall_fts("customers_customer_fts", schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0004_customer_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reinstall_customer_search_index, migrations.RunPython.noop
+        ),
+    ]
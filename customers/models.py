@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
 
+from core.dashboard import invalidate_dashboard
+
 # Create your models here.
 class Customer(models.Model):
     name = models.CharField(max_length=160)
@@ -23,4 +25,31 @@ class Customer(models.Model):
         ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_dashboard("customer")
+
+
+class CustomerAccount(models.Model):
+    """
+    Running per-customer totals (lifetime spent/paid/balance, last sale).
+    Updated incrementally by Sale and Payment writes; reconcile with
+    `manage.py reconcile_customer_accounts`.
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name="account")
+    lifetime_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    lifetime_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_sale_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["balance"]),
+            models.Index(fields=["last_sale_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.customer}: {self.balance}"
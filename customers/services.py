@@ -0,0 +1,141 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from sales.models import Payment, Sale
+from .models import CustomerAccount
+
+
+ZERO = Decimal("0.00")
+
+
+def apply_account_deltas(customer_id, spent=ZERO, paid=ZERO, last_sale_at=None):
+    """
+    Adds spent/paid deltas to a customer's account row (creating it if missing).
+    Safe under concurrency: everything is an F() update.
+    """
+    if not customer_id or (not spent and not paid and last_sale_at is None):
+        return
+
+    now = timezone.now()
+    CustomerAccount.objects.bulk_create(
+        [CustomerAccount(customer_id=customer_id, updated_at=now)],
+        ignore_conflicts=True,
+    )
+
+    updates = {
+        "lifetime_spent": F("lifetime_spent") + spent,
+        "lifetime_paid": F("lifetime_paid") + paid,
+        "balance": F("balance") + (spent - paid),
+        "updated_at": now,
+    }
+    if last_sale_at is not None:
+        updates["last_sale_at"] = Greatest(Coalesce("last_sale_at", Value(last_sale_at)), Value(last_sale_at))
+    CustomerAccount.objects.filter(customer_id=customer_id).update(**updates)
+
+
+def apply_account_paid_delta_for_sale(sale_id, paid):
+    """Payment posted/removed: bump lifetime_paid on whichever customer owns the sale."""
+    if not paid:
+        return
+    customer_id = Sale.objects.filter(pk=sale_id).values_list("customer_id", flat=True).first()
+    apply_account_deltas(customer_id, paid=paid)
+
+
+def refresh_last_sale_at(customer_id):
+    """Used when a sale moves away from a customer (the max may go down)."""
+    if not customer_id:
+        return
+    last = Sale.objects.filter(customer_id=customer_id).aggregate(m=Max("created_at"))["m"]
+    CustomerAccount.objects.filter(customer_id=customer_id).update(last_sale_at=last)
+
+
+def sync_account_for_sale_save(old, sale):
+    """
+    old: {"customer_id", "total", "paid_amount"} as stored before the save, or None on create.
+    Moves the sale's contribution between customer accounts as needed.
+    """
+    if old is None:
+        apply_account_deltas(sale.customer_id, spent=sale.total, last_sale_at=sale.created_at)
+        return
+
+    if old["customer_id"] == sale.customer_id:
+        apply_account_deltas(sale.customer_id, spent=sale.total - old["total"])
+        return
+
+    # Customer changed: move the whole sale (total + what was already paid).
+    apply_account_deltas(old["customer_id"], spent=-old["total"], paid=-old["paid_amount"])
+    refresh_last_sale_at(old["customer_id"])
+    apply_account_deltas(
+        sale.customer_id, spent=sale.total, paid=old["paid_amount"], last_sale_at=sale.created_at
+    )
+
+
+def compute_customer_accounts() -> dict:
+    """
+    Full recompute from Sale/Payment: {customer_id: (spent, paid, last_sale_at)}.
+    This is what the incremental rows replace; only reconcile should call it.
+    """
+    result = {}
+    for customer_id, spent, last in (
+        Sale.objects.filter(customer__isnull=False)
+        .order_by()
+        .values("customer_id")
+        .annotate(spent=Sum("total"), last=Max("created_at"))
+        .values_list("customer_id", "spent", "last")
+    ):
+        result[customer_id] = [spent or ZERO, ZERO, last]
+
+    for customer_id, paid in (
+        Payment.objects.filter(sale__customer__isnull=False)
+        .order_by()
+        .values("sale__customer_id")
+        .annotate(paid=Sum("amount"))
+        .values_list("sale__customer_id", "paid")
+    ):
+        result.setdefault(customer_id, [ZERO, ZERO, None])[1] = paid or ZERO
+
+    return {cid: tuple(v) for cid, v in result.items()}
+
+
+def find_account_drift() -> list[tuple]:
+    """
+    [(customer_id, stored (spent, paid, balance, last_sale_at), expected (...))] for mismatches.
+    """
+    expected = compute_customer_accounts()
+    stored = {
+        a.customer_id: (a.lifetime_spent, a.lifetime_paid, a.balance, a.last_sale_at)
+        for a in CustomerAccount.objects.all()
+    }
+
+    drift = []
+    for customer_id in sorted(set(expected) | set(stored)):
+        spent, paid, last = expected.get(customer_id, (ZERO, ZERO, None))
+        want = (spent, paid, spent - paid, last)
+        have = stored.get(customer_id, (ZERO, ZERO, ZERO, None))
+        if have != want:
+            drift.append((customer_id, have, want))
+    return drift
+
+
+@transaction.atomic
+def rebuild_customer_accounts() -> int:
+    """Recreates every CustomerAccount row from a full recompute. Returns rows written."""
+    now = timezone.now()
+    rows = [
+        CustomerAccount(
+            customer_id=customer_id,
+            lifetime_spent=spent,
+            lifetime_paid=paid,
+            balance=spent - paid,
+            last_sale_at=last,
+            updated_at=now,
+        )
+        for customer_id, (spent, paid, last) in compute_customer_accounts().items()
+    ]
+    CustomerAccount.objects.all().delete()
+    CustomerAccount.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
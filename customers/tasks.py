@@ -0,0 +1,12 @@
+"""Background tasks (core.jobs) for customer accounts."""
+from core.jobs import task
+
+from .services import find_account_drift, rebuild_customer_accounts
+
+
+@task("customers.reconcile_accounts", label="Reconcile customer accounts", manual=True)
+def reconcile_accounts(job):
+    # Same as `manage.py reconcile_customer_accounts --fix`
+    drift = find_account_drift()
+    rebuilt = rebuild_customer_accounts() if drift else 0
+    return {"drifted": len(drift), "rebuilt": rebuilt}
@@ -1,3 +1,141 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from inventory.models import Item, StockMovement
+from inventory.services import create_movements
+from sales.models import Payment, Sale, SaleItem
+from sales.services import create_sale
+
+from .models import Customer, CustomerAccount
+from .services import find_account_drift
+
+
+class CustomerAccountTests(TestCase):
+    """CustomerAccount must match a full Sale/Payment recompute after every write."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = Item.objects.create(name="Sketchbook", sku="SKB-001", sell_price=Decimal("10.00"))
+        create_movements([
+            StockMovement(item=cls.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=100),
+        ])
+
+    def setUp(self):
+        self.ana = Customer.objects.create(name="Ana")
+        self.bruno = Customer.objects.create(name="Bruno")
+
+    def _sale(self, customer, qty=1):
+        return create_sale(
+            Sale(customer=customer), [SaleItem(item=self.item, quantity=qty, unit_price=self.item.sell_price)]
+        )
+
+    def _account(self, customer):
+        account = CustomerAccount.objects.filter(customer=customer).first()
+        if account is None:
+            return (Decimal("0.00"),) * 3
+        return account.lifetime_spent, account.lifetime_paid, account.balance
+
+    def assertMatchesRecompute(self):
+        self.assertEqual(find_account_drift(), [])
+
+    def test_sale_create(self):
+        self._sale(self.ana, 2)
+        self.assertEqual(self._account(self.ana), (Decimal("20.00"), Decimal("0.00"), Decimal("20.00")))
+        self.assertMatchesRecompute()
+
+    def test_moving_a_sale_to_another_customer(self):
+        sale = self._sale(self.ana, 3)
+        Payment.objects.create(sale=sale, amount=Decimal("5.00"))
+        sale.customer = self.bruno
+        sale.save()
+
+        self.assertEqual(self._account(self.ana), (Decimal("0.00"), Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(self._account(self.bruno), (Decimal("30.00"), Decimal("5.00"), Decimal("25.00")))
+        self.assertIsNone(CustomerAccount.objects.get(customer=self.ana).last_sale_at)
+        self.assertMatchesRecompute()
+
+    def test_payment_add_edit_delete(self):
+        sale = self._sale(self.ana, 3)
+        payment = Payment.objects.create(sale=sale, amount=Decimal("10.00"))
+        self.assertEqual(self._account(self.ana), (Decimal("30.00"), Decimal("10.00"), Decimal("20.00")))
+        self.assertMatchesRecompute()
+
+        payment.amount = Decimal("25.00")
+        payment.save()
+        self.assertEqual(self._account(self.ana), (Decimal("30.00"), Decimal("25.00"), Decimal("5.00")))
+        self.assertMatchesRecompute()
+
+        payment.delete()
+        self.assertEqual(self._account(self.ana), (Decimal("30.00"), Decimal("0.00"), Decimal("30.00")))
+        self.assertMatchesRecompute()
+
+    def test_sale_delete(self):
+        keep = self._sale(self.ana, 1)
+        gone = self._sale(self.ana, 2)
+        Payment.objects.create(sale=gone, amount=Decimal("15.00"))
+        gone.delete()
+
+        self.assertEqual(self._account(self.ana), (Decimal("10.00"), Decimal("0.00"), Decimal("10.00")))
+        keep.refresh_from_db()
+        self.assertEqual(CustomerAccount.objects.get(customer=self.ana).last_sale_at, keep.created_at)
+        self.assertMatchesRecompute()
+
+
+class AsyncCustomerDetailTests(TransactionTestCase):
+    """
+    customer_detail (async, reads through core.parallel) renders the same
+    context through the async and the sync client, with or without the pool.
+    """
+
+    def setUp(self):
+        item = Item.objects.create(name="Sketchbook", sku="SKB-001", sell_price=Decimal("10.00"))
+        create_movements([
+            StockMovement(item=item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=100),
+        ])
+        self.ana = Customer.objects.create(name="Ana")
+        self.sales = [
+            create_sale(Sale(customer=self.ana), [SaleItem(item=item, quantity=qty, unit_price=item.sell_price)])
+            for qty in (1, 2)
+        ]
+        Payment.objects.create(sale=self.sales[1], amount=Decimal("15.00"))
+        self.newcomer = Customer.objects.create(name="Bruno")
+        self.user = get_user_model().objects.create_user("till", password="x")
+
+    def _context(self, response):
+        self.assertEqual(response.status_code, 200)
+        context = {key: response.context[key] for key in ("customer", "total_spent", "total_paid", "outstanding")}
+        context["sales"] = [(s.pk, s.paid_amount, s.status) for s in response.context["sales"]]
+        return context
+
+    async def _both(self, pk):
+        url = reverse("customers:detail", args=[pk])
+        context = self._context(await self.async_client.get(url))
+        self.assertEqual(await sync_to_async(lambda: self._context(self.client.get(url)))(), context)
+        return context
+
+    async def test_async_and_sync_clients_render_the_same_context(self):
+        await self.async_client.aforce_login(self.user)
+        await sync_to_async(self.client.force_login)(self.user)
+        for threads in (1, 3):
+            with self.subTest(threads=threads), override_settings(PARALLEL_QUERY_THREADS=threads):
+                context = await self._both(self.ana.pk)
+                self.assertEqual(context["customer"], self.ana)
+                self.assertEqual(
+                    (context["total_spent"], context["total_paid"], context["outstanding"]),
+                    (Decimal("30.00"), Decimal("15.00"), Decimal("15.00")),
+                )
+                self.assertEqual(context["sales"], [
+                    (self.sales[1].pk, Decimal("15.00"), Sale.Status.PARTIAL),
+                    (self.sales[0].pk, Decimal("0.00"), Sale.Status.UNPAID),
+                ])
+
+                # No account row yet: zero totals.
+                context = await self._both(self.newcomer.pk)
+                self.assertEqual((context["sales"], context["outstanding"]), ([], Decimal("0.00")))
+
+                response = await self.async_client.get(reverse("customers:detail", args=[self.newcomer.pk + 1]))
+                self.assertEqual(response.status_code, 404)
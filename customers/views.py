@@ -1,32 +1,41 @@
-from decimal import Decimal
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-from django.db.models import Q, Sum
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
 
+from core.pagination import is_htmx, keyset_page
+from core.parallel import gather_queries
+from core.replica import replica_reads
+from core.search import search_filter
+
 from .forms import CustomerForm
-from .models import Customer
-from sales.models import Sale, Payment
+from .models import Customer, CustomerAccount
+from sales.models import Sale
 
 # Create your views here.
 @login_required
+@replica_reads
 def customers_list(request):
     q = request.GET.get("q", "").strip()
 
     customers = Customer.objects.all()
 
     if q:
-        customers = customers.filter(
-            Q(name__icontains=q) |
-            Q(phone__icontains=q) |
-            Q(email__icontains=q) |
-            Q(instagram_handle__icontains=q)
+        # FTS5 prefix search; phone numbers match on digits only (falls back to icontains)
+        customers = search_filter(
+            customers, q, "customers_customer_fts",
+            ["name", "phone", "email", "instagram_handle"],
+            phone_column="phone_digits",
         )
 
-    customers = customers.order_by("name")
+    customers, next_url = keyset_page(request, customers, ["name", "id"])
+    if is_htmx(request) and request.GET.get("cursor"):
+        return render(request, "customers/partials/customer_rows.html", {"customers": customers, "next_url": next_url})
 
     return render(request, "customers/list.html", {
         "customers": customers,
+        "next_url": next_url,
         "q": q,
     })
 
@@ -53,23 +62,25 @@ def customer_edit(request, pk: int):
 
 
 @login_required
-def customer_detail(request, pk: int):
-    customer = get_object_or_404(Customer, pk=pk)
-
-    sales = (
-        Sale.objects.filter(customer=customer)
-        .prefetch_related("payments")
-        .order_by("-created_at")
+@replica_reads
+async def customer_detail(request, pk: int):
+    # Independent reads, run at the same time (core.parallel); the page takes
+    # as long as the slowest one.
+    # paid_amount/balance are stored on Sale, and the totals on the customer's
+    # account row, so no per-row payment queries and no aggregates.
+    customer, sales, account = await gather_queries(
+        lambda: Customer.objects.filter(pk=pk).first(),
+        lambda: list(Sale.objects.filter(customer_id=pk).order_by("-created_at")),
+        lambda: CustomerAccount.objects.filter(customer_id=pk).first(),
     )
+    if customer is None:
+        raise Http404("No Customer matches the given query.")
+    account = account or CustomerAccount(customer=customer)
 
-    total_spent = Sale.objects.filter(customer=customer).aggregate(s=Sum("total"))["s"] or Decimal("0.00")
-    total_paid = Payment.objects.filter(sale__customer=customer).aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    outstanding = total_spent - total_paid
-
-    return render(request, "customers/detail.html", {
+    return await sync_to_async(render)(request, "customers/detail.html", {
         "customer": customer,
         "sales": sales,
-        "total_spent": total_spent,
-        "total_paid": total_paid,
-        "outstanding": outstanding,
+        "total_spent": account.lifetime_spent,
+        "total_paid": account.lifetime_paid,
+        "outstanding": account.balance,
     })
@@ -1,5 +1,11 @@
-from django.contrib import admin
-from .models import Category, Item, StockMovement
+from django import forms
+from django.contrib import admin, messages
+from django.db import transaction
+
+from .models import (
+    ArchivedStockMovement, Category, Item, LedgerCompaction, StockBalance, StockCount, StockCountLine, StockMovement,
+)
+from .services import LedgerClosed, _local_midnight, check_ledger_open, compacted_before
 
 # Register your models here.
 @admin.register(Category)
@@ -17,9 +23,110 @@ class ItemAdmin(admin.ModelAdmin):
     ordering = ("name",)
 
 
+class StockMovementAdminForm(forms.ModelForm):
+    class Meta:
+        model = StockMovement
+        fields = "__all__"
+
+    def clean(self):
+        cleaned = super().clean()
+        # Compacted periods are archived: a movement can't be dated into one
+        # (StockMovement.save would raise LedgerClosed), so say so on the form.
+        try:
+            check_ledger_open(cleaned.get("created_at"))
+        except LedgerClosed as e:
+            self.add_error("created_at", str(e))
+        return cleaned
+
+
+def _in_closed_period(movement) -> bool:
+    try:
+        check_ledger_open(movement.created_at)
+    except LedgerClosed:
+        return True
+    return False
+
+
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
-    list_display = ("created_at", "item", "movement_type", "quantity_change", "created_by", "sale_id")
+    form = StockMovementAdminForm
+    list_display = ("created_at", "item", "movement_type", "quantity_change", "created_by", "sale_id", "stock_count")
     search_fields = ("item__name", "item__sku", "note")
     list_filter = ("movement_type", "created_at")
-    autocomplete_fields = ("item",)
\ No newline at end of file
+    autocomplete_fields = ("item",)
+
+    # Opening balances written by compaction are dated just before the cutoff:
+    # read-only, like the archive they summarize.
+    def has_change_permission(self, request, obj=None):
+        if obj is not None and _in_closed_period(obj):
+            return False
+        return super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and _in_closed_period(obj):
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        # One by one through StockMovement.delete(), which keeps the balances
+        # and checkpoints in step (QuerySet.delete() would skip it).
+        cutoff = compacted_before()
+        if cutoff:
+            skipped = queryset.filter(created_at__lt=_local_midnight(cutoff)).count()
+            if skipped:
+                messages.warning(request, f"Skipped {skipped} movement(s) in the compacted (archived) period.")
+            queryset = queryset.filter(created_at__gte=_local_midnight(cutoff))
+        with transaction.atomic():
+            for movement in queryset:
+                movement.delete()
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ("item", "quantity", "updated_at")
+    search_fields = ("item__name", "item__sku")
+    readonly_fields = ("item", "quantity", "updated_at")
+
+
+class StockCountLineInline(admin.TabularInline):
+    model = StockCountLine
+    extra = 0
+    autocomplete_fields = ("item",)
+    readonly_fields = ("expected", "counted_at")
+
+
+@admin.register(StockCount)
+class StockCountAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "created_at", "created_by", "posted_at")
+    list_filter = ("status",)
+    search_fields = ("name", "note")
+    readonly_fields = ("status", "posted_at", "posted_by")
+    inlines = [StockCountLineInline]
+
+
+@admin.register(LedgerCompaction)
+class LedgerCompactionAdmin(admin.ModelAdmin):
+    list_display = ("cutoff", "movements_archived", "openings_written", "created_at", "created_by")
+    readonly_fields = ("cutoff", "movements_archived", "openings_written", "created_at", "created_by")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedStockMovement)
+class ArchivedStockMovementAdmin(admin.ModelAdmin):
+    # The audit trail: read-only.
+    list_display = ("id", "created_at", "item", "movement_type", "quantity_change", "created_by", "sale_id", "stock_count")
+    search_fields = ("item__name", "item__sku", "note")
+    list_filter = ("movement_type", "compaction")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
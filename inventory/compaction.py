@@ -0,0 +1,135 @@
+"""
+Ledger compaction: keeps the StockMovement table bounded.
+
+Everything dated before a month boundary (the cutoff) is copied, unchanged
+and with the same ids, into ArchivedStockMovement and deleted from the hot
+table; each item's total over that period comes back as one OPENING movement
+dated the last instant before the cutoff. Sums over the hot ledger, the
+StockBalance rows and the month-end checkpoints are the same before and after,
+so nothing that reads them has to know. stock_as_of reads the archive for
+dates before the cutoff, and movements can no longer be dated into it (see
+invalidate_checkpoints_from).
+
+Compacting again later folds the previous OPENING rows into the new ones;
+they aren't archived, since the archive already has what they summed.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Sum
+
+from .models import ArchivedStockMovement, LedgerCompaction, StockMovement
+from .services import _local_midnight, build_stock_checkpoints, compacted_before
+
+
+class CompactionError(ValueError):
+    """The cutoff isn't a closed month boundary after the previous one."""
+
+
+def retention_months() -> int:
+    return getattr(settings, "STOCK_LEDGER_RETENTION_MONTHS", 24)
+
+
+def default_cutoff(today: date) -> date:
+    """First day of the month `retention_months()` before this one."""
+    months = today.year * 12 + today.month - 1 - retention_months()
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def check_cutoff(cutoff: date, today: date):
+    if cutoff.day != 1:
+        raise CompactionError("The cutoff must be the first day of a month.")
+    if cutoff > today.replace(day=1):
+        raise CompactionError("Only closed months can be compacted; the cutoff can't be after this month's first day.")
+    previous = compacted_before()
+    if previous and cutoff <= previous:
+        raise CompactionError(f"The ledger is already compacted before {previous}.")
+
+
+def _old_movements(cutoff: date):
+    return StockMovement.objects.filter(created_at__lt=_local_midnight(cutoff))
+
+
+def _item_totals(movements) -> dict:
+    rows = movements.order_by().values("item_id").annotate(total=Sum("quantity_change")).values_list("item_id", "total")
+    return {item_id: int(total or 0) for item_id, total in rows}
+
+
+def plan_compaction(cutoff: date) -> dict:
+    """What compact_ledger(cutoff) would do: {movements, items, openings}."""
+    old = _old_movements(cutoff)
+    totals = _item_totals(old)
+    return {
+        "movements": old.exclude(movement_type=StockMovement.MovementType.OPENING).count(),
+        "items": len(totals),
+        "openings": sum(1 for qty in totals.values() if qty),
+    }
+
+
+def _archive(cutoff: date, compaction: LedgerCompaction) -> int:
+    # One INSERT ... SELECT instead of reading every row into Python; the ORM
+    # can't express it. Previous OPENING rows stay out (they only summed what
+    # the archive already holds).
+    conn = connections[router.db_for_write(ArchivedStockMovement)]
+    qn = conn.ops.quote_name
+    src, dst = StockMovement._meta, ArchivedStockMovement._meta
+    names = ["id", "item", "movement_type", "quantity_change", "note", "sale_id", "stock_count", "created_at", "created_by"]
+    src_cols = ", ".join(qn(src.get_field(n).column) for n in names)
+    dst_cols = ", ".join(qn(dst.get_field(n).column) for n in [*names, "compaction"])
+    created_at = qn(src.get_field("created_at").column)
+    movement_type = qn(src.get_field("movement_type").column)
+    boundary = src.get_field("created_at").get_db_prep_value(_local_midnight(cutoff), conn)
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(dst.db_table)} ({dst_cols}) "
+            f"SELECT {src_cols}, %s FROM {qn(src.db_table)} WHERE {created_at} < %s AND {movement_type} <> %s",
+            [compaction.pk, boundary, StockMovement.MovementType.OPENING],
+        )
+        return cursor.rowcount
+
+
+def compact_ledger(cutoff: date, today: date, user=None, log=None) -> LedgerCompaction:
+    """
+    Compacts every movement dated before `cutoff` (a month's first day, not
+    after this month's). Checkpoints are brought up to the cutoff first, then
+    the archive/delete/openings happen in one transaction.
+    Raises CompactionError for a cutoff that can't be used.
+    """
+    log = log or (lambda msg: None)
+    check_cutoff(cutoff, today)
+    months = build_stock_checkpoints(through=cutoff - timedelta(days=1))
+    if months:
+        log(f"wrote checkpoints for {months} month(s)")
+
+    with transaction.atomic():
+        check_cutoff(cutoff, today)  # again, under the write lock
+        old = _old_movements(cutoff)
+        totals = _item_totals(old)
+
+        compaction = LedgerCompaction.objects.create(cutoff=cutoff, created_by=user)
+        compaction.movements_archived = _archive(cutoff, compaction)
+        log(f"archived {compaction.movements_archived} movement(s)")
+        old.delete()
+
+        opening_at = _local_midnight(cutoff) - timedelta(microseconds=1)
+        openings = StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    item_id=item_id,
+                    movement_type=StockMovement.MovementType.OPENING,
+                    quantity_change=qty,
+                    note=f"Opening balance: movements before {cutoff} archived (compaction #{compaction.pk})",
+                    created_at=opening_at,
+                    created_by=user,
+                )
+                for item_id, qty in sorted(totals.items())
+                if qty
+            ],
+            batch_size=1000,
+        )
+        compaction.openings_written = len(openings)
+        compaction.save(update_fields=["movements_archived", "openings_written"])
+        log(f"wrote {len(openings)} opening balance(s)")
+    return compaction
@@ -0,0 +1,197 @@
+"""
+Cycle counts: counted quantities go into an open StockCount session (scanned
+one at a time or uploaded as a CSV), the variance is always one query against
+the live balances, and posting writes every ADJUSTMENT movement in one bulk
+transaction tagged with the session.
+"""
+import csv
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from .models import Item, StockBalance, StockCount, StockCountLine, StockMovement
+from .services import create_movements
+
+
+# SKU lookups per query when recording a large upload.
+COUNT_BATCH_SIZE = 500
+
+_ZERO = Decimal("0.00")
+
+
+class CountClosed(ValueError):
+    """The session has already been posted."""
+
+
+def _check_open(count: StockCount):
+    if not count.is_open:
+        raise CountClosed(f"{count.name} has already been posted.")
+
+
+def parse_count_csv(fileobj) -> tuple[dict, list]:
+    """
+    Reads a count file with `sku` and `counted` (or `quantity`) columns.
+    Returns ({sku: counted}, errors: [(line, sku, message)]); repeated SKUs
+    are summed, as when counting one item on several shelves.
+    """
+    reader = csv.DictReader(fileobj)
+    if not reader.fieldnames:
+        return {}, [(1, "", "The file is empty.")]
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+    qty_column = next((c for c in ("counted", "quantity", "qty") if c in reader.fieldnames), None)
+    if "sku" not in reader.fieldnames or qty_column is None:
+        return {}, [(1, "", "The file needs a sku column and a counted (or quantity) column.")]
+
+    counts, errors = {}, []
+    for row in reader:
+        sku = (row.get("sku") or "").strip()
+        raw = (row.get(qty_column) or "").strip()
+        if not sku:
+            errors.append((reader.line_num, "", "sku is required"))
+            continue
+        try:
+            qty = int(raw)
+        except ValueError:
+            errors.append((reader.line_num, sku, f"counted is not a whole number: {raw!r}"))
+            continue
+        if qty < 0:
+            errors.append((reader.line_num, sku, "counted cannot be negative"))
+            continue
+        counts[sku] = counts.get(sku, 0) + qty
+    return counts, errors
+
+
+@transaction.atomic
+def record_counts(count: StockCount, counts: dict, add: bool = False) -> list:
+    """
+    counts: {sku: quantity}. Upserts the session's lines: replaces the counted
+    quantity, or adds to it with add=True (scanning a unit at a time).
+    Returns the SKUs that aren't in the catalog. Raises CountClosed if posted.
+    """
+    # Re-read under the write transaction: the instance may predate a post
+    # that committed since (a scan racing the Post button).
+    count.status = StockCount.objects.select_for_update().values_list("status", flat=True).get(pk=count.pk)
+    _check_open(count)
+    now = timezone.now()
+    unknown = []
+    skus = list(counts)
+
+    for start in range(0, len(skus), COUNT_BATCH_SIZE):
+        chunk = skus[start:start + COUNT_BATCH_SIZE]
+        ids = dict(Item.objects.filter(sku__in=chunk).values_list("sku", "id"))
+        unknown.extend(sku for sku in chunk if sku not in ids)
+
+        current = {}
+        if add:
+            current = dict(
+                count.lines.filter(item_id__in=ids.values()).values_list("item_id", "counted")
+            )
+        lines = [
+            StockCountLine(
+                count=count,
+                item_id=item_id,
+                counted=max(current.get(item_id, 0) + counts[sku], 0),
+                counted_at=now,
+            )
+            for sku, item_id in ids.items()
+        ]
+        StockCountLine.objects.bulk_create(
+            lines,
+            update_conflicts=True,
+            unique_fields=["count", "item"],
+            update_fields=["counted", "counted_at"],
+        )
+    return unknown
+
+
+def variance_lines(count: StockCount):
+    """
+    The session's lines with expected/variance/value annotated: against the
+    live balances while open, against the stored snapshot once posted.
+    One query however many lines.
+    """
+    if count.is_open:
+        expected = Coalesce(F("item__stock_balance__quantity"), Value(0))
+    else:
+        expected = Coalesce(F("expected"), Value(0))
+
+    return (
+        count.lines.select_related("item")
+        .annotate(expected_qty=expected)
+        .annotate(variance=ExpressionWrapper(F("counted") - F("expected_qty"), output_field=IntegerField()))
+        .annotate(
+            variance_value=ExpressionWrapper(
+                F("variance") * F("item__cost_price"),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            has_variance=Case(When(variance=0, then=Value(0)), default=Value(1), output_field=IntegerField()),
+        )
+    )
+
+
+def variance_report(count: StockCount, limit: int | None = None) -> dict:
+    """
+    Lines with a variance first (largest first), then the matching ones, plus
+    totals (lines, lines_off, units_over, units_short, value_over,
+    value_short) from one aggregate over the same query.
+    """
+    lines = variance_lines(count)
+    totals = lines.aggregate(
+        lines=Count("id"),
+        lines_off=Count("id", filter=~Q(variance=0)),
+        units_over=Sum("variance", filter=Q(variance__gt=0), default=0),
+        units_short=Sum(-F("variance"), filter=Q(variance__lt=0), default=0),
+        value_over=Sum("variance_value", filter=Q(variance__gt=0)),
+        value_short=Sum(-F("variance_value"), filter=Q(variance__lt=0)),
+    )
+    for key in ("value_over", "value_short"):
+        totals[key] = (totals[key] or _ZERO).quantize(_ZERO)
+
+    ordered = lines.order_by("-has_variance", Abs("variance").desc(), "item__name")
+    return {
+        "lines": list(ordered[:limit] if limit else ordered),
+        "truncated": bool(limit) and totals["lines"] > limit,
+        "totals": totals,
+    }
+
+
+@transaction.atomic
+def post_count(count: StockCount, user=None) -> list:
+    """
+    Posts the session: snapshots each line's expected balance, then writes one
+    ADJUSTMENT movement per line that differs, all in one bulk insert.
+    Returns the created movements. Raises CountClosed if already posted.
+    """
+    now = timezone.now()
+    # Claim the session first so a double submit can't post twice.
+    claimed = StockCount.objects.filter(pk=count.pk, status=StockCount.Status.OPEN).update(
+        status=StockCount.Status.POSTED, posted_at=now, posted_by=user,
+    )
+    if not claimed:
+        raise CountClosed(f"{count.name} has already been posted.")
+
+    balance = StockBalance.objects.filter(item_id=OuterRef("item_id")).values("quantity")[:1]
+    count.lines.update(expected=Coalesce(Subquery(balance), Value(0)))
+
+    movements = [
+        StockMovement(
+            item_id=item_id,
+            movement_type=StockMovement.MovementType.ADJUSTMENT,
+            quantity_change=counted - expected,
+            note=f"Cycle count #{count.pk}: counted {counted}, expected {expected}",
+            created_at=now,
+            created_by=user,
+            stock_count=count,
+        )
+        for item_id, counted, expected in count.lines.values_list("item_id", "counted", "expected")
+        if counted != expected
+    ]
+    created = create_movements(movements)
+
+    count.status, count.posted_at, count.posted_by = StockCount.Status.POSTED, now, user
+    return created
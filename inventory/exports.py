@@ -0,0 +1,28 @@
+"""CSV exports of the stock movements ledger (filtered like item_detail) and cycle count variances."""
+from core.csv_export import stream_rows
+
+from .models import ArchivedStockMovement, StockMovement
+from .counts import variance_lines
+from .services import filter_movements
+
+
+def export_movements(item_id=None, as_of=None, archived=False):
+    # archived=True: the movements taken out of the ledger by compaction, same columns.
+    fields = [
+        "id", "created_at", "item_id", "item__sku", "item__name", "movement_type",
+        "quantity_change", "note", "sale_id", "stock_count_id", "created_by__username",
+    ]
+    model = ArchivedStockMovement if archived else StockMovement
+    movements = filter_movements(model.objects.all(), item_id=item_id, as_of=as_of).order_by("pk")
+    header = ["movement_id", "created_at", "item_id", "sku", "item", "type", "quantity_change", "note", "sale_id", "stock_count_id", "created_by"]
+    filename = f"stock_movements_item_{item_id}.csv" if item_id else "stock_movements.csv"
+    if archived:
+        filename = "archived_" + filename
+    return filename, header, stream_rows(movements, fields)
+
+
+def export_count_variance(count):
+    fields = ["item_id", "item__sku", "item__name", "expected_qty", "counted", "variance", "variance_value", "counted_at"]
+    lines = variance_lines(count).order_by("item__name", "item_id")
+    header = ["item_id", "sku", "item", "expected", "counted", "variance", "variance_value", "counted_at"]
+    return f"stock_count_{count.pk}_variance.csv", header, stream_rows(lines, fields)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Item, Category, StockMovement
+from .models import Item, Category, StockCount, StockMovement
 
 
 class ItemForm(forms.ModelForm):
@@ -33,4 +33,34 @@ class StockMovementForm(forms.ModelForm):
         q = self.cleaned_data["quantity_change"]
         if q == 0:
             raise forms.ValidationError("Quantity change cannot be 0.")
-        return q
\ No newline at end of file
+        return q
+
+class ItemImportForm(forms.Form):
+    file = forms.FileField(
+        label="CSV file",
+        help_text="Header row with sku, name and any of: category, cost_price, sell_price, brand, "
+                  "vendor, low_stock_threshold, is_active, notes, opening_stock.",
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Dry run",
+        help_text="Validate and count only; nothing is saved.",
+    )
+
+
+class StockCountForm(forms.ModelForm):
+    class Meta:
+        model = StockCount
+        fields = ["name", "note"]
+
+
+class CountScanForm(forms.Form):
+    sku = forms.CharField(max_length=64, label="SKU")
+    quantity = forms.IntegerField(initial=1, label="Quantity", help_text="Added to what's counted so far; negative to undo.")
+
+
+class CountUploadForm(forms.Form):
+    file = forms.FileField(
+        label="Counts CSV",
+        help_text="Columns sku and counted; replaces the counted quantity of those items.",
+    )
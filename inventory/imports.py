@@ -0,0 +1,257 @@
+"""
+CSV catalog import: upserts Items on sku in batches.
+
+Each batch is validated row by row (bad rows are reported and skipped), then
+written in one transaction: missing categories with one bulk insert, the items
+with bulk_create(update_conflicts=True) on sku, and opening stock for newly
+created items as bulk RESTOCK movements. Only columns present in the file are
+updated on existing items.
+"""
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from core.dashboard import invalidate_dashboard
+
+from .models import Category, Item, StockMovement
+from .services import bump_catalog_version, create_movements, refresh_low_stock
+
+
+# Rows per batch; also keeps the sku IN (...) lookups under SQLite's parameter limit.
+IMPORT_BATCH_SIZE = 500
+
+REQUIRED_COLUMNS = ("sku", "name")
+ITEM_COLUMNS = (
+    "name", "category", "cost_price", "sell_price", "brand", "vendor",
+    "low_stock_threshold", "is_active", "notes",
+)
+OPENING_STOCK_COLUMN = "opening_stock"
+
+_TRUE = {"1", "true", "yes", "y", "active"}
+_FALSE = {"0", "false", "no", "n", "inactive"}
+
+
+class ImportFileError(ValueError):
+    """The file as a whole can't be imported (e.g. missing required columns)."""
+
+
+def _text(value, field, max_length=None):
+    value = (value or "").strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _money(value, field):
+    value = (value or "").strip().replace(",", "")
+    if not value:
+        return Decimal("0.00")
+    try:
+        amount = Decimal(value).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"{field} is not a number: {value!r}")
+    if amount < 0:
+        raise ValueError(f"{field} cannot be negative")
+    return amount
+
+
+def _count(value, field, blank=None):
+    value = (value or "").strip()
+    if not value:
+        return blank
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{field} is not a whole number: {value!r}")
+    if number < 0:
+        raise ValueError(f"{field} cannot be negative")
+    return number
+
+
+def _flag(value, field):
+    value = (value or "").strip().lower()
+    if not value or value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(f"{field} must be yes/no: {value!r}")
+
+
+def parse_row(row: dict, columns: set) -> dict:
+    """Validated field values for one CSV row (only the columns in the file). Raises ValueError."""
+    sku = _text(row.get("sku"), "sku", 64)
+    if not sku:
+        raise ValueError("sku is required")
+    name = _text(row.get("name"), "name", 160)
+    if not name:
+        raise ValueError("name is required")
+
+    values = {"sku": sku, "name": name}
+    if "category" in columns:
+        values["category"] = _text(row.get("category"), "category", 80) or None
+    if "cost_price" in columns:
+        values["cost_price"] = _money(row.get("cost_price"), "cost_price")
+    if "sell_price" in columns:
+        values["sell_price"] = _money(row.get("sell_price"), "sell_price")
+    for field, max_length in (("brand", 80), ("vendor", 120), ("notes", None)):
+        if field in columns:
+            values[field] = _text(row.get(field), field, max_length)
+    if "low_stock_threshold" in columns:
+        values["low_stock_threshold"] = _count(row.get("low_stock_threshold"), "low_stock_threshold")
+    if "is_active" in columns:
+        values["is_active"] = _flag(row.get("is_active"), "is_active")
+    if OPENING_STOCK_COLUMN in columns:
+        values[OPENING_STOCK_COLUMN] = _count(row.get(OPENING_STOCK_COLUMN), OPENING_STOCK_COLUMN, blank=0)
+    return values
+
+
+def _category_ids(names: set, cache: dict) -> dict:
+    """name -> id for `names`, creating missing categories with one bulk insert."""
+    missing = {n for n in names if n not in cache}
+    if missing:
+        Category.objects.bulk_create([Category(name=n) for n in missing], ignore_conflicts=True)
+        cache.update(Category.objects.filter(name__in=missing).values_list("name", "id"))
+    return cache
+
+
+def _item_fields(values, categories) -> dict:
+    fields = {k: v for k, v in values.items() if k not in ("category", OPENING_STOCK_COLUMN)}
+    if categories is not None:
+        fields["category_id"] = categories.get(values.get("category"))
+    return fields
+
+
+def _existing(skus, compare) -> dict:
+    """sku -> tuple of the `compare` field values, for the skus already in the catalog."""
+    rows = Item.objects.filter(sku__in=skus).values_list("sku", *compare)
+    return {row[0]: row[1:] for row in rows}
+
+
+def _write_batch(rows, update_fields, user, categories, result):
+    compare = [("category_id" if f == "category" else f) for f in update_fields if f != "updated_at"]
+    existing = _existing([values["sku"] for _, values in rows], compare)
+
+    if categories is not None:
+        _category_ids({v["category"] for _, v in rows if v.get("category")}, categories)
+
+    items = []
+    for _, values in rows:
+        fields = _item_fields(values, categories)
+        current = existing.get(values["sku"])
+        if current is not None and current == tuple(fields[f] for f in compare):
+            # Re-imports are mostly unchanged rows; skip the write (and the updated_at churn).
+            result["unchanged"] += 1
+            continue
+        items.append(Item(**fields))
+
+    with transaction.atomic():
+        if items:
+            Item.objects.bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=["sku"],
+                update_fields=update_fields,
+            )
+            # bulk_create skips Item.save(); thresholds may have changed
+            refresh_low_stock(Item.objects.filter(sku__in=[it.sku for it in items]))
+
+        # Opening stock only for items this import created, so re-running a file doesn't restock twice.
+        opening = {
+            values["sku"]: values[OPENING_STOCK_COLUMN]
+            for _, values in rows
+            if values.get(OPENING_STOCK_COLUMN) and values["sku"] not in existing
+        }
+        if opening:
+            ids = dict(Item.objects.filter(sku__in=list(opening)).values_list("sku", "id"))
+            movements = create_movements([
+                StockMovement(
+                    item_id=ids[sku],
+                    movement_type=StockMovement.MovementType.RESTOCK,
+                    quantity_change=qty,
+                    note="Opening stock (catalog import)",
+                    created_by=user,
+                )
+                for sku, qty in opening.items()
+            ])
+            result["movements"] += len(movements)
+
+    created = sum(1 for it in items if it.sku not in existing)
+    result["created"] += created
+    result["updated"] += len(items) - created
+
+
+def _count_batch(rows, update_fields, result):
+    # Dry run: nothing is written, and categories are compared by name since they may not exist yet.
+    compare = [("category__name" if f == "category" else f) for f in update_fields if f != "updated_at"]
+    names = [("category" if f == "category__name" else f) for f in compare]
+    existing = _existing([values["sku"] for _, values in rows], compare)
+    for _, values in rows:
+        current = existing.get(values["sku"])
+        if current is None:
+            result["created"] += 1
+        elif current == tuple(values[f] for f in names):
+            result["unchanged"] += 1
+        else:
+            result["updated"] += 1
+
+
+def import_items(fileobj, batch_size: int = IMPORT_BATCH_SIZE, dry_run: bool = False, user=None) -> dict:
+    """
+    Imports a catalog CSV (text file object, header row required: sku, name
+    and any of ITEM_COLUMNS / opening_stock). Returns
+    {rows, created, updated, unchanged, movements, errors: [(line, sku, message)],
+    seconds, rows_per_second}.
+    Raises ImportFileError for a file that can't be read at all.
+    """
+    started = time.perf_counter()
+    reader = csv.DictReader(fileobj)
+    if not reader.fieldnames:
+        raise ImportFileError("The file is empty.")
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+    columns = set(reader.fieldnames)
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+
+    update_fields = [c for c in ITEM_COLUMNS if c in columns] + ["updated_at"]
+    categories = {} if "category" in columns else None
+    result = {"rows": 0, "created": 0, "updated": 0, "unchanged": 0, "movements": 0, "errors": []}
+
+    seen, batch = {}, []
+    for row in reader:
+        line = reader.line_num
+        result["rows"] += 1
+        try:
+            values = parse_row(row, columns)
+        except ValueError as e:
+            result["errors"].append((line, (row.get("sku") or "").strip(), str(e)))
+            continue
+        if values["sku"] in seen:
+            result["errors"].append((line, values["sku"], f"duplicate sku (first on line {seen[values['sku']]})"))
+            continue
+        seen[values["sku"]] = line
+        batch.append((line, values))
+
+        if len(batch) >= batch_size:
+            if dry_run:
+                _count_batch(batch, update_fields, result)
+            else:
+                _write_batch(batch, update_fields, user, categories, result)
+            batch = []
+
+    if batch:
+        if dry_run:
+            _count_batch(batch, update_fields, result)
+        else:
+            _write_batch(batch, update_fields, user, categories, result)
+
+    if not dry_run and (result["created"] or result["updated"]):
+        # bulk_create bypasses Item.save(), so do its side effects once for the whole file.
+        bump_catalog_version()
+        invalidate_dashboard("item")
+
+    result["seconds"] = time.perf_counter() - started
+    result["rows_per_second"] = result["rows"] / result["seconds"] if result["seconds"] else 0
+    return result
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import StockCheckpoint
+from inventory.services import build_stock_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Write month-end stock checkpoints for closed months (resumes after the latest one)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk insert.")
+        parser.add_argument("--through", help="Last month to build, YYYY-MM-DD (any day in the month).")
+        parser.add_argument("--rebuild", action="store_true", help="Drop all checkpoints first.")
+
+    def handle(self, *args, **options):
+        through = None
+        if options["through"]:
+            try:
+                through = datetime.strptime(options["through"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--through must be YYYY-MM-DD")
+
+        if options["rebuild"]:
+            StockCheckpoint.objects.all().delete()
+
+        months = build_stock_checkpoints(
+            batch_size=options["batch_size"],
+            through=through,
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote checkpoints for {months} month(s)."))
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.compaction import (
+    CompactionError, check_cutoff, compact_ledger, default_cutoff, plan_compaction, retention_months,
+)
+from inventory.services import compacted_before, find_stock_balance_drift
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive stock movements older than the retention period (STOCK_LEDGER_RETENTION_MONTHS) and "
+        "replace them with one opening balance movement per item."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before", help="Cutoff, YYYY-MM-DD (first day of a month; default: the retention period's start)."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted.")
+        parser.add_argument("--no-verify", action="store_true", help="Skip the balance check afterwards.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options["before"]:
+            try:
+                cutoff = datetime.strptime(options["before"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--before must be YYYY-MM-DD")
+        else:
+            cutoff = default_cutoff(today)
+            previous = compacted_before()
+            if previous and cutoff <= previous:
+                # Run on a schedule; most months there's nothing new past the retention period.
+                self.stdout.write(f"Nothing to compact: already compacted before {previous}.")
+                return
+            self.stdout.write(f"Keeping {retention_months()} month(s) of detail: compacting before {cutoff}.")
+
+        try:
+            check_cutoff(cutoff, today)
+        except CompactionError as e:
+            raise CommandError(str(e))
+
+        plan = plan_compaction(cutoff)
+        self.stdout.write(
+            f"{plan['movements']} movement(s) to archive, {plan['openings']} opening balance(s) for "
+            f"{plan['items']} item(s)."
+        )
+        if options["dry_run"] or not plan["items"]:
+            return
+
+        try:
+            compaction = compact_ledger(cutoff, today, log=self.stdout.write if options["verbosity"] > 1 else None)
+        except CompactionError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {compaction.movements_archived} movement(s) into {compaction.openings_written} "
+            f"opening balance(s) (compaction #{compaction.pk})."
+        ))
+
+        if not options["no_verify"]:
+            drift = find_stock_balance_drift()
+            if drift:
+                raise CommandError(f"{len(drift)} item(s) out of sync afterwards; run verify_stock_balances.")
+            self.stdout.write(self.style.SUCCESS("Stock balances match the ledger."))
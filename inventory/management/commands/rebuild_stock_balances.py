@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.services import rebuild_stock_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute every StockBalance row (and the low-stock flags) from the StockMovement ledger."
+
+    def handle(self, *args, **options):
+        count = rebuild_stock_balances()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} stock balance(s)."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.services import find_low_stock_drift, find_stock_balance_drift
+
+
+class Command(BaseCommand):
+    help = "Check StockBalance rows against a full recompute of the StockMovement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=50, help="Max mismatches to print.")
+
+    def handle(self, *args, **options):
+        drift = find_stock_balance_drift()
+        flags = find_low_stock_drift()
+        if not drift and not flags:
+            self.stdout.write(self.style.SUCCESS("Stock balances match the ledger."))
+            return
+
+        for item_id, stored, expected in drift[:options["limit"]]:
+            self.stdout.write(f"item {item_id}: balance {stored}, ledger {expected}")
+        for item_id, stored, expected in flags[:options["limit"]]:
+            self.stdout.write(f"item {item_id}: is_low {stored}, expected {expected}")
+
+        raise CommandError(
+            f"{len(drift)} balance(s) and {len(flags)} low-stock flag(s) out of sync. "
+            "Run `manage.py rebuild_stock_balances` to repair."
+        )
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_stock_balances(apps, schema_editor):
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+
+    totals = (
+        StockMovement.objects.order_by()
+        .values("item_id")
+        .annotate(total=Sum("quantity_change"))
+        .values_list("item_id", "total")
+    )
+    StockBalance.objects.bulk_create(
+        [StockBalance(item_id=item_id, quantity=total or 0) for item_id, total in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_balance",
+                        to="inventory.item",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_stock_balances, migrations.RunPython.noop),
+    ]
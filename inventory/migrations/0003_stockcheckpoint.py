@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_stockbalance"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period_end", models.DateField()),
+                ("quantity", models.IntegerField()),
+            ],
+            options={
+                "ordering": ["-period_end"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["item", "created_at"], name="inventory_s_item_id_a9fe64_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="stockcheckpoint",
+            name="item",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_checkpoints",
+                to="inventory.item",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stockcheckpoint",
+            constraint=models.UniqueConstraint(
+                fields=("period_end", "item"), name="uniq_stock_checkpoint_period_item"
+            ),
+        ),
+    ]
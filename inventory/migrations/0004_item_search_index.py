@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:53
+
+from django.db import migrations
+
+from core.search import install_fts, uninstall_fts
+
+
+def create_item_search_index(apps, schema_editor):
+    # SQLite FTS5 table + sync triggers; skipped where FTS5 isn't available.
+    install_fts("inventory_item_fts", schema_editor)
+
+
+def drop_item_search_index(apps, schema_editor):
+    uninstall_fts("inventory_item_fts", schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_stockcheckpoint"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_item_search_index, drop_item_search_index),
+    ]
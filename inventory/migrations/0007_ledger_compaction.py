@@ -0,0 +1,136 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_stockcount"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="stockmovement",
+            name="movement_type",
+            field=models.CharField(
+                choices=[
+                    ("RESTOCK", "Restock"),
+                    ("SALE", "Sale"),
+                    ("ADJUSTMENT", "Adjustment"),
+                    ("RETURN", "Return"),
+                    ("OPENING", "Opening balance"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="LedgerCompaction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cutoff", models.DateField(unique=True)),
+                ("movements_archived", models.PositiveIntegerField(default=0)),
+                ("openings_written", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-cutoff"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedStockMovement",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "movement_type",
+                    models.CharField(
+                        choices=[
+                            ("RESTOCK", "Restock"),
+                            ("SALE", "Sale"),
+                            ("ADJUSTMENT", "Adjustment"),
+                            ("RETURN", "Return"),
+                            ("OPENING", "Opening balance"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity_change", models.IntegerField()),
+                ("note", models.CharField(blank=True, default="", max_length=255)),
+                ("sale_id", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="archived_movements",
+                        to="inventory.item",
+                    ),
+                ),
+                (
+                    "stock_count",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="archived_movements",
+                        to="inventory.stockcount",
+                    ),
+                ),
+                (
+                    "compaction",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="movements",
+                        to="inventory.ledgercompaction",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["item", "created_at"],
+                        name="inventory_a_item_id_20e340_idx",
+                    ),
+                    models.Index(
+                        fields=["created_at"], name="inventory_a_created_2f8e04_idx"
+                    ),
+                    models.Index(
+                        fields=["sale_id"], name="inventory_a_sale_id_606547_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThanOrEqual
+
+
+def backfill_is_low(apps, schema_editor):
+    # Same expression as inventory.services.low_stock_expression; no settings row exists yet.
+    Item = apps.get_model("inventory", "Item")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+    stock = StockBalance.objects.filter(item_id=OuterRef("pk")).values("quantity")[:1]
+    Item.objects.update(
+        is_low=LessThanOrEqual(
+            Coalesce(Subquery(stock), Value(0)),
+            Coalesce("low_stock_threshold", Value(5)),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_ledger_compaction"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="is_low",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(backfill_is_low, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["is_low", "is_active"], name="inventory_i_is_low_aed740_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:45
+
+from django.db import migrations
+
+from core.search import reinstall_fts
+
+
+def reinstall_item_search_index(apps, schema_editor):
+    # The update trigger now only fires for the indexed columns; this also
+    # restores the insert/delete triggers that 0008_item_is_low (a table rebuild) dropped.
+    reinstall_fts("inventory_item_fts", schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_item_is_low"),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_item_search_index, migrations.RunPython.noop),
+    ]
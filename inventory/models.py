@@ -2,10 +2,13 @@ from django.db import models
 
 # Create your models here.
 from django.conf import settings
-from django.db import models
-from django.db.models import Sum
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models, transaction
 from django.utils import timezone
 
+from core.dashboard import invalidate_dashboard
+from core.metrics import count_movements_on_commit
+
 
 class Category(models.Model):
     name = models.CharField(max_length=80, unique=True)
@@ -34,6 +37,9 @@ class Item(models.Model):
 
     # Low stock
     low_stock_threshold = models.PositiveIntegerField(null=True, blank=True)  # if null -> use global default
+    # stock <= threshold, kept in SQL by inventory.services.refresh_low_stock as
+    # stock and thresholds change (a new item has no stock yet, so it starts low)
+    is_low = models.BooleanField(default=True, editable=False)
     is_active = models.BooleanField(default=True)
 
     created_at = models.DateTimeField(default=timezone.now)
@@ -45,19 +51,51 @@ class Item(models.Model):
             models.Index(fields=["sku"]),
             models.Index(fields=["name"]),
             models.Index(fields=["is_active"]),
+            models.Index(fields=["is_low", "is_active"]),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded price so save() knows whether the catalog version moves.
+        instance._loaded_sell_price = instance.__dict__.get("sell_price")
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .services import bump_catalog_version, refresh_low_stock
+
+        price_changed = self._state.adding or self.sell_price != getattr(self, "_loaded_sell_price", None)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if price_changed:
+                bump_catalog_version()
+            # The threshold may have changed, and the loaded is_low may be older than the balance.
+            refresh_low_stock(Item.objects.filter(pk=self.pk))
+            invalidate_dashboard("item")
+        self._loaded_sell_price = self.sell_price
+
+    def delete(self, *args, **kwargs):
+        from .services import bump_catalog_version
+
+        with transaction.atomic(savepoint=False):
+            result = super().delete(*args, **kwargs)
+            bump_catalog_version()
+            invalidate_dashboard("item")
+        return result
+
     @property
     def current_stock(self) -> int:
         """
-        Stock is derived from movements. For v1, we calculate on the fly.
-        Later we can cache this safely if needed.
+        Stock is read from the materialized StockBalance row (kept in sync with
+        the movements ledger). Use select_related("stock_balance") in lists.
         """
-        agg = self.movements.aggregate(total=Sum("quantity_change"))
-        return int(agg["total"] or 0)
+        try:
+            return int(self.stock_balance.quantity)
+        except ObjectDoesNotExist:
+            return 0
 
     def threshold(self, default_threshold: int) -> int:
         return self.low_stock_threshold if self.low_stock_threshold is not None else default_threshold
@@ -69,6 +107,8 @@ class StockMovement(models.Model):
         SALE = "SALE", "Sale"
         ADJUSTMENT = "ADJUSTMENT", "Adjustment"
         RETURN = "RETURN", "Return"
+        # Written by ledger compaction: the sum of everything archived before it.
+        OPENING = "OPENING", "Opening balance"
 
     item = models.ForeignKey(Item, on_delete=models.PROTECT, related_name="movements")
     movement_type = models.CharField(max_length=20, choices=MovementType.choices)
@@ -77,6 +117,14 @@ class StockMovement(models.Model):
 
     # Link to sale later (nullable so inventory app doesn’t depend on sales app yet)
     sale_id = models.IntegerField(null=True, blank=True)
+    # Adjustments posted by a cycle count session
+    stock_count = models.ForeignKey(
+        "StockCount",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="movements",
+    )
 
     created_at = models.DateTimeField(default=timezone.now)
     created_by = models.ForeignKey(
@@ -93,7 +141,214 @@ class StockMovement(models.Model):
             models.Index(fields=["movement_type"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["sale_id"]),
+            models.Index(fields=["item", "created_at"]),
         ]
 
     def __str__(self):
         return f"{self.movement_type} {self.quantity_change} for {self.item}"
+
+    def save(self, *args, **kwargs):
+        # Ledger + balance must change together, so both writes share a transaction.
+        from .services import apply_stock_deltas, invalidate_checkpoints_from
+
+        with transaction.atomic(savepoint=False):
+            deltas = {}
+            adding = self._state.adding or not self.pk
+            if not adding:
+                old = (
+                    StockMovement.objects.filter(pk=self.pk)
+                    .values("item_id", "quantity_change", "created_at")
+                    .first()
+                )
+                if old:
+                    deltas[old["item_id"]] = -int(old["quantity_change"])
+                    invalidate_checkpoints_from(old["created_at"])
+            super().save(*args, **kwargs)
+            deltas[self.item_id] = deltas.get(self.item_id, 0) + int(self.quantity_change)
+            apply_stock_deltas(deltas)
+            invalidate_checkpoints_from(self.created_at)
+            if adding:
+                count_movements_on_commit([self])
+
+    def delete(self, *args, **kwargs):
+        from .services import apply_stock_deltas, invalidate_checkpoints_from
+
+        with transaction.atomic(savepoint=False):
+            item_id, qty, created_at = self.item_id, int(self.quantity_change), self.created_at
+            result = super().delete(*args, **kwargs)
+            apply_stock_deltas({item_id: -qty})
+            invalidate_checkpoints_from(created_at)
+        return result
+
+
+class StockBalance(models.Model):
+    """
+    Materialized running total of an item's movements (one row per item).
+    Updated in the same transaction as every StockMovement write, so readers
+    never have to sum the whole ledger.
+    """
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, related_name="stock_balance")
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.item}: {self.quantity}"
+
+
+class StockCheckpoint(models.Model):
+    """
+    Closing stock per item at the end of a month (local time).
+    Every month that has checkpoints has a row for every item with history,
+    so "stock as of D" = latest checkpoint <= D + movements after it.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="stock_checkpoints")
+    period_end = models.DateField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        ordering = ["-period_end"]
+        constraints = [
+            models.UniqueConstraint(fields=["period_end", "item"], name="uniq_stock_checkpoint_period_item"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} @ {self.period_end}: {self.quantity}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Single row counting catalog price changes. Bumped whenever an Item's
+    sell_price changes (or items are added/removed), so clients and caches can
+    key the price map on it instead of rebuilding it.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Catalog v{self.version}"
+
+
+class StockCount(models.Model):
+    """
+    A cycle count session: counted quantities for any subset of items, scanned
+    or uploaded while open, then posted as one batch of ADJUSTMENT movements.
+    """
+    class Status(models.TextChoices):
+        OPEN = "OPEN", "Open"
+        POSTED = "POSTED", "Posted"
+
+    name = models.CharField(max_length=120)
+    note = models.CharField(max_length=255, blank=True, default="")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_counts",
+    )
+    posted_at = models.DateTimeField(null=True, blank=True)
+    posted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    @property
+    def is_open(self) -> bool:
+        return self.status == self.Status.OPEN
+
+
+class StockCountLine(models.Model):
+    """
+    One item's counted quantity in a session. `expected` is the balance the
+    count was compared against, stored when the session is posted.
+    """
+    count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name="lines")
+    item = models.ForeignKey(Item, on_delete=models.PROTECT, related_name="count_lines")
+    counted = models.PositiveIntegerField(default=0)
+    expected = models.IntegerField(null=True, blank=True)
+    counted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["count", "item"], name="uniq_stock_count_line_item"),
+        ]
+
+    def __str__(self):
+        return f"{self.item}: {self.counted}"
+
+
+class LedgerCompaction(models.Model):
+    """
+    One run of ledger compaction (inventory.compaction): every movement dated
+    before `cutoff` was moved to ArchivedStockMovement and each item's total
+    replaced by one OPENING movement at the end of the day before.
+    """
+    cutoff = models.DateField(unique=True)
+    movements_archived = models.PositiveIntegerField(default=0)
+    openings_written = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    class Meta:
+        ordering = ["-cutoff"]
+
+    def __str__(self):
+        return f"Ledger compacted before {self.cutoff}"
+
+
+class ArchivedStockMovement(models.Model):
+    """
+    A StockMovement taken out of the hot ledger by compaction, kept as it was
+    (same id) for the audit trail and for stock_as_of before the cutoff.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(Item, on_delete=models.PROTECT, related_name="archived_movements")
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MovementType.choices)
+    quantity_change = models.IntegerField()
+    note = models.CharField(max_length=255, blank=True, default="")
+    sale_id = models.IntegerField(null=True, blank=True)
+    stock_count = models.ForeignKey(
+        StockCount,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="archived_movements",
+    )
+    created_at = models.DateTimeField()
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    compaction = models.ForeignKey(LedgerCompaction, on_delete=models.PROTECT, related_name="movements")
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["item", "created_at"]),
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["sale_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.movement_type} {self.quantity_change} for {self.item} (archived)"
@@ -0,0 +1,385 @@
+from datetime import date, datetime, time, timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from core.dashboard import invalidate_dashboard
+from core.metrics import count_movements_on_commit
+from core.models import SiteSettings
+
+from .models import (
+    ArchivedStockMovement, CatalogVersion, Item, LedgerCompaction, StockBalance, StockCheckpoint, StockMovement,
+)
+
+
+# Rows per balance upsert (3 parameters each, well under SQLite's limit).
+BALANCE_UPDATE_CHUNK = 300
+
+
+class InsufficientStock(ValueError):
+    """
+    Raised when a decrement would take stock below zero.
+    shortages: [(sku, name, available, needed)]
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        lines = [
+            f"{sku} ({name}) — available {available}, needed {needed}"
+            for sku, name, available, needed in shortages
+        ]
+        super().__init__("Insufficient stock for:\n- " + "\n- ".join(lines))
+
+
+class LedgerClosed(ValueError):
+    """A movement dated before the compaction cutoff (that period is archived)."""
+
+
+@transaction.atomic(savepoint=False)
+def apply_stock_deltas(deltas: dict, enforce_non_negative: bool = False):
+    """
+    deltas: {item_id: quantity_change}
+    Adds the deltas to each item's StockBalance row (creating missing rows)
+    with one INSERT ... ON CONFLICT (item_id) DO UPDATE per chunk of items,
+    regardless of how many movements produced them.
+
+    enforce_non_negative: stock reservation. The decrement is applied first
+    and then checked; if any decremented item went below zero,
+    InsufficientStock is raised and the caller's transaction rolls back.
+    SQLite has no row locks: the write takes the database-wide lock (held from
+    BEGIN IMMEDIATE to commit), so every checkout serializes, whatever items
+    it sells, and two tills selling the last unit can't both win.
+    """
+    deltas = {item_id: int(d) for item_id, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    invalidate_dashboard("stock")
+
+    # Raw SQL for the same reason as the sales rollups: the ORM can't express
+    # an incrementing upsert, and bulk_create + a CASE update costs two
+    # queries and a big expression compile per chunk.
+    conn = connections[router.db_for_write(StockBalance)]
+    qn = conn.ops.quote_name
+    opts = StockBalance._meta
+    table = qn(opts.db_table)
+    item_col = qn(opts.get_field("item").column)
+    qty_col = qn(opts.get_field("quantity").column)
+    updated_col = qn(opts.get_field("updated_at").column)
+    now = opts.get_field("updated_at").get_db_prep_save(timezone.now(), conn)
+
+    rows = list(deltas.items())
+    with conn.cursor() as cursor:
+        for start in range(0, len(rows), BALANCE_UPDATE_CHUNK):
+            chunk = rows[start:start + BALANCE_UPDATE_CHUNK]
+            params = []
+            for item_id, delta in chunk:
+                params.extend((item_id, delta, now))
+            cursor.execute(
+                f"INSERT INTO {table} ({item_col}, {qty_col}, {updated_col}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT ({item_col}) DO UPDATE SET "
+                f"{qty_col} = {table}.{qty_col} + excluded.{qty_col}, {updated_col} = excluded.{updated_col}",
+                params,
+            )
+            refresh_low_stock(Item.objects.filter(pk__in=[item_id for item_id, _ in chunk]))
+
+    if enforce_non_negative:
+        decremented = [item_id for item_id, d in deltas.items() if d < 0]
+        short = (
+            StockBalance.objects.filter(item_id__in=decremented, quantity__lt=0)
+            .order_by("item__sku")
+            .values_list("item_id", "item__sku", "item__name", "quantity")
+        )
+        shortages = [
+            (sku, name, quantity - deltas[item_id], -deltas[item_id])
+            for item_id, sku, name, quantity in short
+        ]
+        if shortages:
+            raise InsufficientStock(shortages)
+
+
+@transaction.atomic(savepoint=False)
+def create_movements(movements: list, enforce_non_negative: bool = False) -> list:
+    """
+    Bulk-inserts unsaved StockMovement instances and applies their balance
+    deltas: one INSERT for the ledger plus the constant-size balance update,
+    however many movements there are. Bypasses StockMovement.save(), so every
+    bulk writer must come through here.
+    enforce_non_negative: see apply_stock_deltas (raises InsufficientStock).
+    """
+    movements = [m for m in movements if m.quantity_change]
+    if not movements:
+        return []
+
+    now = timezone.now()
+    for m in movements:
+        if m.created_at is None:
+            m.created_at = now
+
+    created = StockMovement.objects.bulk_create(movements)
+    count_movements_on_commit(created)
+
+    deltas = {}
+    for m in created:
+        deltas[m.item_id] = deltas.get(m.item_id, 0) + int(m.quantity_change)
+    apply_stock_deltas(deltas, enforce_non_negative=enforce_non_negative)
+    invalidate_checkpoints_from(min(m.created_at for m in created))
+    return created
+
+
+def default_threshold_sql():
+    """
+    The global default threshold as a subquery on SiteSettings, so stored
+    flags use the committed value and not a process's cached copy.
+    """
+    row = SiteSettings.objects.filter(pk=1).values("default_low_stock_threshold")[:1]
+    return Coalesce(Subquery(row), Value(SiteSettings._meta.get_field("default_low_stock_threshold").default))
+
+
+def low_stock_expression():
+    """Per item, in SQL: stock (0 without a balance row) <= Coalesce(low_stock_threshold, default)."""
+    stock = StockBalance.objects.filter(item_id=OuterRef("pk")).values("quantity")[:1]
+    return LessThanOrEqual(
+        Coalesce(Subquery(stock), Value(0)),
+        Coalesce("low_stock_threshold", default_threshold_sql()),
+    )
+
+
+def refresh_low_stock(items=None) -> int:
+    """
+    Recomputes Item.is_low for `items` (a queryset, default: every item) in one
+    UPDATE. Everything that moves stock or a threshold calls this: balance
+    upserts, Item.save, imports, SiteSettings.save, rebuild_stock_balances.
+    Only rows whose flag flips are written. Returns how many flipped.
+    """
+    items = Item.objects.all() if items is None else items
+    expected = low_stock_expression()
+    return items.exclude(is_low=expected).update(is_low=expected)
+
+
+def find_low_stock_drift() -> list[tuple]:
+    """[(item_id, stored is_low, expected)] for every item whose flag is wrong."""
+    rows = (
+        Item.objects.alias(expected=low_stock_expression())
+        .exclude(is_low=F("expected"))
+        .order_by("pk")
+        .values_list("pk", "is_low")
+    )
+    return [(item_id, is_low, not is_low) for item_id, is_low in rows]
+
+
+def bump_catalog_version():
+    """
+    Moves the catalog version forward. Item.save()/delete() call this when a
+    price changes; bulk writers that bypass save() (queryset.update,
+    bulk_create) must call it themselves.
+    """
+    now = timezone.now()
+    if not CatalogVersion.objects.filter(pk=1).update(version=F("version") + 1, changed_at=now):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={"changed_at": now})
+
+
+def catalog_version() -> tuple[int, datetime]:
+    """(version, changed_at) of the catalog prices; one primary-key read."""
+    row = CatalogVersion.objects.filter(pk=1).values_list("version", "changed_at").first()
+    if row is None:
+        return 0, _local_midnight(date(2000, 1, 1))
+    return row
+
+
+def catalog_price_map() -> dict:
+    """{item id (str): sell_price (str)} for the whole catalog."""
+    return {str(pk): str(price) for pk, price in Item.objects.order_by().values_list("id", "sell_price")}
+
+
+def ledger_totals() -> dict:
+    """
+    {item_id: summed quantity_change} straight from the movements ledger.
+    This is the expensive full scan the balance table exists to avoid;
+    only rebuild/verify should call it.
+    """
+    rows = (
+        StockMovement.objects.order_by()
+        .values("item_id")
+        .annotate(total=Sum("quantity_change"))
+        .values_list("item_id", "total")
+    )
+    return {item_id: int(total or 0) for item_id, total in rows}
+
+
+@transaction.atomic
+def rebuild_stock_balances() -> int:
+    """
+    Recreates every StockBalance row from the ledger. Returns rows written.
+    """
+    totals = ledger_totals()
+    now = timezone.now()
+
+    StockBalance.objects.all().delete()
+    StockBalance.objects.bulk_create(
+        [StockBalance(item_id=item_id, quantity=qty, updated_at=now) for item_id, qty in totals.items()],
+        batch_size=1000,
+    )
+    refresh_low_stock()
+    invalidate_dashboard("stock")
+    return len(totals)
+
+
+def find_stock_balance_drift() -> list[tuple]:
+    """
+    Compares StockBalance against a full ledger recompute.
+    Returns [(item_id, balance_quantity, ledger_quantity)] for every mismatch.
+    """
+    totals = ledger_totals()
+    balances = dict(StockBalance.objects.values_list("item_id", "quantity"))
+
+    drift = []
+    for item_id in sorted(set(totals) | set(balances)):
+        stored = int(balances.get(item_id, 0))
+        expected = int(totals.get(item_id, 0))
+        if stored != expected:
+            drift.append((item_id, stored, expected))
+    return drift
+
+
+# ---------------------------------------------------------------------------
+# Point-in-time stock (monthly checkpoints)
+# ---------------------------------------------------------------------------
+
+def _local_midnight(d: date) -> datetime:
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def compacted_before() -> date | None:
+    """First day still in the detailed ledger, or None if it was never compacted."""
+    return LedgerCompaction.objects.aggregate(m=Max("cutoff"))["m"]
+
+
+def check_ledger_open(dt):
+    """Raises LedgerClosed if `dt` falls before the compaction cutoff."""
+    cutoff = compacted_before()
+    if dt is not None and cutoff and timezone.localdate(dt) < cutoff:
+        raise LedgerClosed(f"Movements before {cutoff} are archived; date it {cutoff} or later.")
+
+
+def invalidate_checkpoints_from(dt):
+    """
+    A movement dated inside an already checkpointed (closed) month makes every
+    checkpoint from that month on wrong. Drop them; build_stock_checkpoints
+    recreates them. Normal "now" writes never hit the database here.
+    Raises LedgerClosed for a date in a compacted period.
+    """
+    if dt is None:
+        return
+    d = timezone.localdate(dt)
+    if d >= timezone.localdate().replace(day=1):
+        return
+    check_ledger_open(dt)
+    StockCheckpoint.objects.filter(period_end__gte=d).delete()
+
+
+def build_stock_checkpoints(batch_size: int = 1000, through: date | None = None, log=None) -> int:
+    """
+    Writes month-end checkpoints for every closed month not yet checkpointed,
+    resuming after the latest existing one. Each month is one grouped query over
+    that month's movements plus bulk inserts of `batch_size` rows, committed
+    per month so an interrupted run leaves only complete months behind.
+    Returns the number of months written.
+    """
+    last_end = StockCheckpoint.objects.aggregate(m=Max("period_end"))["m"]
+    if last_end:
+        running = dict(StockCheckpoint.objects.filter(period_end=last_end).values_list("item_id", "quantity"))
+        month = last_end + timedelta(days=1)
+    else:
+        first_at = StockMovement.objects.aggregate(m=Min("created_at"))["m"]
+        if first_at is None:
+            return 0
+        running = {}
+        month = timezone.localdate(first_at).replace(day=1)
+
+    # Only closed months: the current month is still moving.
+    stop = timezone.localdate().replace(day=1)
+    if through is not None:
+        stop = min(stop, _next_month(through.replace(day=1)))
+
+    months = 0
+    while month < stop:
+        month_end = _next_month(month)
+        deltas = (
+            StockMovement.objects.filter(
+                created_at__gte=_local_midnight(month),
+                created_at__lt=_local_midnight(month_end),
+            )
+            .order_by()
+            .values("item_id")
+            .annotate(total=Sum("quantity_change"))
+            .values_list("item_id", "total")
+        )
+        for item_id, total in deltas:
+            running[item_id] = running.get(item_id, 0) + int(total or 0)
+
+        period_end = month_end - timedelta(days=1)
+        with transaction.atomic():
+            StockCheckpoint.objects.bulk_create(
+                [StockCheckpoint(item_id=i, period_end=period_end, quantity=q) for i, q in running.items()],
+                batch_size=batch_size,
+            )
+        months += 1
+        if log:
+            log(f"{period_end}: {len(running)} item(s)")
+        month = month_end
+
+    return months
+
+
+def filter_movements(movements, item_id=None, as_of: date | None = None):
+    """item_detail's movement filters (one item, up to the end of `as_of`), shared with the CSV export."""
+    if item_id is not None:
+        movements = movements.filter(item_id=item_id)
+    if as_of:
+        movements = movements.filter(created_at__lt=_local_midnight(as_of + timedelta(days=1)))
+    return movements
+
+
+def stock_as_of(as_of: date, item_ids=None) -> dict:
+    """
+    {item_id: stock at the end of `as_of` (local time)}.
+    Reads the latest month-end checkpoint on or before the date and adds the
+    movements after it, so at most about a month of ledger is scanned.
+    Dates before the compaction cutoff read the archived movements instead.
+    item_ids may be a list or a queryset of ids; None means every item.
+    """
+    end = _local_midnight(as_of + timedelta(days=1))
+    cutoff = compacted_before()
+    ledger = ArchivedStockMovement if cutoff and as_of < cutoff else StockMovement
+    movements = ledger.objects.filter(created_at__lt=end)
+    stock = {}
+
+    cp_end = StockCheckpoint.objects.filter(period_end__lte=as_of).aggregate(m=Max("period_end"))["m"]
+    if cp_end:
+        checkpoints = StockCheckpoint.objects.filter(period_end=cp_end)
+        if item_ids is not None:
+            checkpoints = checkpoints.filter(item_id__in=item_ids)
+        stock = {item_id: int(q) for item_id, q in checkpoints.values_list("item_id", "quantity")}
+        movements = movements.filter(created_at__gte=_local_midnight(cp_end + timedelta(days=1)))
+
+    if item_ids is not None:
+        movements = movements.filter(item_id__in=item_ids)
+
+    deltas = (
+        movements.order_by()
+        .values("item_id")
+        .annotate(total=Sum("quantity_change"))
+        .values_list("item_id", "total")
+    )
+    for item_id, total in deltas:
+        stock[item_id] = stock.get(item_id, 0) + int(total or 0)
+    return stock
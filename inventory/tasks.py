@@ -0,0 +1,65 @@
+"""Background tasks (core.jobs) for the stock ledger: reconciliation, checkpoints, compaction, exports."""
+from datetime import date
+
+from django.utils import timezone
+
+from core.jobs import JobError, task, write_csv
+
+from .compaction import CompactionError, compact_ledger, default_cutoff, plan_compaction
+from .exports import export_movements
+from .services import (
+    build_stock_checkpoints, compacted_before, find_low_stock_drift, find_stock_balance_drift, rebuild_stock_balances,
+    refresh_low_stock,
+)
+
+
+@task("inventory.reconcile_stock_balances", label="Reconcile stock balances", manual=True)
+def reconcile_stock_balances(job):
+    drift = find_stock_balance_drift()
+    flags = find_low_stock_drift()
+    rebuilt = rebuild_stock_balances() if drift or flags else 0  # refreshes the flags too
+    return {"drifted": len(drift), "flags_drifted": len(flags), "rebuilt": rebuilt}
+
+
+@task("inventory.refresh_low_stock", label="Recompute low-stock flags", manual=True)
+def recompute_low_stock(job):
+    return {"flipped": refresh_low_stock()}
+
+
+@task("inventory.build_checkpoints", label="Build stock checkpoints", manual=True)
+def build_checkpoints(job):
+    return {"months": build_stock_checkpoints()}
+
+
+@task("inventory.compact_ledger", label="Compact the stock ledger", manual=True, max_attempts=1)
+def compact(job, before=None):
+    # Without `before`: the retention cutoff, like `manage.py compact_stock_ledger`.
+    today = timezone.localdate()
+    try:
+        cutoff = date.fromisoformat(before) if before else default_cutoff(today)
+    except ValueError:
+        raise JobError(f"Not a YYYY-MM-DD date: {before!r}")
+    previous = compacted_before()
+    if not before and previous and cutoff <= previous:
+        return {"skipped": f"already compacted before {previous}"}
+    if not plan_compaction(cutoff)["items"]:
+        return {"skipped": f"no movements before {cutoff}"}
+    try:
+        compaction = compact_ledger(cutoff, today, user=job.created_by)
+    except CompactionError as exc:
+        raise JobError(str(exc))
+    return {
+        "cutoff": str(compaction.cutoff),
+        "archived": compaction.movements_archived,
+        "openings": compaction.openings_written,
+    }
+
+
+@task("inventory.export_movements", label="Stock movements CSV export", max_attempts=1)
+def export(job, item_id=None, as_of=None, archived=False):
+    try:
+        as_of = date.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        raise JobError(f"Not a YYYY-MM-DD date: {as_of!r}")
+    filename, header, rows = export_movements(item_id=item_id, as_of=as_of, archived=archived)
+    return write_csv(job, filename, header, rows)
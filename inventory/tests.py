@@ -1,3 +1,365 @@
+from io import StringIO
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.search import search_filter, supports_fts
+
+from .compaction import compact_ledger
+from .counts import CountClosed, post_count, record_counts
+from .imports import ImportFileError, import_items
+from .models import Item, StockBalance, StockCount, StockCountLine, StockMovement
+from .services import (
+    LedgerClosed, create_movements, find_low_stock_drift, find_stock_balance_drift, ledger_totals, refresh_low_stock,
+    stock_as_of,
+)
+
+
+class StockBalanceTests(TestCase):
+    """StockBalance must equal the ledger sum after every kind of movement write."""
+
+    def setUp(self):
+        self.item = Item.objects.create(name="Fountain pen", sku="PEN-001")
+        self.other = Item.objects.create(name="Blotter", sku="BLT-001")
+
+    def _move(self, item, qty, kind=StockMovement.MovementType.RESTOCK):
+        return StockMovement.objects.create(item=item, movement_type=kind, quantity_change=qty)
+
+    def _balance(self, item):
+        return StockBalance.objects.get(item=item).quantity
+
+    def assertMatchesLedger(self):
+        self.assertEqual(find_stock_balance_drift(), [])
+        call_command("verify_stock_balances", stdout=StringIO())
+
+    def test_save_creates_and_increments_the_balance(self):
+        self._move(self.item, 10)
+        self._move(self.item, -3, StockMovement.MovementType.ADJUSTMENT)
+        self.assertEqual(self._balance(self.item), 7)
+        self.assertMatchesLedger()
+
+    def test_edit_applies_the_difference(self):
+        movement = self._move(self.item, 10)
+        movement.quantity_change = 4
+        movement.save()
+        self.assertEqual(self._balance(self.item), 4)
+        self.assertMatchesLedger()
+
+    def test_edit_moving_to_another_item(self):
+        movement = self._move(self.item, 10)
+        movement.item = self.other
+        movement.save()
+        self.assertEqual(self._balance(self.item), 0)
+        self.assertEqual(self._balance(self.other), 10)
+        self.assertMatchesLedger()
+
+    def test_delete_reverts_the_balance(self):
+        self._move(self.item, 10)
+        movement = self._move(self.item, 5)
+        movement.delete()
+        self.assertEqual(self._balance(self.item), 10)
+        self.assertMatchesLedger()
+
+    def test_bulk_create_movements_sums_per_item(self):
+        create_movements([
+            StockMovement(item=self.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=2),
+            StockMovement(item=self.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=3),
+            StockMovement(item=self.other, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=1),
+        ])
+        self.assertEqual(self._balance(self.item), 5)
+        self.assertEqual(self._balance(self.other), 1)
+        self.assertMatchesLedger()
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        self._move(self.item, 10)
+        StockBalance.objects.filter(item=self.item).update(quantity=99)
+        with self.assertRaises(CommandError):
+            call_command("verify_stock_balances", stdout=StringIO())
+
+        call_command("rebuild_stock_balances", stdout=StringIO())
+        self.assertEqual(self._balance(self.item), 10)
+        self.assertEqual(dict(StockBalance.objects.values_list("item_id", "quantity")), ledger_totals())
+        self.assertMatchesLedger()
+
+
+@skipUnless(supports_fts(connection), "SQLite without FTS5")
+class ItemSearchIndexTests(TestCase):
+    """The FTS update trigger re-indexes an item only when a searched column changes."""
+
+    def setUp(self):
+        self.item = Item.objects.create(name="Walnut ink", sku="INK-042", brand="Diamine")
+
+    def _rows_written(self, update):
+        # total_changes() counts rows written by triggers as well.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT total_changes()")
+            before = cursor.fetchone()[0]
+            update()
+            cursor.execute("SELECT total_changes()")
+            return cursor.fetchone()[0] - before
+
+    def _found(self, q):
+        return list(search_filter(Item.objects.all(), q, "inventory_item_fts", ["name", "sku"]))
+
+    def test_other_columns_do_not_reindex(self):
+        written = self._rows_written(
+            lambda: Item.objects.filter(pk=self.item.pk).update(sell_price=Decimal("7.50"), is_low=True)
+        )
+        self.assertEqual(written, 1)
+        self.assertEqual(self._found("walnut"), [self.item])
+
+    def test_renaming_reindexes(self):
+        written = self._rows_written(lambda: Item.objects.filter(pk=self.item.pk).update(name="Oak gall ink"))
+        self.assertGreater(written, 1)
+        self.assertEqual(self._found("oak"), [self.item])
+        self.assertEqual(self._found("walnut"), [])
+
+
+class ItemImportTests(TestCase):
+    """CSV import: upsert on sku, opening stock for new items only, bad rows reported and skipped."""
+
+    def _import(self, text, **kwargs):
+        return import_items(StringIO(text), **kwargs)
+
+    def test_upserts_on_sku(self):
+        Item.objects.create(name="Old name", sku="PEN-001", sell_price=Decimal("1.00"), brand="Lamy")
+        result = self._import(
+            "sku,name,sell_price,category\n"
+            "PEN-001,Safari pen,25.00,Pens\n"
+            "INK-001,Blue ink,8.50,Inks\n"
+        )
+        self.assertEqual((result["rows"], result["created"], result["updated"], result["errors"]), (2, 1, 1, []))
+
+        pen = Item.objects.get(sku="PEN-001")
+        self.assertEqual((pen.name, pen.sell_price, pen.category.name), ("Safari pen", Decimal("25.00"), "Pens"))
+        self.assertEqual(pen.brand, "Lamy", "columns missing from the file are left alone")
+        self.assertEqual(Item.objects.get(sku="INK-001").category.name, "Inks")
+
+        again = self._import("sku,name,sell_price,category\nPEN-001,Safari pen,25.00,Pens\n")
+        self.assertEqual((again["created"], again["updated"], again["unchanged"]), (0, 0, 1))
+
+    def test_opening_stock_only_for_new_items(self):
+        Item.objects.create(name="Existing", sku="OLD-001")
+        text = "sku,name,opening_stock\nOLD-001,Existing,5\nNEW-001,New,12\nNEW-002,Empty,\n"
+        result = self._import(text)
+        self.assertEqual(result["movements"], 1)
+        self.assertEqual(Item.objects.get(sku="NEW-001").current_stock, 12)
+        self.assertEqual(Item.objects.get(sku="OLD-001").current_stock, 0)
+        self.assertEqual(Item.objects.get(sku="NEW-002").current_stock, 0)
+
+        # Re-running the same file doesn't restock.
+        self.assertEqual(self._import(text)["movements"], 0)
+        self.assertEqual(Item.objects.get(sku="NEW-001").current_stock, 12)
+        self.assertEqual(find_stock_balance_drift(), [])
+
+    def test_row_errors_are_reported_and_skipped(self):
+        result = self._import(
+            "sku,name,sell_price,opening_stock\n"
+            "OK-001,Fine,1.00,\n"
+            ",No sku,1.00,\n"
+            "BAD-001,Bad price,abc,\n"
+            "BAD-002,Negative stock,1.00,-3\n"
+            "OK-001,Duplicate,2.00,\n"
+        )
+        self.assertEqual((result["rows"], result["created"]), (5, 1))
+        self.assertEqual([line for line, _, _ in result["errors"]], [3, 4, 5, 6])
+        self.assertIn("first on line 2", result["errors"][-1][2])
+        self.assertEqual(list(Item.objects.values_list("sku", flat=True)), ["OK-001"])
+
+    def test_dry_run_writes_nothing(self):
+        result = self._import("sku,name,opening_stock\nNEW-001,New,4\n", dry_run=True)
+        self.assertEqual(result["created"], 1)
+        self.assertFalse(Item.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_missing_required_column(self):
+        with self.assertRaises(ImportFileError):
+            self._import("name,sell_price\nPen,1.00\n")
+
+
+class StockCountTests(TestCase):
+    """Posting a cycle count is one-shot; a stale session instance can't record into a posted count."""
+
+    def setUp(self):
+        self.item = Item.objects.create(name="Nib", sku="NIB-001")
+        StockMovement.objects.create(
+            item=self.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=10,
+        )
+        self.count = StockCount.objects.create(name="Shelf A")
+
+    def test_post_writes_the_variance(self):
+        record_counts(self.count, {"NIB-001": 7, "NOPE-001": 1})
+        movements = post_count(self.count)
+        self.assertEqual([m.quantity_change for m in movements], [-3])
+        self.assertEqual(Item.objects.get(pk=self.item.pk).current_stock, 7)
+
+    def test_posting_twice_is_rejected(self):
+        record_counts(self.count, {"NIB-001": 7})
+        post_count(self.count)
+        stale = StockCount.objects.get(pk=self.count.pk)
+        stale.status = StockCount.Status.OPEN  # what a second tab still holds
+        with self.assertRaises(CountClosed):
+            post_count(stale)
+        self.assertEqual(StockMovement.objects.filter(stock_count=self.count).count(), 1)
+
+    def test_recording_into_a_count_posted_meanwhile_is_rejected(self):
+        stale = StockCount.objects.get(pk=self.count.pk)
+        post_count(self.count)
+        self.assertTrue(stale.is_open)
+        with self.assertRaises(CountClosed):
+            record_counts(stale, {"NIB-001": 7})
+        self.assertFalse(StockCountLine.objects.exists())
+
+
+class LedgerCompactionTests(TestCase):
+    """Compaction keeps every stock figure; the compacted period is closed to writes."""
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.cutoff = (today.replace(day=1) - timedelta(days=1)).replace(day=1)  # first of last month
+        self.item = Item.objects.create(name="Cartridge", sku="CRT-001")
+        self._move(10, self.cutoff - timedelta(days=60))
+        self._move(-3, self.cutoff - timedelta(days=20))
+        self._move(5, self.cutoff + timedelta(days=5))
+        self.before = {d: stock_as_of(d).get(self.item.pk, 0) for d in self._dates()}
+
+    def _at(self, day):
+        return timezone.make_aware(datetime.combine(day, time(12)))
+
+    def _move(self, qty, day, kind=StockMovement.MovementType.RESTOCK):
+        return StockMovement.objects.create(
+            item=self.item, movement_type=kind, quantity_change=qty, created_at=self._at(day),
+        )
+
+    def _dates(self):
+        return [
+            self.cutoff - timedelta(days=61), self.cutoff - timedelta(days=60), self.cutoff - timedelta(days=20),
+            self.cutoff - timedelta(days=1), self.cutoff, self.cutoff + timedelta(days=5), timezone.localdate(),
+        ]
+
+    def _compact(self):
+        return compact_ledger(self.cutoff, timezone.localdate())
+
+    def test_stock_as_of_across_the_cutoff(self):
+        self.assertEqual(list(self.before.values()), [0, 10, 7, 7, 7, 12, 12])
+        compaction = self._compact()
+        self.assertEqual((compaction.movements_archived, compaction.openings_written), (2, 1))
+        self.assertEqual({d: stock_as_of(d).get(self.item.pk, 0) for d in self._dates()}, self.before)
+
+    def test_balances_verify_after_compaction(self):
+        totals = ledger_totals()
+        self._compact()
+        self.assertEqual(ledger_totals(), totals)
+        self.assertEqual(find_stock_balance_drift(), [])
+        call_command("verify_stock_balances", stdout=StringIO())
+        self.assertEqual(
+            list(StockMovement.objects.values_list("movement_type", "quantity_change").order_by("created_at")),
+            [(StockMovement.MovementType.OPENING, 7), (StockMovement.MovementType.RESTOCK, 5)],
+        )
+
+    def test_movements_dated_before_the_cutoff_are_rejected(self):
+        self._compact()
+        # Each write in its own atomic block: LedgerClosed rolls the write back.
+        with self.assertRaises(LedgerClosed), transaction.atomic():
+            self._move(1, self.cutoff - timedelta(days=3))
+
+        opening = StockMovement.objects.get(movement_type=StockMovement.MovementType.OPENING)
+        opening.quantity_change = 8
+        with self.assertRaises(LedgerClosed), transaction.atomic():
+            opening.save()
+
+        later = StockMovement.objects.get(movement_type=StockMovement.MovementType.RESTOCK)
+        later.created_at = self._at(self.cutoff - timedelta(days=3))
+        with self.assertRaises(LedgerClosed), transaction.atomic():
+            later.save()
+        self.assertEqual(StockBalance.objects.get(item=self.item).quantity, 12)
+        self.assertEqual(StockMovement.objects.count(), 2)
+
+    def test_admin_reports_a_closed_date_instead_of_failing(self):
+        self._compact()
+        self.client.force_login(get_user_model().objects.create_superuser("admin", password="x"))
+        day = self.cutoff - timedelta(days=3)
+        response = self.client.post(reverse("admin:inventory_stockmovement_add"), {
+            "item": self.item.pk,
+            "movement_type": StockMovement.MovementType.ADJUSTMENT,
+            "quantity_change": 1,
+            "note": "",
+            "created_at_0": day.isoformat(),
+            "created_at_1": "12:00:00",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("archived", str(response.context["adminform"].form.errors["created_at"]))
+
+        opening = StockMovement.objects.get(movement_type=StockMovement.MovementType.OPENING)
+        change_url = reverse("admin:inventory_stockmovement_change", args=[opening.pk])
+        self.assertEqual(self.client.post(change_url, {"quantity_change": 8}).status_code, 403)
+        self.assertEqual(StockBalance.objects.get(item=self.item).quantity, 12)
+
+
+class LowStockFlagTests(TestCase):
+    """refresh_low_stock writes only the items whose flag flips."""
+
+    def setUp(self):
+        self.low = Item.objects.create(name="Low", sku="LOW-001", low_stock_threshold=5)
+        self.stocked = Item.objects.create(name="Stocked", sku="STK-001", low_stock_threshold=5)
+        StockMovement.objects.create(
+            item=self.stocked, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=50,
+        )
+
+    def _flags(self):
+        return dict(Item.objects.values_list("sku", "is_low"))
+
+    def test_flags_follow_stock(self):
+        self.assertEqual(self._flags(), {"LOW-001": True, "STK-001": False})
+        StockMovement.objects.create(item=self.low, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=9)
+        self.assertEqual(self._flags(), {"LOW-001": False, "STK-001": False})
+
+    def test_unchanged_flags_are_not_rewritten(self):
+        # update() returns the rows it matched: none, the flags are all right.
+        self.assertEqual(refresh_low_stock(), 0)
+
+        Item.objects.filter(pk=self.stocked.pk).update(is_low=True)  # drifted
+        self.assertEqual(refresh_low_stock(), 1)
+        self.assertEqual(self._flags(), {"LOW-001": True, "STK-001": False})
+        self.assertEqual(find_low_stock_drift(), [])
+
+
+class PriceMapTests(TestCase):
+    """The price map revalidates with a 304 until a sell price changes."""
+
+    def setUp(self):
+        self.item = Item.objects.create(name="Converter", sku="CNV-001", sell_price=Decimal("4.50"))
+        self.client.force_login(get_user_model().objects.create_user(username="till", password="x"))
+        self.url = reverse("inventory:price_map")
+
+    def test_conditional_get_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {str(self.item.pk): "4.50"})
+        etag = response["ETag"]
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_sell_price_save_changes_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.item.name = "Piston converter"
+        self.item.save()
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": etag}).status_code, 304)
 
-# Create your tests here.
+        self.item.sell_price = Decimal("5.00")
+        self.item.save()
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json(), {str(self.item.pk): "5.00"})
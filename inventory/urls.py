@@ -6,8 +6,16 @@ app_name = "inventory"
 urlpatterns = [
     path("items/", views.items_list, name="items"),
     path("items/new/", views.item_create, name="item_create"),
+    path("items/import/", views.item_import, name="item_import"),
     path("items/<int:pk>/", views.item_detail, name="item_detail"),
     path("items/<int:pk>/edit/", views.item_edit, name="item_edit"),
     path("items/<int:pk>/movement/new/", views.movement_create, name="movement_create"),
+    path("items/<int:pk>/movements.csv", views.movements_export, name="item_movements_export"),
+    path("movements.csv", views.movements_export, name="movements_export"),
     path("low-stock/", views.low_stock, name="low_stock"),
+    path("counts/", views.counts_list, name="counts"),
+    path("counts/<int:pk>/", views.count_detail, name="count_detail"),
+    path("counts/<int:pk>/post/", views.count_post, name="count_post"),
+    path("counts/<int:pk>/variance.csv", views.count_variance_export, name="count_variance_export"),
+    path("price-map.json", views.price_map, name="price_map"),
 ]
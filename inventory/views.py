@@ -1,24 +1,60 @@
+import csv
+import io
+import json
+from datetime import datetime
+
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q, Sum
+from django.core.cache import cache
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.views.decorators.http import condition, require_POST
 from core.permissions import is_manager
+from core.csv_export import csv_response
+from core.pagination import is_htmx, keyset_page
+from core.replica import replica_reads
+from core.search import search_filter
+from core.site_settings import get_site_settings
+
+from .counts import CountClosed, parse_count_csv, post_count, record_counts, variance_report
+from .forms import CountScanForm, CountUploadForm, ItemForm, ItemImportForm, StockCountForm, StockMovementForm
+from .models import Item, StockCount, StockMovement
+from .exports import export_count_variance, export_movements
+from .imports import ImportFileError, import_items
+from .services import catalog_price_map, catalog_version, filter_movements, stock_as_of
+
+
+# Keys carry the catalog version, so old payloads are simply never read again.
+PRICE_MAP_CACHE_TIMEOUT = 60 * 60 * 24
 
-from .forms import ItemForm, StockMovementForm
-from .models import Item, StockMovement
+# Row errors shown on the page; the command prints them all.
+IMPORT_ERRORS_SHOWN = 200
 
+# Variance lines rendered on a count page; the CSV has all of them.
+COUNT_LINES_SHOWN = 500
 
-DEFAULT_LOW_STOCK = 5  # Later: make this configurable in a Settings table
+
+def _parse_as_of(request):
+    """Optional ?as_of=YYYY-MM-DD; invalid dates are ignored rather than crashing."""
+    raw = request.GET.get("as_of", "").strip()
+    try:
+        return raw, (datetime.strptime(raw, "%Y-%m-%d").date() if raw else None)
+    except ValueError:
+        return raw, None
 
 
 @login_required
+@replica_reads
 def items_list(request):
     q = request.GET.get("q", "").strip()
     only_active = request.GET.get("active", "1")  # default active only
     category_id = request.GET.get("category", "").strip()
+    as_of_raw, as_of = _parse_as_of(request)
 
     items = Item.objects.all().select_related("category")
 
@@ -29,22 +65,32 @@ def items_list(request):
         items = items.filter(category_id=category_id)
 
     if q:
-        items = items.filter(
-            Q(name__icontains=q) |
-            Q(sku__icontains=q) |
-            Q(brand__icontains=q) |
-            Q(vendor__icontains=q)
-        )
+        # FTS5 prefix search (falls back to icontains without the index)
+        items = search_filter(items, q, "inventory_item_fts", ["name", "sku", "brand", "vendor"])
+
+    # Stock comes from the materialized balance row (a join, not a ledger scan).
+    items = items.annotate(stock=Coalesce("stock_balance__quantity", 0))
+    items, next_url = keyset_page(request, items, ["name", "id"])
 
-    # NOTE: current_stock is computed property (per-row query if used in template).
-    # For list views, we compute via aggregation in one query:
-    items = items.annotate(stock=Sum("movements__quantity_change")).order_by("name")
+    if as_of:
+        # Historical stock: checkpoint + small delta scan, only for this page's items.
+        stock_map = stock_as_of(as_of, item_ids=[it.id for it in items])
+        for it in items:
+            it.stock = stock_map.get(it.id, 0)
+
+    if is_htmx(request) and request.GET.get("cursor"):
+        return render(request, "inventory/partials/item_rows.html", {
+            "items": items, "next_url": next_url, "as_of": as_of_raw if as_of else "",
+        })
 
     return render(request, "inventory/items_list.html", {
         "items": items,
+        "next_url": next_url,
         "q": q,
         "only_active": only_active,
         "category_id": category_id,
+        "as_of": as_of_raw if as_of else "",
+        "can_import": is_manager(request.user),
     })
 
 
@@ -58,6 +104,37 @@ def item_create(request):
     return render(request, "inventory/item_form.html", {"form": form, "mode": "create"})
 
 
+@login_required
+def item_import(request):
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can import items.")
+
+    form = ItemImportForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == "POST" and form.is_valid():
+        upload = form.cleaned_data["file"]
+        # utf-8-sig drops the BOM spreadsheets like to add.
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_items(text, dry_run=form.cleaned_data["dry_run"], user=request.user)
+        except (ImportFileError, csv.Error) as e:
+            form.add_error("file", str(e))
+        except UnicodeDecodeError:
+            form.add_error("file", "The file must be a UTF-8 encoded CSV.")
+        else:
+            if not form.cleaned_data["dry_run"]:
+                messages.success(
+                    request,
+                    f"Imported {result['created']} new and {result['updated']} updated item(s).",
+                )
+
+    return render(request, "inventory/item_import.html", {
+        "form": form,
+        "result": result,
+        "errors": result["errors"][:IMPORT_ERRORS_SHOWN] if result else [],
+    })
+
+
 @login_required
 def item_edit(request, pk: int):
     item = get_object_or_404(Item, pk=pk)
@@ -71,20 +148,46 @@ def item_edit(request, pk: int):
 
 @login_required
 def item_detail(request, pk: int):
-    item = get_object_or_404(Item.objects.select_related("category"), pk=pk)
-    movements = item.movements.select_related("created_by").all()[:50]
+    item = get_object_or_404(Item.objects.select_related("category", "stock_balance"), pk=pk)
+    as_of_raw, as_of = _parse_as_of(request)
+    movements = item.movements.select_related("created_by").all()
     current_stock = item.current_stock
-    threshold = item.threshold(DEFAULT_LOW_STOCK)
+    default_threshold = get_site_settings().default_low_stock_threshold
+    threshold = item.threshold(default_threshold)
+
+    as_of_stock = None
+    if as_of:
+        as_of_stock = stock_as_of(as_of, item_ids=[item.pk]).get(item.pk, 0)
+        movements = filter_movements(movements, as_of=as_of)
 
     return render(request, "inventory/item_detail.html", {
         "item": item,
-        "movements": movements,
+        "movements": movements[:50],
         "current_stock": current_stock,
         "threshold": threshold,
-        "default_threshold": DEFAULT_LOW_STOCK,
+        "default_threshold": default_threshold,
+        "as_of": as_of_raw if as_of else "",
+        "as_of_stock": as_of_stock,
+        "can_export": is_manager(request.user),
     })
 
 
+@login_required
+@replica_reads
+def movements_export(request, pk: int | None = None):
+    """
+    Streams the movements ledger as CSV: one item's (same ?as_of= as
+    item_detail) or, without pk, every item's.
+    """
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can export data.")
+    if pk is not None:
+        get_object_or_404(Item.objects.only("pk"), pk=pk)
+    _, as_of = _parse_as_of(request)
+    filename, header, rows = export_movements(item_id=pk, as_of=as_of)
+    return csv_response(filename, header, rows)
+
+
 @login_required
 def movement_create(request, pk: int):
     if not is_manager(request.user):
@@ -108,21 +211,142 @@ def movement_create(request, pk: int):
 
 
 @login_required
+@replica_reads
 def low_stock(request):
-    # We need aggregated stock in one query
+    # Only the low rows come back: Item.is_low is kept up to date as stock
+    # and thresholds change (see inventory.services.refresh_low_stock).
+    default_threshold = get_site_settings().default_low_stock_threshold
     items = (
-        Item.objects.filter(is_active=True)
+        Item.objects.filter(is_active=True, is_low=True)
         .select_related("category")
-        .annotate(stock=Sum("movements__quantity_change"))
+        .annotate(
+            stock=Coalesce("stock_balance__quantity", 0),
+            effective_threshold=Coalesce("low_stock_threshold", Value(default_threshold)),
+        )
         .order_by("name")
     )
+    return render(request, "inventory/low_stock.html", {"items": items, "default_threshold": default_threshold})
+
+
+def _require_manager(request):
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can run stock counts.")
+
+
+@login_required
+def counts_list(request):
+    _require_manager(request)
+    form = StockCountForm(request.POST or None)
+    if request.method == "POST" and form.is_valid():
+        count = form.save(commit=False)
+        count.created_by = request.user
+        count.save()
+        return redirect("inventory:count_detail", pk=count.pk)
+
+    counts = StockCount.objects.select_related("created_by").annotate(line_count=Count("lines"))[:50]
+    return render(request, "inventory/counts_list.html", {"counts": counts, "form": form})
+
+
+@login_required
+def count_detail(request, pk: int):
+    """
+    Scan (adds to the counted quantity) or upload (replaces it) counts into
+    an open session; the variance report is always shown below.
+    """
+    _require_manager(request)
+    count = get_object_or_404(StockCount, pk=pk)
+    action = request.POST.get("action") if request.method == "POST" else None
+
+    scan_form = CountScanForm(request.POST if action == "scan" else None)
+    upload_form = CountUploadForm(
+        request.POST if action == "upload" else None,
+        request.FILES if action == "upload" else None,
+    )
+    upload_errors = []
+
+    try:
+        if action == "scan" and scan_form.is_valid():
+            sku = scan_form.cleaned_data["sku"].strip()
+            if record_counts(count, {sku: scan_form.cleaned_data["quantity"]}, add=True):
+                scan_form.add_error("sku", f"No item with SKU {sku}.")
+            else:
+                return redirect("inventory:count_detail", pk=count.pk)
+
+        if action == "upload" and upload_form.is_valid():
+            upload = upload_form.cleaned_data["file"]
+            try:
+                counts, upload_errors = parse_count_csv(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""))
+            except (UnicodeDecodeError, csv.Error):
+                upload_form.add_error("file", "The file must be a UTF-8 encoded CSV.")
+            else:
+                unknown = record_counts(count, counts)
+                upload_errors += [(None, sku, "no item with this SKU") for sku in unknown]
+                messages.success(request, f"Recorded {len(counts) - len(unknown)} counted item(s).")
+    except CountClosed as e:
+        messages.error(request, str(e))
+
+    return render(request, "inventory/count_detail.html", {
+        "count": count,
+        "scan_form": scan_form,
+        "upload_form": upload_form,
+        "upload_errors": upload_errors[:IMPORT_ERRORS_SHOWN],
+        "report": variance_report(count, limit=COUNT_LINES_SHOWN),
+    })
+
 
-    # Filter in Python because threshold is per-item (may be null)
-    low = []
-    for it in items:
-        stock = int(it.stock or 0)
-        threshold = it.low_stock_threshold if it.low_stock_threshold is not None else DEFAULT_LOW_STOCK
-        if stock <= threshold:
-            low.append((it, stock, threshold))
+@login_required
+@require_POST
+def count_post(request, pk: int):
+    _require_manager(request)
+    count = get_object_or_404(StockCount, pk=pk)
+    try:
+        movements = post_count(count, user=request.user)
+    except CountClosed as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, f"Count posted: {len(movements)} adjustment(s) recorded.")
+    return redirect("inventory:count_detail", pk=count.pk)
+
+
+@login_required
+def count_variance_export(request, pk: int):
+    _require_manager(request)
+    count = get_object_or_404(StockCount, pk=pk)
+    filename, header, rows = export_count_variance(count)
+    return csv_response(filename, header, rows)
+
+
+def _price_map_version(request):
+    # condition() asks for the ETag and Last-Modified separately; read the row once.
+    if not hasattr(request, "_catalog_version"):
+        request._catalog_version = catalog_version()
+    return request._catalog_version
+
+
+def _price_map_etag(request):
+    return f"catalog-{_price_map_version(request)[0]}"
+
+
+def _price_map_last_modified(request):
+    return _price_map_version(request)[1]
+
+
+@login_required
+@condition(etag_func=_price_map_etag, last_modified_func=_price_map_last_modified)
+def price_map(request):
+    """
+    {item_id: sell_price} for the sale form and the tills. Clients revalidate
+    with If-None-Match / If-Modified-Since and get a 304 until a price changes;
+    the serialized payload is cached per catalog version.
+    """
+    version = _price_map_version(request)[0]
+    key = f"inventory:price-map:v{version}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = json.dumps(catalog_price_map(), separators=(",", ":"))
+        cache.set(key, payload, PRICE_MAP_CACHE_TIMEOUT)
 
-    return render(request, "inventory/low_stock.html", {"rows": low, "default_threshold": DEFAULT_LOW_STOCK})
\ No newline at end of file
+    response = HttpResponse(payload, content_type="application/json")
+    # Always revalidate (cheap 304), never serve a stale price from the browser cache.
+    response["Cache-Control"] = "private, no-cache"
+    return response
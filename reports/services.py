@@ -0,0 +1,245 @@
+"""
+Sales reports over arbitrary date ranges.
+
+A range is split into whole local days, answered from the daily rollups
+(DailyItemSales / DailySales / DailyPayments), and the partial days at either
+edge, answered from the raw Sale/SaleItem/Payment rows. Grouping by customer
+has no rollup, so it always reads raw rows. Results are cached per parameters
+and rollup generation, so a repeated report costs one cache read.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, DecimalField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from sales.models import DailyItemSales, DailyPayments, DailySales, Payment, SaleItem
+from core.replica import primary_reads, replica_has
+from sales.services import ROLLUP_CHANGED_AT_KEY, rollup_generation
+
+
+BUCKETS = ("day", "week", "month")
+GROUPS = {
+    "none": "Total",
+    "category": "Category",
+    "item": "Item",
+    "customer": "Customer",
+    "method": "Payment method",
+}
+
+# Detail rows rendered at most; totals and the chart always cover everything.
+REPORT_ROW_LIMIT = 1000
+
+_MONEY = DecimalField(max_digits=16, decimal_places=2)
+_ZERO = Decimal("0.00")
+
+
+def _money(value) -> Decimal:
+    # SQLite hands back raw sums like 288.2000000000000
+    return (value or _ZERO).quantize(_ZERO)
+
+
+def cache_seconds() -> int:
+    # Writes bump the rollup generation (new key); this only bounds what that misses,
+    # e.g. cost price edits feeding the margin.
+    return getattr(settings, "REPORTS_CACHE_SECONDS", 60 * 15)
+
+
+def _midnight(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def plan_segments(start: datetime, end: datetime) -> list[tuple]:
+    """
+    Splits [start, end) into ("rollup", first_day, last_day) for the whole
+    local days inside it and ("raw", lo, hi) for the partial edges.
+    """
+    first_full = timezone.localdate(start)
+    if start > _midnight(first_full):
+        first_full += timedelta(days=1)
+    last_full = timezone.localdate(end) - timedelta(days=1)  # end is exclusive
+
+    if first_full > last_full:
+        return [("raw", start, end)]
+
+    segments = []
+    if start < _midnight(first_full):
+        segments.append(("raw", start, _midnight(first_full)))
+    segments.append(("rollup", first_full, last_full))
+    if _midnight(last_full + timedelta(days=1)) < end:
+        segments.append(("raw", _midnight(last_full + timedelta(days=1)), end))
+    return segments
+
+
+def _bucket(field, bucket):
+    return Trunc(field, bucket, output_field=DateField())
+
+
+# Per source: (key field, label fields) for each grouping
+_ROLLUP_GROUPS = {
+    "none": (None, ()),
+    "category": ("item__category_id", ("item__category__name",)),
+    "item": ("item_id", ("item__name", "item__sku")),
+}
+_RAW_GROUPS = {
+    "none": (None, ()),
+    "category": ("item__category_id", ("item__category__name",)),
+    "item": ("item_id", ("item__name", "item__sku")),
+    "customer": ("sale__customer_id", ("sale__customer__name",)),
+}
+
+
+def _label(group, row, fields):
+    if group == "none":
+        return GROUPS["none"]
+    values = [row[f] for f in fields]
+    if values[0] is None:
+        return "Walk-in" if group == "customer" else "Uncategorized"
+    if group == "item":
+        return f"{values[0]} ({values[1]})"
+    return values[0]
+
+
+def _sales_rows(kind, lo, hi, bucket, group):
+    """(bucket, key, label, sales, units, revenue, cost) rows for one segment."""
+    if kind == "rollup":
+        key, labels = _ROLLUP_GROUPS[group]
+        qs = DailyItemSales.objects.filter(day__gte=lo, day__lte=hi).annotate(b=_bucket("day", bucket))
+        units, revenue = Sum("units"), Sum("revenue")
+        cost = Sum(F("units") * F("item__cost_price"), output_field=_MONEY)
+        sales = None
+    else:
+        key, labels = _RAW_GROUPS[group]
+        qs = SaleItem.objects.filter(sale__created_at__gte=lo, sale__created_at__lt=hi).annotate(
+            b=_bucket("sale__created_at", bucket)
+        )
+        units, revenue = Sum("quantity"), Sum("line_total")
+        cost = Sum(F("quantity") * F("item__cost_price"), output_field=_MONEY)
+        # Sales can't be counted per item/category from the rollups, so don't for raw edges either.
+        sales = Count("sale_id", distinct=True) if group in ("none", "customer") else None
+
+    fields = ["b"] + ([key, *labels] if key else [])
+    # Aliases must not shadow the rollup's own units/revenue columns.
+    aggregates = {"total_units": units, "total_revenue": revenue, "total_cost": cost}
+    if sales is not None:
+        aggregates["total_sales"] = sales
+    for row in qs.order_by().values(*fields).annotate(**aggregates):
+        yield (
+            row["b"], row[key] if key else None, _label(group, row, labels), row.get("total_sales"),
+            int(row["total_units"] or 0), _money(row["total_revenue"]), _money(row["total_cost"]),
+        )
+
+    if kind == "rollup" and group == "none":
+        # Sale counts per bucket live on DailySales (item rows can't count sales).
+        counts = (
+            DailySales.objects.filter(day__gte=lo, day__lte=hi)
+            .annotate(b=_bucket("day", bucket))
+            .order_by().values("b").annotate(n=Sum("sale_count"))
+        )
+        for row in counts:
+            yield (row["b"], None, GROUPS["none"], int(row["n"] or 0), 0, _ZERO, _ZERO)
+
+
+def _payment_rows(kind, lo, hi, bucket):
+    """(bucket, method, label, count, amount) rows for one segment."""
+    if kind == "rollup":
+        qs = DailyPayments.objects.filter(day__gte=lo, day__lte=hi).annotate(b=_bucket("day", bucket))
+        count, amount = Sum("payment_count"), Sum("amount")
+    else:
+        qs = Payment.objects.filter(created_at__gte=lo, created_at__lt=hi).annotate(b=_bucket("created_at", bucket))
+        count, amount = Count("id"), Sum("amount")
+
+    labels = dict(Payment.Method.choices)
+    for row in qs.order_by().values("b", "method").annotate(n=count, total_amount=amount):
+        yield row["b"], row["method"], labels.get(row["method"], row["method"]), int(row["n"] or 0), _money(row["total_amount"])
+
+
+def build_report(start: datetime, end: datetime, bucket: str = "day", group: str = "none") -> dict:
+    """
+    Uncached report for [start, end). Returns plain data:
+      rows:   [{bucket, label, sales, units, revenue, cost, margin}] or, for
+              group="method", [{bucket, label, count, amount}]
+      series: per-bucket totals for the chart ({bucket, value, pct})
+      totals, sources (which segments came from rollups vs raw rows), truncated
+    """
+    if group == "customer":
+        # No customer rollup: one raw pass over the whole range.
+        segments = [("raw", start, end)]
+    else:
+        segments = plan_segments(start, end)
+
+    merged = {}
+    if group == "method":
+        for kind, lo, hi in segments:
+            for b, key, label, n, amount in _payment_rows(kind, lo, hi, bucket):
+                row = merged.setdefault((b, key), {"bucket": b, "label": label, "count": 0, "amount": _ZERO})
+                row["count"] += n
+                row["amount"] += amount
+        rows = sorted(merged.values(), key=lambda r: (r["bucket"], -r["amount"]))
+        totals = {
+            "count": sum(r["count"] for r in rows),
+            "amount": sum((r["amount"] for r in rows), _ZERO),
+        }
+        value = "amount"
+    else:
+        for kind, lo, hi in segments:
+            for b, key, label, sales, units, revenue, cost in _sales_rows(kind, lo, hi, bucket, group):
+                row = merged.setdefault((b, key), {
+                    "bucket": b, "label": label, "sales": None, "units": 0, "revenue": _ZERO, "cost": _ZERO,
+                })
+                if sales is not None:
+                    row["sales"] = (row["sales"] or 0) + sales
+                row["units"] += units
+                row["revenue"] += revenue
+                row["cost"] += cost
+        rows = [r for r in merged.values() if r["units"] or r["revenue"] or r["sales"]]
+        for r in rows:
+            r["margin"] = r["revenue"] - r["cost"]
+        rows.sort(key=lambda r: (r["bucket"], -r["revenue"]))
+        totals = {
+            "sales": sum(r["sales"] or 0 for r in rows) if group in ("none", "customer") else None,
+            "units": sum(r["units"] for r in rows),
+            "revenue": sum((r["revenue"] for r in rows), _ZERO),
+            "cost": sum((r["cost"] for r in rows), _ZERO),
+        }
+        totals["margin"] = totals["revenue"] - totals["cost"]
+        value = "revenue"
+
+    per_bucket = {}
+    for r in rows:
+        per_bucket[r["bucket"]] = per_bucket.get(r["bucket"], _ZERO) + r[value]
+    peak = max(per_bucket.values(), default=_ZERO)
+    series = [
+        {"bucket": b, "value": v, "pct": int(v * 100 / peak) if peak > 0 else 0}
+        for b, v in sorted(per_bucket.items())
+    ]
+
+    return {
+        "rows": rows[:REPORT_ROW_LIMIT],
+        "truncated": len(rows) > REPORT_ROW_LIMIT,
+        "row_count": len(rows),
+        "series": series,
+        "value": value,
+        "totals": totals,
+        "sources": segments,
+    }
+
+
+def sales_report(start: datetime, end: datetime, bucket: str = "day", group: str = "none") -> dict:
+    """build_report, cached per parameters and rollup generation."""
+    raw_key = f"{start.isoformat()}|{end.isoformat()}|{bucket}|{group}|g{rollup_generation()}"
+    key = "reports:sales:" + hashlib.sha1(raw_key.encode()).hexdigest()
+    result = cache.get(key)
+    if result is None:
+        if replica_has(cache.get(ROLLUP_CHANGED_AT_KEY)):
+            result = build_report(start, end, bucket, group)
+        else:
+            # The replica predates the last rollup change; don't cache its numbers under the new generation.
+            with primary_reads():
+                result = build_report(start, end, bucket, group)
+        cache.set(key, result, cache_seconds())
+    return result
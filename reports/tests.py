@@ -0,0 +1,118 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import Item, StockMovement
+from inventory.services import create_movements
+from sales.models import Payment, Sale, SaleItem
+from sales.services import create_sale
+
+from .services import build_report, plan_segments, sales_report
+
+
+def _at(d, hour=0, minute=0):
+    return timezone.make_aware(datetime.combine(d, time(hour, minute)))
+
+
+class PlanSegmentsTests(TestCase):
+    """plan_segments: whole local days from the rollups, partial edges from raw rows."""
+
+    def test_partial_edges_around_whole_days(self):
+        start, end = _at(date(2026, 2, 2), 15), _at(date(2026, 2, 5), 10)
+        self.assertEqual(plan_segments(start, end), [
+            ("raw", start, _at(date(2026, 2, 3))),
+            ("rollup", date(2026, 2, 3), date(2026, 2, 4)),
+            ("raw", _at(date(2026, 2, 5)), end),
+        ])
+
+    def test_midnight_bounds_are_all_rollup(self):
+        self.assertEqual(
+            plan_segments(_at(date(2026, 2, 2)), _at(date(2026, 2, 5))),
+            [("rollup", date(2026, 2, 2), date(2026, 2, 4))],
+        )
+
+    def test_range_inside_one_day_is_raw(self):
+        start, end = _at(date(2026, 2, 2), 9), _at(date(2026, 2, 2), 17)
+        self.assertEqual(plan_segments(start, end), [("raw", start, end)])
+
+    def test_less_than_a_day_across_midnight_is_raw(self):
+        start, end = _at(date(2026, 2, 2), 20), _at(date(2026, 2, 3), 6)
+        self.assertEqual(plan_segments(start, end), [("raw", start, end)])
+
+
+class SalesReportTests(TestCase):
+    """Report totals match the raw rows, and writes move the cached report on."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pen, cls.ink = Item.objects.bulk_create([
+            Item(name="Pen", sku="RPT-001", sell_price=Decimal("4.00"), cost_price=Decimal("1.50")),
+            Item(name="Ink", sku="RPT-002", sell_price=Decimal("6.25"), cost_price=Decimal("2.00")),
+        ])
+        create_movements([
+            StockMovement(item=it, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=500)
+            for it in (cls.pen, cls.ink)
+        ])
+        # Before, on both partial edges, inside the whole days, and after the range below.
+        for when, pens, inks, paid in [
+            (_at(date(2026, 2, 2), 9), 1, 0, "4.00"),
+            (_at(date(2026, 2, 2), 18), 2, 1, "5.00"),
+            (_at(date(2026, 2, 3), 0), 0, 3, "0"),
+            (_at(date(2026, 2, 3), 12), 5, 2, "20.00"),
+            (_at(date(2026, 2, 4), 23, 59), 1, 1, "10.25"),
+            (_at(date(2026, 2, 5), 8), 3, 0, "12.00"),
+            (_at(date(2026, 2, 5), 10), 4, 4, "1.00"),
+        ]:
+            lines = [
+                SaleItem(item=item, quantity=qty, unit_price=item.sell_price)
+                for item, qty in ((cls.pen, pens), (cls.ink, inks)) if qty
+            ]
+            sale = create_sale(Sale(created_at=when), lines)
+            if Decimal(paid):
+                Payment.objects.create(sale=sale, amount=Decimal(paid), created_at=when)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.start, self.end = _at(date(2026, 2, 2), 15), _at(date(2026, 2, 5), 10)
+
+    def test_totals_match_raw_rows_over_partial_days(self):
+        report = build_report(self.start, self.end)
+        self.assertEqual([kind for kind, _, _ in report["sources"]], ["raw", "rollup", "raw"])
+
+        lines = SaleItem.objects.filter(sale__created_at__gte=self.start, sale__created_at__lt=self.end)
+        raw = lines.aggregate(units=Sum("quantity"), revenue=Sum("line_total"))
+        sales = Sale.objects.filter(created_at__gte=self.start, created_at__lt=self.end)
+        self.assertEqual(report["totals"]["sales"], sales.count())
+        self.assertEqual(report["totals"]["units"], raw["units"])
+        self.assertEqual(report["totals"]["revenue"], raw["revenue"])
+        self.assertEqual(report["totals"]["cost"], sum(line.quantity * line.item.cost_price for line in lines))
+
+        by_item = {}
+        for r in build_report(self.start, self.end, group="item")["rows"]:
+            by_item[r["label"]] = by_item.get(r["label"], 0) + r["units"]
+        self.assertEqual(by_item, {"Pen (RPT-001)": 11, "Ink (RPT-002)": 7})
+
+        payments = build_report(self.start, self.end, group="method")
+        raw_payments = Payment.objects.filter(created_at__gte=self.start, created_at__lt=self.end)
+        self.assertEqual(payments["totals"]["count"], raw_payments.count())
+        self.assertEqual(payments["totals"]["amount"], raw_payments.aggregate(s=Sum("amount"))["s"])
+
+    def test_write_moves_the_cached_report_on(self):
+        before = sales_report(self.start, self.end)
+        with self.assertNumQueries(0):
+            self.assertEqual(sales_report(self.start, self.end), before)
+
+        # The rollup generation moves when the write commits, and with it the cache key.
+        with self.captureOnCommitCallbacks(execute=True):
+            create_sale(
+                Sale(created_at=_at(date(2026, 2, 3), 15)),
+                [SaleItem(item=self.pen, quantity=2, unit_price=self.pen.sell_price)],
+            )
+        after = sales_report(self.start, self.end)
+        self.assertEqual(after["totals"]["sales"], before["totals"]["sales"] + 1)
+        self.assertEqual(after["totals"]["revenue"], before["totals"]["revenue"] + Decimal("8.00"))
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = "reports"
+
+urlpatterns = [
+    path("", views.sales_report_view, name="sales"),
+]
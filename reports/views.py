@@ -0,0 +1,69 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from core.permissions import is_manager
+from core.replica import replica_reads
+
+from .services import BUCKETS, GROUPS, sales_report
+
+
+def _parse_date(raw, default):
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d").date() if raw else default
+    except ValueError:
+        return default
+
+
+def _parse_time(raw):
+    try:
+        return datetime.strptime(raw, "%H:%M").time() if raw else None
+    except ValueError:
+        return None
+
+
+@login_required
+@replica_reads
+def sales_report_view(request):
+    # Margins expose cost prices, so this is for managers only.
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can view reports.")
+
+    today = timezone.localdate()
+    start_date = _parse_date(request.GET.get("start", "").strip(), today - timedelta(days=29))
+    end_date = _parse_date(request.GET.get("end", "").strip(), today)
+    start_time = _parse_time(request.GET.get("start_time", "").strip())
+    end_time = _parse_time(request.GET.get("end_time", "").strip())
+    if end_date < start_date:
+        start_date, end_date = end_date, start_date
+
+    bucket = request.GET.get("bucket", "day")
+    bucket = bucket if bucket in BUCKETS else "day"
+    group = request.GET.get("group", "none")
+    group = group if group in GROUPS else "none"
+
+    # The end date is inclusive unless a time is given (then it's "up to" that time).
+    start = make_aware(datetime.combine(start_date, start_time or time.min))
+    if end_time:
+        end = make_aware(datetime.combine(end_date, end_time))
+    else:
+        end = make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+    report = sales_report(start, end, bucket, group) if end > start else None
+
+    return render(request, "reports/sales_report.html", {
+        "report": report,
+        "start": start_date,
+        "end": end_date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "bucket": bucket,
+        "group": group,
+        "group_label": GROUPS[group],
+        "buckets": BUCKETS,
+        "groups": GROUPS,
+    })
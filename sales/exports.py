@@ -0,0 +1,46 @@
+"""
+CSV exports of sales, sale lines and payments, filtered like the sales list.
+Each export is (filename, header, rows) with rows streamed from values_list.
+"""
+from core.csv_export import stream_rows
+
+from .models import Payment, Sale, SaleItem
+from .services import filter_sales
+
+
+def _filtered_sale_ids(params):
+    return filter_sales(Sale.objects.all(), params).values("pk")
+
+
+def export_sales(params):
+    fields = [
+        "id", "created_at", "customer_id", "customer__name", "status",
+        "subtotal", "total", "paid_amount", "notes",
+    ]
+    rows = stream_rows(filter_sales(Sale.objects.all(), params).order_by("pk"), fields)
+    header = ["sale_id", "created_at", "customer_id", "customer", "status", "subtotal", "total", "paid", "notes"]
+    return "sales.csv", header, rows
+
+
+def export_sale_lines(params):
+    fields = [
+        "sale_id", "sale__created_at", "sale__customer__name", "item_id", "item__sku", "item__name",
+        "quantity", "unit_price", "line_total",
+    ]
+    lines = SaleItem.objects.filter(sale_id__in=_filtered_sale_ids(params)).order_by("sale_id", "pk")
+    header = ["sale_id", "sale_created_at", "customer", "item_id", "sku", "item", "quantity", "unit_price", "line_total"]
+    return "sale_lines.csv", header, stream_rows(lines, fields)
+
+
+def export_payments(params):
+    fields = ["id", "sale_id", "created_at", "method", "amount", "sale__customer__name", "note"]
+    payments = Payment.objects.filter(sale_id__in=_filtered_sale_ids(params)).order_by("pk")
+    header = ["payment_id", "sale_id", "created_at", "method", "amount", "customer", "note"]
+    return "payments.csv", header, stream_rows(payments, fields)
+
+
+EXPORTS = {
+    "sales": export_sales,
+    "lines": export_sale_lines,
+    "payments": export_payments,
+}
@@ -1,5 +1,10 @@
+import re
+
 from django import forms
-from django.forms import inlineformset_factory
+from django.core.exceptions import ValidationError
+from django.forms import BaseInlineFormSet, inlineformset_factory
+
+from inventory.models import Item
 from .models import Sale, SaleItem, Payment
 
 class SaleForm(forms.ModelForm):
@@ -11,16 +16,68 @@ class SaleForm(forms.ModelForm):
         }
 
 
+class LookupChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that, once given a prefetched {pk: object} map as
+    `lookup`, resolves the posted id from it instead of running one query per
+    formset row.
+    """
+
+    def __init__(self, *args, lookup=None, **kwargs):
+        self.lookup = lookup
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if self.lookup is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            obj = self.lookup.get(int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+        return obj
+
+
+class ItemLookupField(LookupChoiceField):
+    """
+    Item picked through the typeahead (a hidden id); never renders the full
+    <select> of the catalog.
+    """
+    widget = forms.HiddenInput
+
+
 class SaleItemForm(forms.ModelForm):
+    item = ItemLookupField(queryset=Item.objects.all())
+
     class Meta:
         model = SaleItem
         fields = ["item", "quantity", "unit_price"]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, item_lookup=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields["item"].lookup = item_lookup
         # Allow leaving it empty filling it from item.sell_price
         self.fields["unit_price"].required = False
 
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if self.fields["item"].lookup is not None:
+            # The id came out of the prefetched map, so it exists; model
+            # validation would check that again with a query per row.
+            exclude.add("item")
+        return exclude
+
+    @property
+    def item_label(self):
+        """Text shown in the row's search box for the currently picked item."""
+        item = None
+        if self.is_bound:
+            item = (getattr(self, "cleaned_data", None) or {}).get("item")
+        elif self.instance.item_id:
+            item = self.instance.item
+        return str(item) if item else ""
+
     def clean(self):
         cleaned = super().clean()
         item = cleaned.get("item")
@@ -39,10 +96,59 @@ class SaleItemForm(forms.ModelForm):
         return q
 
 
+class BaseSaleItemFormSet(BaseInlineFormSet):
+    """
+    Resolves every posted item id with a single query for the whole formset
+    (instead of a ModelChoiceField lookup per row), and loads existing lines
+    with their items in one go; posted line ids resolve against those.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._item_lookup = self._prefetch_items() if self.is_bound else None
+
+    def _prefetch_items(self):
+        pattern = re.compile(rf"^{re.escape(self.prefix)}-\d+-item$")
+        ids = set()
+        for key, value in self.data.items():
+            if pattern.match(key) and str(value).isdigit():
+                ids.add(int(value))
+        return Item.objects.in_bulk(ids) if ids else {}
+
+    def get_queryset(self):
+        # super() caches its queryset; keep the select_related clone cached too
+        if not hasattr(self, "_lines_queryset"):
+            self._lines_queryset = super().get_queryset().select_related("item")
+        return self._lines_queryset
+
+    def _existing_lines(self) -> dict:
+        # The same map BaseModelFormSet._existing_object builds (and reuses).
+        if not hasattr(self, "_object_dict"):
+            self._object_dict = {o.pk: o for o in self.get_queryset()}
+        return self._object_dict
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if self.is_bound and self.instance.pk:
+            # The hidden line id is a ModelChoiceField doing a .get() per row.
+            name = self._pk_field.name
+            field = form.fields[name]
+            form.fields[name] = LookupChoiceField(
+                field.queryset, initial=field.initial, required=False, widget=field.widget,
+                lookup=self._existing_lines(),
+            )
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs["item_lookup"] = self._item_lookup
+        return kwargs
+
+
 SaleItemFormSet = inlineformset_factory(
     Sale,
     SaleItem,
     form=SaleItemForm,
+    formset=BaseSaleItemFormSet,
     extra=1,
     can_delete=True,
 )
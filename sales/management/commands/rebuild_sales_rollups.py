@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.services import rebuild_sales_rollups
+
+
+def _date(value, flag):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        raise CommandError(f"{flag} must be YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Backfill (or repair) the daily sales/payment rollups from the raw sale rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First local day to rebuild, YYYY-MM-DD (default: first sale).")
+        parser.add_argument("--to", dest="end", help="Last local day to rebuild, YYYY-MM-DD (default: today).")
+
+    def handle(self, *args, **options):
+        start = _date(options["start"], "--from")
+        end = _date(options["end"], "--to")
+        if start and end and start > end:
+            raise CommandError("--from is after --to")
+
+        days = rebuild_sales_rollups(
+            start=start,
+            end=end,
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups: {days} day(s) with sales."))
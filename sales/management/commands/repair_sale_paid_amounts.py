@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.services import find_paid_amount_drift, repair_sale_paid_amounts
+
+
+class Command(BaseCommand):
+    help = "Back-fill / repair Sale.paid_amount from the Payment rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drift; exit non-zero if any.")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drift = list(find_paid_amount_drift()[:50])
+            for sale in drift:
+                self.stdout.write(f"Sale #{sale.pk}: stored {sale.paid_amount}, payments {sale.actual_paid}")
+            if drift:
+                raise CommandError("paid_amount is out of sync. Run without --check to repair.")
+            self.stdout.write(self.style.SUCCESS("paid_amount matches payments."))
+            return
+
+        fixed = repair_sale_paid_amounts()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} sale(s)."))
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_paid_amount(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    Payment = apps.get_model("sales", "Payment")
+
+    paid = Subquery(
+        Payment.objects.filter(sale_id=OuterRef("pk"))
+        .order_by()
+        .values("sale_id")
+        .annotate(s=Sum("amount"))
+        .values("s")[:1]
+    )
+    Sale.objects.update(
+        paid_amount=Coalesce(paid, Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0002_saleauditlog"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sale",
+            name="paid_amount",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_paid_amount, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,165 @@
+# Generated by Django 6.0.1 on 2026-10-17 22:02
+
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    SaleItem = apps.get_model("sales", "SaleItem")
+    Payment = apps.get_model("sales", "Payment")
+    DailySales = apps.get_model("sales", "DailySales")
+    DailyItemSales = apps.get_model("sales", "DailyItemSales")
+    DailyPayments = apps.get_model("sales", "DailyPayments")
+
+    item_rows, totals = [], defaultdict(lambda: [0, Decimal("0.00")])
+    lines = (
+        SaleItem.objects.order_by()
+        .annotate(day=TruncDate("sale__created_at"))
+        .values("day", "item_id")
+        .annotate(units=Sum("quantity"), revenue=Sum("line_total"))
+    )
+    for row in lines:
+        item_rows.append(DailyItemSales(day=row["day"], item_id=row["item_id"], units=row["units"], revenue=row["revenue"]))
+        totals[row["day"]][0] += row["units"]
+        totals[row["day"]][1] += row["revenue"]
+    DailyItemSales.objects.bulk_create(item_rows, batch_size=1000)
+
+    per_day = Sale.objects.order_by().annotate(day=TruncDate("created_at")).values("day").annotate(n=Count("id"))
+    DailySales.objects.bulk_create(
+        [DailySales(day=r["day"], sale_count=r["n"], units=totals[r["day"]][0], revenue=totals[r["day"]][1]) for r in per_day],
+        batch_size=1000,
+    )
+
+    payments = (
+        Payment.objects.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "method")
+        .annotate(n=Count("id"), amount=Sum("amount"))
+    )
+    DailyPayments.objects.bulk_create(
+        [DailyPayments(day=r["day"], method=r["method"], payment_count=r["n"], amount=r["amount"]) for r in payments],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_catalogversion"),
+        ("sales", "0003_sale_paid_amount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True)),
+                ("sale_count", models.IntegerField(default=0)),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyPayments",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "method",
+                    models.CharField(
+                        choices=[
+                            ("CASH", "Cash"),
+                            ("CARD", "Card"),
+                            ("TRANSFER", "Transfer"),
+                            ("OTHER", "Other"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("payment_count", models.IntegerField(default=0)),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "method"), name="uniq_daily_payments_day_method"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyItemSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="inventory.item",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(
+                        fields=["item", "day"], name="sales_daily_item_id_80b4cc_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "item"), name="uniq_daily_item_sales_day_item"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
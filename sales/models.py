@@ -1,8 +1,22 @@
-from django.db import models
-from django.db.models import Sum
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 from django.conf import settings
 
+from core.dashboard import invalidate_dashboard
+from core.metrics import PAYMENTS, PAYMENTS_AMOUNT, SALES, count_on_commit
+
+def paid_status():
+    """Sale.status from the stored paid_amount, in SQL (same rule as Sale.refresh_status)."""
+    return Case(
+        When(Q(total__gt=0) & Q(paid_amount__gte=F("total")), then=Value(Sale.Status.PAID)),
+        When(paid_amount__gt=0, then=Value(Sale.Status.PARTIAL)),
+        default=Value(Sale.Status.UNPAID),
+    )
+
+
 # Create your models here.
 class Sale(models.Model):
     class Status(models.TextChoices):
@@ -26,6 +40,9 @@ class Sale(models.Model):
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    # Denormalized sum of payments; kept in sync by Payment.save()/delete()
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.UNPAID)
 
     class Meta:
@@ -38,16 +55,63 @@ class Sale(models.Model):
     def __str__(self):
         return f"Sale #{self.pk}"
 
-    @property
-    def paid_amount(self):
-        agg = self.payments.aggregate(total=Sum("amount"))
-        return agg["total"] or 0
+    def save(self, *args, **kwargs):
+        from customers.services import sync_account_for_sale_save
+
+        adding = self._state.adding or not self.pk
+        update_fields = kwargs.get("update_fields")
+
+        # paid_amount only moves through F() updates from Payment; a full save
+        # (e.g. ModelForm) must not write back a stale in-memory copy.
+        if not adding and update_fields is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "paid_amount"
+            ]
+
+        # Customer accounts only care about customer/total changes.
+        touches_account = adding or update_fields is None or {"customer", "total"} & set(update_fields)
+
+        # savepoint=False: these writes live or die with the caller's transaction.
+        with transaction.atomic(savepoint=False):
+            old = None
+            if touches_account and not adding:
+                old = Sale.objects.filter(pk=self.pk).values("customer_id", "total", "paid_amount").first()
+            super().save(*args, **kwargs)
+            if touches_account:
+                sync_account_for_sale_save(old, self)
+            invalidate_dashboard("sale")
+
+    def delete(self, *args, **kwargs):
+        from customers.services import apply_account_deltas, refresh_last_sale_at
+        from .services import record_payments_rollup, record_sales_rollup
+
+        with transaction.atomic(savepoint=False):
+            old = Sale.objects.filter(pk=self.pk).values("customer_id", "total", "paid_amount", "created_at").first()
+            # Lines and payments go with the sale (cascade); take them out of the rollups.
+            lines = list(SaleItem.objects.filter(sale_id=self.pk).values_list("item_id", "quantity", "line_total"))
+            payments = [
+                (created_at, method, -1, -amount)
+                for created_at, method, amount in Payment.objects.filter(sale_id=self.pk).values_list(
+                    "created_at", "method", "amount"
+                )
+            ]
+            result = super().delete(*args, **kwargs)
+            if old:
+                apply_account_deltas(old["customer_id"], spent=-old["total"], paid=-old["paid_amount"])
+                refresh_last_sale_at(old["customer_id"])
+                record_sales_rollup(old["created_at"], removed=lines, sales=-1)
+                record_payments_rollup(payments)
+                count_on_commit(SALES, operation="deleted")
+            invalidate_dashboard("sale")
+        return result
 
     @property
     def balance(self):
         return self.total - self.paid_amount
 
     def refresh_status(self, save=True):
+        # Uses the stored paid_amount; no payment aggregate needed.
         paid = self.paid_amount
         if paid >= self.total and self.total > 0:
             self.status = self.Status.PAID
@@ -96,6 +160,48 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"{self.amount} for Sale #{self.sale_id}"
+
+    def save(self, *args, **kwargs):
+        # Payment + Sale.paid_amount (+ customer account) change together.
+        # F() updates so concurrent posts don't clobber each other.
+        from customers.services import apply_account_paid_delta_for_sale
+        from .services import record_payments_rollup
+
+        with transaction.atomic(savepoint=False):
+            rollup = []
+            adding = self._state.adding or not self.pk
+            if not adding:
+                old = Payment.objects.filter(pk=self.pk).values("sale_id", "amount", "method", "created_at").first()
+                if old:
+                    Sale.objects.filter(pk=old["sale_id"]).update(paid_amount=F("paid_amount") - old["amount"])
+                    apply_account_paid_delta_for_sale(old["sale_id"], -old["amount"])
+                    rollup.append((old["created_at"], old["method"], -1, -old["amount"]))
+            super().save(*args, **kwargs)
+            Sale.objects.filter(pk=self.sale_id).update(paid_amount=F("paid_amount") + self.amount)
+            # Status follows paid_amount whichever path wrote the payment (view, admin inline).
+            touched = {self.sale_id, old["sale_id"]} if not adding and old else {self.sale_id}
+            Sale.objects.filter(pk__in=touched).update(status=paid_status())
+            apply_account_paid_delta_for_sale(self.sale_id, self.amount)
+            rollup.append((self.created_at, self.method, 1, Decimal(self.amount)))
+            record_payments_rollup(rollup)
+            invalidate_dashboard("payment")
+            if adding:
+                count_on_commit(PAYMENTS, method=self.method)
+                count_on_commit(PAYMENTS_AMOUNT, float(self.amount), method=self.method)
+
+    def delete(self, *args, **kwargs):
+        from customers.services import apply_account_paid_delta_for_sale
+        from .services import record_payments_rollup
+
+        with transaction.atomic(savepoint=False):
+            sale_id, amount = self.sale_id, self.amount
+            result = super().delete(*args, **kwargs)
+            Sale.objects.filter(pk=sale_id).update(paid_amount=F("paid_amount") - amount)
+            Sale.objects.filter(pk=sale_id).update(status=paid_status())
+            apply_account_paid_delta_for_sale(sale_id, -amount)
+            record_payments_rollup([(self.created_at, self.method, -1, -Decimal(amount))])
+            invalidate_dashboard("payment")
+        return result
     
 
 class SaleAuditLog(models.Model):
@@ -115,4 +221,55 @@ class SaleAuditLog(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"Audit Sale #{self.sale_id} @ {self.created_at}"
\ No newline at end of file
+        return f"Audit Sale #{self.sale_id} @ {self.created_at}"
+
+# ---------------------------------------------------------------------------
+# Daily rollups (local calendar days), maintained incrementally by
+# sales.services.record_sales_rollup / record_payments_rollup and rebuilt from
+# the raw rows by `manage.py rebuild_sales_rollups`.
+# ---------------------------------------------------------------------------
+
+class DailySales(models.Model):
+    day = models.DateField(unique=True)
+    sale_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-day"]
+
+    def __str__(self):
+        return f"{self.day}: {self.sale_count} sale(s), {self.revenue}"
+
+
+class DailyItemSales(models.Model):
+    day = models.DateField()
+    item = models.ForeignKey("inventory.Item", on_delete=models.CASCADE, related_name="daily_sales")
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "item"], name="uniq_daily_item_sales_day_item"),
+        ]
+        indexes = [models.Index(fields=["item", "day"])]
+
+    def __str__(self):
+        return f"{self.day} {self.item}: {self.units}"
+
+
+class DailyPayments(models.Model):
+    day = models.DateField()
+    method = models.CharField(max_length=20, choices=Payment.Method.choices)
+    payment_count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "method"], name="uniq_daily_payments_day_method"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.method}: {self.amount}"
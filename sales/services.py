@@ -1,106 +1,432 @@
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
-from django.db import transaction
-from django.db.models import Sum
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, DecimalField, F, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
 
-from inventory.models import StockMovement, Item
-from .models import Sale, SaleItem
+from core.metrics import SALES, SALES_REVENUE, count_on_commit
+from inventory.models import StockMovement
+from inventory.services import create_movements
+from .models import DailyItemSales, DailyPayments, DailySales, Payment, Sale, SaleItem, paid_status
 from collections import defaultdict
 
 
-def compute_sale_totals(sale: Sale):
+def price_lines(lines: list[SaleItem]) -> Decimal:
+    """
+    Sets line_total on each (unsaved or saved) SaleItem in memory and returns the subtotal.
+    No queries.
+    """
     subtotal = Decimal("0.00")
-    for si in sale.items.all():
-        si.line_total = (si.unit_price * si.quantity)
-        si.save(update_fields=["line_total"])
+    for si in lines:
+        si.line_total = si.unit_price * si.quantity
         subtotal += si.line_total
-    sale.subtotal = subtotal
-    sale.total = subtotal  # later: discounts/tax/shipping can be added
-    sale.save(update_fields=["subtotal", "total", "updated_at"])
-    sale.refresh_status(save=True)
+    return subtotal
+
+
+def filter_sales(sales, params):
+    """
+    The sales list filters, shared by the list page and the CSV exports.
+    params: request.GET or a dict with any of q, status, customer, from, to
+    (YYYY-MM-DD, inclusive) and with_balance ("1").
+    """
+    q = (params.get("q") or "").strip()
+    status = (params.get("status") or "").strip()
+    customer_id = (params.get("customer") or "").strip()
+    date_from = (params.get("from") or "").strip()
+    date_to = (params.get("to") or "").strip()
+    with_balance = (params.get("with_balance") or "").strip()  # "1" means total > paid_amount
+
+    if status:
+        sales = sales.filter(status=status)
+
+    if customer_id:
+        sales = sales.filter(customer_id=customer_id)
+
+    if q:
+        # If q is numeric, allow searching by sale id
+        if q.isdigit():
+            sales = sales.filter(Q(pk=int(q)) | Q(customer__name__icontains=q))
+        else:
+            sales = sales.filter(customer__name__icontains=q)
+
+    # Date range (inclusive)
+    # Expect YYYY-MM-DD from input type="date"
+    try:
+        if date_from:
+            dt = timezone.make_aware(datetime.combine(datetime.strptime(date_from, "%Y-%m-%d").date(), time.min))
+            sales = sales.filter(created_at__gte=dt)
+        if date_to:
+            dt = timezone.make_aware(datetime.combine(datetime.strptime(date_to, "%Y-%m-%d").date(), time.max))
+            sales = sales.filter(created_at__lte=dt)
+    except ValueError:
+        # If user types invalid date, ignore filters rather than crash
+        pass
+
+    # Optional “with balance” filter: total - paid > 0 (paid_amount is a stored column)
+    if with_balance == "1":
+        sales = sales.filter(total__gt=F("paid_amount"))
+
+    return sales
+
+
+def sale_lines_from_formset(formset) -> list[SaleItem]:
+    """
+    Unsaved SaleItem objects for every non-deleted, filled-in formset row.
+    Rows are rebuilt from cleaned_data so checkout can bulk-write them.
+    """
+    lines = []
+    for f in formset.forms:
+        cd = getattr(f, "cleaned_data", None)
+        if not cd or cd.get("DELETE"):
+            continue
+        item = cd.get("item")
+        qty = cd.get("quantity") or 0
+        if item and qty:
+            lines.append(SaleItem(item=item, quantity=int(qty), unit_price=cd.get("unit_price") or item.sell_price))
+    return lines
+
 
 @transaction.atomic
-def apply_sale_stock_movements_on_create(sale: Sale):
-    # Create SALE movements: negative quantities
-    for si in sale.items.select_related("item").all():
-        StockMovement.objects.create(
-            item=si.item,
+def create_sale(sale: Sale, lines: list[SaleItem]) -> Sale:
+    """
+    Checkout for a new sale. `sale` is unsaved (customer/notes set), `lines`
+    are unsaved SaleItems. The number of queries does not depend on the number
+    of lines: totals are computed in memory, lines and movements are bulk
+    inserted, and the status is known without re-aggregating payments.
+    Stock is reserved by a conditional decrement on the balance rows, so
+    concurrent checkouts can't oversell. Raises InsufficientStock (a
+    ValueError) and rolls everything back if stock would go negative.
+    """
+    sale.subtotal = price_lines(lines)
+    sale.total = sale.subtotal  # later: discounts/tax/shipping can be added
+    sale.refresh_status(save=False)  # nothing paid yet
+    sale.save()
+
+    for line in lines:
+        line.sale = sale
+    SaleItem.objects.bulk_create(lines)
+
+    apply_sale_stock_movements_on_create(sale, lines)
+    record_sales_rollup(sale.created_at, added=_line_rows(lines), sales=1)
+    count_on_commit(SALES, operation="created")
+    count_on_commit(SALES_REVENUE, float(sale.total))
+    return sale
+
+
+@transaction.atomic
+def edit_sale(sale: Sale, lines: list[SaleItem], old_lines: list[dict]) -> Sale:
+    """
+    Checkout for an edited sale. Replaces its lines with `lines` (unsaved
+    SaleItems), posts net stock differences against `old_lines`
+    ({"item_id", "quantity"} captured before the edit) and recomputes totals
+    and status, all in a constant number of queries.
+    Raises InsufficientStock (a ValueError) if stock would go negative.
+    """
+    sale.subtotal = price_lines(lines)
+    sale.total = sale.subtotal
+    sale.save()
+
+    # Status from the stored paid_amount, evaluated in SQL so a payment posted
+    # meanwhile is taken into account.
+    Sale.objects.filter(pk=sale.pk).update(status=paid_status())
+
+    old_rows = list(SaleItem.objects.filter(sale=sale).values_list("item_id", "quantity", "line_total"))
+    SaleItem.objects.filter(sale=sale).delete()
+    for line in lines:
+        line.pk = None
+        line.sale = sale
+    SaleItem.objects.bulk_create(lines)
+
+    apply_sale_stock_movements_on_edit(sale, old_lines, lines)
+    record_sales_rollup(sale.created_at, added=_line_rows(lines), removed=old_rows)
+    count_on_commit(SALES, operation="edited")
+    return sale
+
+
+@transaction.atomic(savepoint=False)
+def apply_sale_stock_movements_on_create(sale: Sale, lines=None):
+    # SALE movements (negative quantities), one bulk insert for all lines
+    if lines is None:
+        lines = list(sale.items.all())
+    movements = [
+        StockMovement(
+            item_id=line.item_id,
             movement_type=StockMovement.MovementType.SALE,
-            quantity_change=-int(si.quantity),
+            quantity_change=-int(line.quantity),
             note=f"Sale #{sale.pk}",
             sale_id=sale.pk,
         )
+        for line in lines
+    ]
+    create_movements(movements, enforce_non_negative=True)
 
 
-@transaction.atomic
-def apply_sale_stock_movements_on_edit(sale: Sale, old_lines: list[dict]):
+def net_stock_changes(old_lines: list[dict], new_lines: list[dict]) -> dict:
     """
-    old_lines: list of dicts: {"item_id": int, "quantity": int}
-    We reverse old items (positive adjustment), then apply new SALE movements.
-    This preserves audit history without deleting anything.
+    {item_id: stock change} needed to go from old_lines to new_lines
+    (each a list of {"item_id", "quantity"}). Positive = stock comes back.
+    Items whose total quantity didn't change are left out.
     """
-    # Reverse old
+    net = defaultdict(int)
     for ol in old_lines:
-        StockMovement.objects.create(
-            item_id=ol["item_id"],
-            movement_type=StockMovement.MovementType.ADJUSTMENT,
-            quantity_change=int(ol["quantity"]),  # add back
-            note=f"Reversal for edited Sale #{sale.pk}",
+        net[ol["item_id"]] += int(ol["quantity"])
+    for nl in new_lines:
+        net[nl["item_id"]] -= int(nl["quantity"])
+    return {item_id: change for item_id, change in net.items() if change}
+
+
+@transaction.atomic(savepoint=False)
+def apply_sale_stock_movements_on_edit(sale: Sale, old_lines: list[dict], new_lines=None):
+    """
+    old_lines: list of dicts: {"item_id": int, "quantity": int}
+    new_lines: SaleItems after the edit (read from the sale if omitted)
+    Posts only the per-item net difference between the old and new lines:
+    a quantity going down returns stock (ADJUSTMENT), going up sells more (SALE).
+    Unchanged items get no rows, so edits don't bloat the ledger with
+    reversal/re-sale pairs.
+    """
+    if new_lines is None:
+        new_lines = list(sale.items.values("item_id", "quantity"))
+    else:
+        new_lines = [{"item_id": si.item_id, "quantity": si.quantity} for si in new_lines]
+
+    movements = []
+    for item_id, change in net_stock_changes(old_lines, new_lines).items():
+        returned = change > 0
+        movements.append(StockMovement(
+            item_id=item_id,
+            movement_type=(
+                StockMovement.MovementType.ADJUSTMENT if returned else StockMovement.MovementType.SALE
+            ),
+            quantity_change=change,
+            note=f"{'Returned on' if returned else 'Added on'} edit of Sale #{sale.pk}",
             sale_id=sale.pk,
-        )
+        ))
+    create_movements(movements, enforce_non_negative=True)
+
+def _payments_sum_subquery():
+    return Coalesce(
+        Subquery(
+            Payment.objects.filter(sale_id=OuterRef("pk"))
+            .order_by()
+            .values("sale_id")
+            .annotate(s=Sum("amount"))
+            .values("s")[:1]
+        ),
+        Decimal("0.00"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
 
-    # Apply new
-    apply_sale_stock_movements_on_create(sale)
 
-def build_qty_by_item_from_formset(formset):
+def find_paid_amount_drift():
     """
-    Returns {item_id: total_qty} for all non-deleted rows.
+    Sales whose stored paid_amount differs from the sum of their payments.
+    Returns a queryset annotated with `actual_paid`.
     """
-    qty_by_item = defaultdict(int)
-    for f in formset.forms:
-        if not hasattr(f, "cleaned_data"):
-            continue
-        cd = f.cleaned_data
-        if not cd or cd.get("DELETE"):
-            continue
-        item = cd.get("item")
-        qty = cd.get("quantity") or 0
-        if item and qty:
-            qty_by_item[item.id] += int(qty)
-    return qty_by_item
+    return (
+        Sale.objects.annotate(actual_paid=_payments_sum_subquery())
+        .exclude(paid_amount=F("actual_paid"))
+        .order_by("pk")
+    )
 
 
-def validate_no_negative_stock(qty_by_item, extra_available_by_item=None):
+@transaction.atomic
+def repair_sale_paid_amounts() -> int:
     """
-    qty_by_item: {item_id: qty_to_sell}
-    extra_available_by_item: {item_id: qty_to_add_back} used during edit (old sale quantities)
-    Raises ValueError with human-readable message if any item would go negative.
+    Rewrites paid_amount (and status) for every drifted sale. Returns rows fixed.
     """
-    extra_available_by_item = extra_available_by_item or {}
-    item_ids = list(qty_by_item.keys())
+    fixed = 0
+    for sale in find_paid_amount_drift().select_for_update():
+        sale.paid_amount = sale.actual_paid
+        sale.refresh_status(save=False)
+        Sale.objects.filter(pk=sale.pk).update(paid_amount=sale.paid_amount, status=sale.status)
+        fixed += 1
+    return fixed
 
-    # Fetch current stocks in one go
-    items = (
-        Item.objects.filter(id__in=item_ids)
-        .annotate(stock=Sum("movements__quantity_change"))
-        .only("id", "name", "sku")
-    )
 
-    info = {}
-    for it in items:
-        info[it.id] = (it.name, it.sku, int(it.stock or 0))
+# ---------------------------------------------------------------------------
+# Daily rollups
+# ---------------------------------------------------------------------------
 
-    errors = []
-    for item_id, qty_needed in qty_by_item.items():
-        name, sku, current = info.get(item_id, ("(Unknown item)", "(no sku)", 0))
-        extra = int(extra_available_by_item.get(item_id, 0))
-        available = current + extra
+# Bumped (after commit) whenever any rollup row changes, so report caches can
+# key on it instead of guessing when their numbers went stale.
+ROLLUP_GENERATION_KEY = "sales:rollups:generation"
+ROLLUP_CHANGED_AT_KEY = "sales:rollups:changed_at"
 
-        if available - qty_needed < 0:
-            errors.append((sku, name, available, qty_needed))
 
-    if errors:
-        lines = [
-            f"{sku} ({name}) — available {available}, needed {needed}"
-            for sku, name, available, needed in errors
+def rollup_generation() -> int:
+    return cache.get_or_set(ROLLUP_GENERATION_KEY, 1, None)
+
+
+def _bump_rollup_generation():
+    def bump():
+        try:
+            cache.incr(ROLLUP_GENERATION_KEY)
+        except ValueError:
+            cache.set(ROLLUP_GENERATION_KEY, 2, None)
+        cache.set(ROLLUP_CHANGED_AT_KEY, timezone.now().timestamp(), None)
+    transaction.on_commit(bump)
+
+
+# Rows per upsert statement; keeps the bound parameters under SQLite's limit.
+ROLLUP_UPDATE_CHUNK = 100
+
+
+def _line_rows(lines) -> list[tuple]:
+    return [(si.item_id, si.quantity, si.line_total) for si in lines]
+
+
+def _apply_rollup_deltas(model, keys: tuple, deltas: dict):
+    """
+    deltas: {(key values...): {field: delta}}
+    Adds the deltas to the rollup rows with one
+    INSERT ... ON CONFLICT (keys) DO UPDATE SET f = f + excluded.f per chunk,
+    creating missing rows on the way. The ORM can't express an incrementing
+    upsert, hence the raw SQL (SQLite 3.24+ and PostgreSQL both accept it).
+    """
+    deltas = {k: d for k, d in deltas.items() if any(d.values())}
+    if not deltas:
+        return
+    _bump_rollup_generation()
+
+    conn = connections[router.db_for_write(model)]
+    qn = conn.ops.quote_name
+    opts = model._meta
+    key_fields = [opts.get_field(k) for k in keys]
+    value_fields = [f for f in opts.concrete_fields if not f.primary_key and f not in key_fields]
+    table = qn(opts.db_table)
+
+    columns = ", ".join(qn(f.column) for f in key_fields + value_fields)
+    conflict = ", ".join(qn(f.column) for f in key_fields)
+    increments = ", ".join(f"{qn(f.column)} = {table}.{qn(f.column)} + excluded.{qn(f.column)}" for f in value_fields)
+    row_sql = "(" + ", ".join(["%s"] * (len(key_fields) + len(value_fields))) + ")"
+
+    rows = list(deltas.items())
+    with conn.cursor() as cursor:
+        for start in range(0, len(rows), ROLLUP_UPDATE_CHUNK):
+            chunk = rows[start:start + ROLLUP_UPDATE_CHUNK]
+            params = []
+            for key, d in chunk:
+                params.extend(f.get_db_prep_value(v, conn) for f, v in zip(key_fields, key))
+                params.extend(f.get_db_prep_save(d.get(f.attname, 0), conn) for f in value_fields)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_sql] * len(chunk))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {increments}",
+                params,
+            )
+
+
+@transaction.atomic(savepoint=False)
+def record_sales_rollup(when, added=(), removed=(), sales: int = 0):
+    """
+    Moves the daily rollups for the local day of `when`.
+    added/removed: (item_id, quantity, line_total) rows; sales: change in the
+    number of sales that day. One upsert per table, however many lines.
+    """
+    day = timezone.localdate(when)
+    units, revenue = 0, Decimal("0.00")
+    per_item = defaultdict(lambda: {"units": 0, "revenue": Decimal("0.00")})
+    for sign, rows in ((1, added), (-1, removed)):
+        for item_id, quantity, line_total in rows:
+            per_item[(day, item_id)]["units"] += sign * int(quantity)
+            per_item[(day, item_id)]["revenue"] += sign * line_total
+            units += sign * int(quantity)
+            revenue += sign * line_total
+
+    _apply_rollup_deltas(DailySales, ("day",), {(day,): {"sale_count": sales, "units": units, "revenue": revenue}})
+    _apply_rollup_deltas(DailyItemSales, ("day", "item"), dict(per_item))
+
+
+@transaction.atomic(savepoint=False)
+def record_payments_rollup(entries):
+    """entries: (created_at, method, count, amount) tuples; negative to take a payment out."""
+    deltas = defaultdict(lambda: {"payment_count": 0, "amount": Decimal("0.00")})
+    for when, method, count, amount in entries:
+        key = (timezone.localdate(when), method)
+        deltas[key]["payment_count"] += count
+        deltas[key]["amount"] += amount
+    _apply_rollup_deltas(DailyPayments, ("day", "method"), dict(deltas))
+
+
+def _local_range(start: date, end: date):
+    """Aware [start 00:00, day after end 00:00) in local time."""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def rebuild_sales_rollups(start: date | None = None, end: date | None = None, log=None) -> int:
+    """
+    Recomputes the daily rollups from Sale/SaleItem/Payment for [start, end]
+    (local days; defaults to the whole history), one month per transaction so a
+    long backfill doesn't hold the write lock. Returns the number of days with sales.
+    """
+    if start is None:
+        first = [
+            m for m in (
+                Sale.objects.aggregate(m=Min("created_at"))["m"],
+                Payment.objects.aggregate(m=Min("created_at"))["m"],
+            ) if m
         ]
-        raise ValueError("Insufficient stock for:\n- " + "\n- ".join(lines))
\ No newline at end of file
+        if not first:
+            return 0
+        start = timezone.localdate(min(first))
+    end = end or timezone.localdate()
+
+    days = 0
+    month = start
+    while month <= end:
+        month_end = min((month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1), end)
+        lo, hi = _local_range(month, month_end)
+
+        with transaction.atomic():
+            DailySales.objects.filter(day__gte=month, day__lte=month_end).delete()
+            DailyItemSales.objects.filter(day__gte=month, day__lte=month_end).delete()
+            DailyPayments.objects.filter(day__gte=month, day__lte=month_end).delete()
+
+            sales = Sale.objects.filter(created_at__gte=lo, created_at__lt=hi).order_by()
+            per_day = {
+                row["day"]: row for row in
+                sales.annotate(day=TruncDate("created_at")).values("day").annotate(n=Count("id"))
+            }
+            lines = (
+                SaleItem.objects.filter(sale__created_at__gte=lo, sale__created_at__lt=hi)
+                .order_by()
+                .annotate(day=TruncDate("sale__created_at"))
+                .values("day", "item_id")
+                .annotate(units=Sum("quantity"), revenue=Sum("line_total"))
+            )
+            item_rows, totals = [], defaultdict(lambda: [0, Decimal("0.00")])
+            for row in lines:
+                item_rows.append(DailyItemSales(
+                    day=row["day"], item_id=row["item_id"], units=row["units"], revenue=row["revenue"],
+                ))
+                totals[row["day"]][0] += row["units"]
+                totals[row["day"]][1] += row["revenue"]
+
+            DailySales.objects.bulk_create([
+                DailySales(day=day, sale_count=row["n"], units=totals[day][0], revenue=totals[day][1])
+                for day, row in per_day.items()
+            ], batch_size=1000)
+            DailyItemSales.objects.bulk_create(item_rows, batch_size=1000)
+            DailyPayments.objects.bulk_create([
+                DailyPayments(day=row["day"], method=row["method"], payment_count=row["n"], amount=row["amount"])
+                for row in (
+                    Payment.objects.filter(created_at__gte=lo, created_at__lt=hi)
+                    .order_by()
+                    .annotate(day=TruncDate("created_at"))
+                    .values("day", "method")
+                    .annotate(n=Count("id"), amount=Sum("amount"))
+                )
+            ], batch_size=1000)
+
+        days += len(per_day)
+        if log:
+            log(f"{month:%Y-%m}: {len(per_day)} day(s), {len(item_rows)} item row(s)")
+        month = month_end + timedelta(days=1)
+
+    _bump_rollup_generation()
+    return days
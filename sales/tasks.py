@@ -0,0 +1,34 @@
+"""Background tasks (core.jobs) for sales: rollup rebuilds, repairs and exports."""
+from datetime import date
+
+from core.jobs import JobError, task, write_csv
+
+from .exports import EXPORTS
+from .services import rebuild_sales_rollups, repair_sale_paid_amounts
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise JobError(f"Not a YYYY-MM-DD date: {value!r}")
+
+
+@task("sales.rebuild_rollups", label="Rebuild sales rollups", manual=True)
+def rebuild_rollups(job, start=None, end=None):
+    days = rebuild_sales_rollups(start=_date(start), end=_date(end))
+    return {"days": days}
+
+
+@task("sales.repair_paid_amounts", label="Repair sale paid amounts", manual=True)
+def repair_paid_amounts(job):
+    return {"repaired": repair_sale_paid_amounts()}
+
+
+@task("sales.export", label="Sales CSV export", max_attempts=1)
+def export(job, kind, params=None):
+    # params: the sales list filters (see filter_sales)
+    if kind not in EXPORTS:
+        raise JobError(f"Unknown export {kind!r}.")
+    filename, header, rows = EXPORTS[kind](params or {})
+    return write_csv(job, filename, header, rows)
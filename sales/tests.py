@@ -1,3 +1,533 @@
-from django.test import TestCase
+import csv
+import io
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Job
+from core.pagination import PAGE_SIZE, encode_cursor
+from customers.models import Customer
+from inventory.models import Item, StockMovement
+from inventory.services import InsufficientStock, create_movements
+
+from .models import DailyItemSales, DailyPayments, DailySales, Payment, Sale, SaleItem
+from .services import (
+    create_sale, edit_sale, find_paid_amount_drift, rebuild_sales_rollups, repair_sale_paid_amounts,
+)
+
+
+class CheckoutQueryCountTests(TestCase):
+    """The checkout must issue the same number of queries for 1 line or 100."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Counter customer")
+        cls.items = Item.objects.bulk_create([
+            Item(name=f"Needle {i}", sku=f"NDL-{i:03}", sell_price=Decimal("2.50"))
+            for i in range(100)
+        ])
+        create_movements([
+            StockMovement(item=it, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=10)
+            for it in cls.items
+        ])
+
+    def _lines(self, n, qty=1):
+        return [SaleItem(item=it, quantity=qty, unit_price=it.sell_price) for it in self.items[:n]]
+
+    def _count_create(self, n):
+        with CaptureQueriesContext(connection) as ctx:
+            create_sale(Sale(customer=self.customer), self._lines(n))
+        return len(ctx.captured_queries)
+
+    def _count_edit(self, n):
+        sale = create_sale(Sale(customer=self.customer), self._lines(n))
+        old_lines = list(sale.items.values("item_id", "quantity"))
+        with CaptureQueriesContext(connection) as ctx:
+            edit_sale(sale, self._lines(n, qty=2), old_lines)
+        return len(ctx.captured_queries)
+
+    def test_create_query_count_is_constant(self):
+        one = self._count_create(1)
+        hundred = self._count_create(100)
+        self.assertEqual(one, hundred)
+        self.assertLessEqual(hundred, 12)
+
+    def test_edit_query_count_is_constant(self):
+        self.assertEqual(self._count_edit(1), self._count_edit(100))
+
+    def _post_data(self, n, sale=None):
+        line_ids = list(sale.items.order_by("id").values_list("id", flat=True)) if sale else []
+        data = {
+            "customer": self.customer.pk, "notes": "",
+            "items-TOTAL_FORMS": n, "items-INITIAL_FORMS": len(line_ids),
+            "items-MIN_NUM_FORMS": 0, "items-MAX_NUM_FORMS": 1000,
+        }
+        for i, item in enumerate(self.items[:n]):
+            data.update({f"items-{i}-item": item.pk, f"items-{i}-quantity": 1, f"items-{i}-unit_price": ""})
+            if i < len(line_ids):
+                data[f"items-{i}-id"] = line_ids[i]
+        return data
+
+    def _post_queries(self, url, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302, "the checkout should have gone through")
+        return len(ctx.captured_queries)
+
+    def test_create_view_query_count_is_constant(self):
+        # The whole request: form/formset validation as well as the checkout.
+        self.client.force_login(get_user_model().objects.create_user("till", password="x"))
+        url = reverse("sales:create")
+        one = self._post_queries(url, self._post_data(1))
+        data = self._post_data(100)
+        with self.assertNumQueries(one):
+            self.client.post(url, data)
+        self.assertEqual(Sale.objects.get(items__item=self.items[99]).items.count(), 100)
+
+    def test_edit_view_query_count_is_constant(self):
+        self.client.force_login(get_user_model().objects.create_user("till", password="x"))
+        small = create_sale(Sale(customer=self.customer), self._lines(1))
+        big = create_sale(Sale(customer=self.customer), self._lines(100))
+        one = self._post_queries(reverse("sales:edit", args=[small.pk]), self._post_data(1, small))
+        url, data = reverse("sales:edit", args=[big.pk]), self._post_data(100, big)
+        with self.assertNumQueries(one):
+            self.client.post(url, data)
+        self.assertEqual(big.items.count(), 100)
+
+    def test_create_sets_totals_status_and_stock(self):
+        sale = create_sale(Sale(customer=self.customer), self._lines(3, qty=2))
+        sale.refresh_from_db()
+        self.assertEqual(sale.total, Decimal("15.00"))
+        self.assertEqual(sale.status, Sale.Status.UNPAID)
+        self.assertEqual(sale.items.count(), 3)
+        self.assertEqual(Item.objects.get(pk=self.items[0].pk).current_stock, 8)
+
+    def test_edit_posts_net_difference_only(self):
+        sale = create_sale(Sale(customer=self.customer), self._lines(2))
+        old_lines = list(sale.items.values("item_id", "quantity"))
+        lines = self._lines(2)
+        lines[1].quantity = 3
+        edit_sale(sale, lines, old_lines)
+
+        edits = StockMovement.objects.filter(sale_id=sale.pk).exclude(note=f"Sale #{sale.pk}")
+        self.assertEqual(list(edits.values_list("item_id", "quantity_change")), [(self.items[1].pk, -2)])
+
+    def test_insufficient_stock_rolls_back(self):
+        with self.assertRaises(ValueError):
+            create_sale(Sale(customer=self.customer), self._lines(1, qty=11))
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(Item.objects.get(pk=self.items[0].pk).current_stock, 10)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """
+    Stress test for stock reservation: many tills hammering the same item
+    must never sell more than is on the shelf, and tills selling other items
+    keep going meanwhile. On SQLite every checkout takes the database-wide
+    write lock, so they all run one at a time (the retries below); "keep
+    going" means they get their turn, not that they run in parallel.
+    Throughput: `manage.py benchmark_concurrency --hot-item`.
+    """
+
+    THREADS = 8
+    OTHER_THREADS = 2
+    ATTEMPTS_PER_THREAD = 15
+    STOCK = 40
+
+    def setUp(self):
+        self.item = Item.objects.create(name="Last bottle", sku="INK-LAST", sell_price=Decimal("9.00"))
+        self.other = Item.objects.create(name="Plenty", sku="INK-MANY", sell_price=Decimal("1.00"))
+        create_movements([
+            StockMovement(item=self.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=self.STOCK),
+            StockMovement(item=self.other, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=10_000),
+        ])
+
+    def _lines(self, n, hot):
+        if not hot:
+            return [SaleItem(item=self.other, quantity=1, unit_price=self.other.sell_price)]
+        # Every other sale also touches an unrelated item.
+        lines = [SaleItem(item=self.item, quantity=1, unit_price=self.item.sell_price)]
+        if n % 2:
+            lines.append(SaleItem(item=self.other, quantity=1, unit_price=self.other.sell_price))
+        return lines
+
+    def _till(self, results, start, hot=True):
+        close_old_connections()
+        try:
+            start.wait()
+            for n in range(self.ATTEMPTS_PER_THREAD):
+                while True:
+                    try:
+                        create_sale(Sale(), self._lines(n, hot))
+                        results.append("sold")
+                    except InsufficientStock:
+                        results.append("refused")
+                    except OperationalError:
+                        # SQLite's single writer lock: a real till would retry too.
+                        time.sleep(0.001)
+                        continue
+                    break
+        finally:
+            connections.close_all()
+
+    def test_no_oversell_under_contention(self):
+        results, other_results, start = [], [], threading.Event()
+        threads = [threading.Thread(target=self._till, args=(results, start)) for _ in range(self.THREADS)]
+        threads += [
+            threading.Thread(target=self._till, args=(other_results, start, False)) for _ in range(self.OTHER_THREADS)
+        ]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+
+        attempts = self.THREADS * self.ATTEMPTS_PER_THREAD
+        self.assertEqual(len(results), attempts)
+        self.assertEqual(results.count("sold"), self.STOCK)
+
+        self.assertEqual(Item.objects.get(pk=self.item.pk).current_stock, 0)
+        self.assertEqual(
+            SaleItem.objects.filter(item=self.item).count(), self.STOCK,
+            "refused checkouts must leave no sale lines behind",
+        )
+        self.assertFalse(Sale.objects.filter(items__isnull=True).exists())
+
+        # Sales of a different item all went through, sold-out or not.
+        self.assertEqual(other_results, ["sold"] * (self.OTHER_THREADS * self.ATTEMPTS_PER_THREAD))
+        self.assertEqual(
+            Item.objects.get(pk=self.other.pk).current_stock,
+            10_000 - SaleItem.objects.filter(item=self.other).count(),
+        )
+
+
+class PaidAmountTests(TestCase):
+    """Sale.paid_amount and status follow every payment write."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = Item.objects.create(name="Ink", sku="INK-001", sell_price=Decimal("10.00"))
+        create_movements([
+            StockMovement(item=cls.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=100),
+        ])
+
+    def _sale(self, qty=1):
+        return create_sale(Sale(), [SaleItem(item=self.item, quantity=qty, unit_price=self.item.sell_price)])
+
+    def _state(self, sale):
+        sale.refresh_from_db()
+        return sale.paid_amount, sale.status
+
+    def test_add_edit_delete_payment(self):
+        sale = self._sale(2)
+        payment = Payment.objects.create(sale=sale, amount=Decimal("5.00"))
+        self.assertEqual(self._state(sale), (Decimal("5.00"), Sale.Status.PARTIAL))
+
+        payment.amount = Decimal("20.00")
+        payment.save()
+        self.assertEqual(self._state(sale), (Decimal("20.00"), Sale.Status.PAID))
+
+        payment.delete()
+        self.assertEqual(self._state(sale), (Decimal("0.00"), Sale.Status.UNPAID))
+        self.assertFalse(find_paid_amount_drift().exists())
+
+    def test_moving_a_payment_to_another_sale(self):
+        first, second = self._sale(), self._sale()
+        payment = Payment.objects.create(sale=first, amount=Decimal("10.00"))
+        payment.sale = second
+        payment.save()
+        self.assertEqual(self._state(first), (Decimal("0.00"), Sale.Status.UNPAID))
+        self.assertEqual(self._state(second), (Decimal("10.00"), Sale.Status.PAID))
+
+    def test_payments_from_stale_instances_do_not_clobber(self):
+        # F() updates: two writers holding the same old Sale both count.
+        sale = self._sale(3)
+        Payment.objects.create(sale=Sale.objects.get(pk=sale.pk), amount=Decimal("4.00"))
+        Payment.objects.create(sale=Sale.objects.get(pk=sale.pk), amount=Decimal("6.00"))
+        self.assertEqual(self._state(sale), (Decimal("10.00"), Sale.Status.PARTIAL))
+
+    def test_repair_rewrites_drifted_sales(self):
+        sale = self._sale()
+        Payment.objects.create(sale=sale, amount=Decimal("10.00"))
+        Sale.objects.filter(pk=sale.pk).update(paid_amount=Decimal("3.00"), status=Sale.Status.PARTIAL)
+        self.assertEqual(list(find_paid_amount_drift().values_list("pk", flat=True)), [sale.pk])
+
+        self.assertEqual(repair_sale_paid_amounts(), 1)
+        self.assertEqual(self._state(sale), (Decimal("10.00"), Sale.Status.PAID))
+        self.assertEqual(repair_sale_paid_amounts(), 0)
+
+
+class KeysetPagingTests(TestCase):
+    """sales_list / debts_view pages: no row lost or repeated at a page edge, filters kept."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("clerk", password="x")
+        # Ties on created_at across the page edge: only the id tiebreak tells them apart.
+        same_time = timezone.now() - timedelta(days=1)
+        cls.sales = Sale.objects.bulk_create([
+            Sale(
+                created_at=same_time if i < PAGE_SIZE + 10 else same_time - timedelta(minutes=i),
+                total=Decimal("10.00"),
+                status=Sale.Status.PAID if i % 3 == 0 else Sale.Status.UNPAID,
+            )
+            for i in range(PAGE_SIZE * 2 + 5)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _walk(self, url, key):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url, headers={"HX-Request": "true"} if pages else {})
+            self.assertEqual(response.status_code, 200)
+            seen += [s.pk for s in response.context[key]]
+            url = response.context["next_url"]
+            pages += 1
+        return seen, pages
+
+    def test_sales_list_walks_every_row_once(self):
+        seen, pages = self._walk(reverse("sales:list"), "sales")
+        self.assertEqual(pages, 3)
+        expected = list(Sale.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_exactly_one_page_has_no_next_link(self):
+        Sale.objects.filter(pk__in=[s.pk for s in self.sales[PAGE_SIZE:]]).delete()
+        response = self.client.get(reverse("sales:list"))
+        self.assertEqual(len(response.context["sales"]), PAGE_SIZE)
+        self.assertIsNone(response.context["next_url"])
+
+    def test_filters_are_carried_through_the_cursor(self):
+        response = self.client.get(reverse("sales:list"), {"status": Sale.Status.UNPAID})
+        next_url = response.context["next_url"]
+        self.assertIn("status=UNPAID", next_url)
+
+        seen, _ = self._walk(f"{reverse('sales:list')}?status={Sale.Status.UNPAID}", "sales")
+        unpaid = Sale.objects.filter(status=Sale.Status.UNPAID).order_by("-created_at", "-id")
+        self.assertEqual(seen, list(unpaid.values_list("pk", flat=True)))
+
+    def test_debts_view_pages_unpaid_sales(self):
+        seen, pages = self._walk(reverse("sales:debts"), "debt_sales")
+        unpaid = Sale.objects.exclude(status=Sale.Status.PAID).order_by("-created_at", "-id")
+        self.assertEqual(seen, list(unpaid.values_list("pk", flat=True)))
+        self.assertEqual(pages, 2)
+
+    def test_garbled_cursor_starts_from_the_top(self):
+        # Undecodable, and decodable but holding values of the wrong kind.
+        cursors = ["not-a-cursor"] + [
+            encode_cursor(values) for values in ([None, None], [{"a": 1}, 1], [1.5, [1]], ["2026-13-45", "x"])
+        ]
+        pages = [
+            (reverse("sales:list"), "sales"),
+            (reverse("sales:debts"), "debt_sales"),
+            (reverse("customers:list"), "customers"),
+            (reverse("inventory:items"), "items"),
+        ]
+        for url, key in pages:
+            first_page = self.client.get(url).context[key]
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.client.get(url, {"cursor": cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.context[key], first_page)
+
+
+class SalesRollupTests(TestCase):
+    """The daily rollups follow every sale/payment write and match a rebuild from scratch."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pen, cls.ink = Item.objects.bulk_create([
+            Item(name="Pen", sku="RLP-001", sell_price=Decimal("4.00")),
+            Item(name="Ink", sku="RLP-002", sell_price=Decimal("6.00")),
+        ])
+        create_movements([
+            StockMovement(item=it, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=100)
+            for it in (cls.pen, cls.ink)
+        ])
+
+    def _sale(self, when=None, **qty):
+        lines = [
+            SaleItem(item=getattr(self, name), quantity=q, unit_price=getattr(self, name).sell_price)
+            for name, q in qty.items()
+        ]
+        return create_sale(Sale(created_at=when or timezone.now()), lines)
+
+    def _rollups(self):
+        # Rows netted back to zero (everything removed) are left behind by the
+        # incremental path but not written by a rebuild; both mean "nothing".
+        return (
+            {r.day: (r.sale_count, r.units, r.revenue) for r in DailySales.objects.exclude(sale_count=0, units=0)},
+            {(r.day, r.item_id): (r.units, r.revenue) for r in DailyItemSales.objects.exclude(units=0, revenue=0)},
+            {(r.day, r.method): (r.payment_count, r.amount) for r in DailyPayments.objects.exclude(payment_count=0)},
+        )
+
+    def _today(self):
+        return DailySales.objects.get(day=timezone.localdate())
+
+    def assertMatchesRebuild(self):
+        incremental = self._rollups()
+        rebuild_sales_rollups()
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_sale_create_edit_delete(self):
+        sale = self._sale(pen=2, ink=1)
+        today = self._today()
+        self.assertEqual((today.sale_count, today.units, today.revenue), (1, 3, Decimal("14.00")))
+
+        old_lines = list(sale.items.values("item_id", "quantity"))
+        edit_sale(sale, [SaleItem(item=self.ink, quantity=3, unit_price=self.ink.sell_price)], old_lines)
+        today = self._today()
+        self.assertEqual((today.sale_count, today.units, today.revenue), (1, 3, Decimal("18.00")))
+        self.assertEqual(DailyItemSales.objects.get(item=self.pen).units, 0)
+        self.assertMatchesRebuild()
+
+        sale.delete()
+        today = self._today()
+        self.assertEqual((today.sale_count, today.units, today.revenue), (0, 0, Decimal("0.00")))
+        self.assertMatchesRebuild()
+
+    def test_payment_create_edit_delete(self):
+        sale = self._sale(pen=5)
+        payment = Payment.objects.create(sale=sale, amount=Decimal("8.00"), method=Payment.Method.CASH)
+        cash = DailyPayments.objects.get(method=Payment.Method.CASH)
+        self.assertEqual((cash.payment_count, cash.amount), (1, Decimal("8.00")))
+
+        payment.amount = Decimal("12.00")
+        payment.method = Payment.Method.CARD
+        payment.save()
+        by_method = dict(DailyPayments.objects.values_list("method", "amount"))
+        self.assertEqual(by_method, {Payment.Method.CASH: Decimal("0.00"), Payment.Method.CARD: Decimal("12.00")})
+        self.assertMatchesRebuild()
+
+        payment.delete()
+        self.assertEqual(DailyPayments.objects.get(method=Payment.Method.CARD).payment_count, 0)
+        self.assertMatchesRebuild()
+
+    def test_rebuild_reproduces_incremental_tables_across_days(self):
+        two_days_ago = timezone.now() - timedelta(days=2)
+        old = self._sale(two_days_ago, pen=1)
+        Payment.objects.create(sale=old, amount=Decimal("4.00"), created_at=two_days_ago)
+        self._sale(pen=3, ink=2)
+        gone = self._sale(ink=1)
+        Payment.objects.create(sale=gone, amount=Decimal("6.00"), method=Payment.Method.TRANSFER)
+        gone.delete()
+
+        incremental = self._rollups()
+        self.assertEqual(len(incremental[0]), 2)
+        DailySales.objects.all().delete()
+        DailyItemSales.objects.all().delete()
+        DailyPayments.objects.all().delete()
+        rebuild_sales_rollups()
+        self.assertEqual(self._rollups(), incremental)
+
+
+class SalesExportTests(TestCase):
+    """The CSV exports stream the rows the sales list filters would show, to Managers only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = Item.objects.create(name="Ink", sku="EXP-001", sell_price=Decimal("10.00"))
+        create_movements([
+            StockMovement(item=cls.item, movement_type=StockMovement.MovementType.RESTOCK, quantity_change=100),
+        ])
+        alice, bob = Customer.objects.create(name="Alice Inkwell"), Customer.objects.create(name="Bob Quill")
+        now = timezone.now()
+
+        def sale(customer, days_ago, paid):
+            sale = create_sale(
+                Sale(customer=customer, created_at=now - timedelta(days=days_ago)),
+                [SaleItem(item=cls.item, quantity=1, unit_price=cls.item.sell_price)],
+            )
+            if paid:
+                Payment.objects.create(sale=sale, amount=Decimal(paid))
+            return sale
+
+        cls.paid = sale(alice, 0, "10.00")
+        cls.partial = sale(alice, 3, "4.00")
+        cls.unpaid = sale(bob, 0, None)
+        cls.old = sale(bob, 10, None)
+        cls.manager = get_user_model().objects.create_user("boss", password="x", is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def _export(self, kind="sales", **params):
+        response = self.client.get(reverse("sales:export", args=[kind]), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def _sale_ids(self, **params):
+        return sorted(int(row[0]) for row in self._export(**params)[1:])
+
+    def test_header_rows(self):
+        self.assertEqual(
+            self._export()[0],
+            ["sale_id", "created_at", "customer_id", "customer", "status", "subtotal", "total", "paid", "notes"],
+        )
+        self.assertEqual(
+            self._export("lines")[0],
+            [
+                "sale_id", "sale_created_at", "customer", "item_id", "sku", "item",
+                "quantity", "unit_price", "line_total",
+            ],
+        )
+        self.assertEqual(
+            self._export("payments")[0],
+            ["payment_id", "sale_id", "created_at", "method", "amount", "customer", "note"],
+        )
+
+    def test_list_filters_are_honoured(self):
+        everything = sorted(s.pk for s in (self.paid, self.partial, self.unpaid, self.old))
+        today = timezone.localdate()
+        self.assertEqual(self._sale_ids(), everything)
+        self.assertEqual(self._sale_ids(q="alice"), sorted([self.paid.pk, self.partial.pk]))
+        self.assertEqual(self._sale_ids(q=str(self.old.pk)), [self.old.pk])
+        self.assertEqual(self._sale_ids(status=Sale.Status.UNPAID), sorted([self.unpaid.pk, self.old.pk]))
+        self.assertEqual(self._sale_ids(with_balance="1"), sorted([self.partial.pk, self.unpaid.pk, self.old.pk]))
+        self.assertEqual(
+            self._sale_ids(**{"from": str(today - timedelta(days=5)), "to": str(today - timedelta(days=1))}),
+            [self.partial.pk],
+        )
+        self.assertEqual(self._sale_ids(q="bob", with_balance="1", **{"from": str(today)}), [self.unpaid.pk])
+
+        # Lines and payments follow the same sale filter.
+        lines = self._export("lines", q="bob")[1:]
+        self.assertEqual(sorted(int(row[0]) for row in lines), sorted([self.unpaid.pk, self.old.pk]))
+        payments = self._export("payments", status=Sale.Status.PARTIAL)[1:]
+        self.assertEqual([(int(row[1]), row[4]) for row in payments], [(self.partial.pk, "4.00")])
+
+    def test_non_managers_get_403(self):
+        self.client.force_login(get_user_model().objects.create_user("clerk", password="x"))
+        for kind in ("sales", "lines", "payments"):
+            with self.subTest(kind=kind):
+                self.assertEqual(self.client.get(reverse("sales:export", args=[kind])).status_code, 403)
+
+
+class ExportQueueTests(TestCase):
+    """The background export takes the list's filters from the posted form."""
+
+    def test_filters_come_from_the_form_body(self):
+        self.client.force_login(get_user_model().objects.create_user("boss", password="x", is_staff=True))
+        page = self.client.get(reverse("sales:list"), {"status": Sale.Status.UNPAID, "q": "ink"})
+        self.assertContains(page, '<input type="hidden" name="status" value="UNPAID">', html=True)
+
+        response = self.client.post(
+            reverse("sales:export_queue", args=["sales"]) + "?status=PAID",
+            {"status": Sale.Status.UNPAID, "q": "ink", "cursor": "x"},
+        )
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse("job_detail", args=[job.pk]), fetch_redirect_response=False)
+        self.assertEqual(job.args, {"kind": "sales", "params": {"q": "ink", "status": "UNPAID"}})
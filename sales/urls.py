@@ -10,7 +10,11 @@ urlpatterns = [
     path("<int:pk>/edit/", views.sale_edit, name="edit"),
     path("<int:pk>/payment/", views.payment_create, name="payment_create"),
     path("debts/", views.debts_view, name="debts"),
+    path("export/<str:kind>.csv", views.sales_export, name="export"),
+    path("export/<str:kind>/queue/", views.sales_export_queue, name="export_queue"),
 
     # HTMX: add a new line item row
     path("htmx/sale-item-row/", views.htmx_sale_item_row, name="htmx_sale_item_row"),
+    # HTMX: item typeahead for the sale lines
+    path("htmx/item-search/", views.htmx_item_search, name="htmx_item_search"),
 ]
\ No newline at end of file
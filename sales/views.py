@@ -1,82 +1,70 @@
 from decimal import Decimal
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
-from django.http import HttpResponse
-from datetime import datetime, time
-from django.utils.timezone import make_aware
-from customers.models import Customer
+from django.http import Http404, HttpResponse
+from customers.models import Customer, CustomerAccount
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.views.decorators.http import require_POST
+from core.metrics import CHECKOUT_SECONDS, STOCK_REJECTIONS
 from core.permissions import is_manager
+from core.csv_export import csv_response
+from core.jobs import enqueue
+from core.pagination import is_htmx, keyset_page
+from core.replica import replica_reads
+from core.search import ranked_search
 
 
-import json
 from inventory.models import Item
+from inventory.services import InsufficientStock
 
-from collections import defaultdict
 
+from .exports import EXPORTS
 from .forms import SaleForm, SaleItemFormSet, PaymentForm
 from .models import Sale, SaleItem, Payment, SaleAuditLog
-from .services import (
-    compute_sale_totals,
-    apply_sale_stock_movements_on_create,
-    apply_sale_stock_movements_on_edit,
-    build_qty_by_item_from_formset,
-    validate_no_negative_stock
-)
+from .services import create_sale, edit_sale, filter_sales, sale_lines_from_formset
+
+
+ITEM_SEARCH_LIMIT = 10
+
+# The sales list filters a queued export keeps (see filter_sales)
+EXPORT_FILTERS = ("q", "status", "customer", "from", "to", "with_balance")
 
 # Create your views here.
 @login_required
+@replica_reads
 def sales_list(request):
-   
     q = request.GET.get("q", "").strip()
     status = request.GET.get("status", "").strip()
     customer_id = request.GET.get("customer", "").strip()
     date_from = request.GET.get("from", "").strip()
     date_to = request.GET.get("to", "").strip()
-    with_balance = request.GET.get("with_balance", "").strip()  # "1" means only unpaid/partial effectively
+    with_balance = request.GET.get("with_balance", "").strip()  # "1" means total > paid_amount
 
-    sales = Sale.objects.select_related("customer").all()
+    sales = filter_sales(Sale.objects.select_related("customer").all(), request.GET)
 
-    if status:
-        sales = sales.filter(status=status)
-
-    if customer_id:
-        sales = sales.filter(customer_id=customer_id)
-
-    if q:
-        # If q is numeric, allow searching by sale id
-        if q.isdigit():
-            sales = sales.filter(Q(pk=int(q)) | Q(customer__name__icontains=q))
-        else:
-            sales = sales.filter(customer__name__icontains=q)
-
-    # Date range (inclusive)
-    # Expect YYYY-MM-DD from input type="date"
-    try:
-        if date_from:
-            dt = make_aware(datetime.combine(datetime.strptime(date_from, "%Y-%m-%d").date(), time.min))
-            sales = sales.filter(created_at__gte=dt)
-        if date_to:
-            dt = make_aware(datetime.combine(datetime.strptime(date_to, "%Y-%m-%d").date(), time.max))
-            sales = sales.filter(created_at__lte=dt)
-    except ValueError:
-        # If user types invalid date, ignore filters rather than crash
-        pass
-
-    # Optional “with balance” filter: total - paid > 0
-    # We can’t do sale.balance directly in SQL because it’s a property,
-    # so we filter by statuses that imply balance, and we can also compute for display.
-    if with_balance == "1":
-        sales = sales.exclude(status=Sale.Status.PAID)
+    # Keyset pagination on (created_at, id); HTMX asks for the next page as you scroll.
+    sales, next_url = keyset_page(request, sales, ["-created_at", "-id"])
+    if is_htmx(request) and request.GET.get("cursor"):
+        return render(request, "sales/partials/sale_rows.html", {"sales": sales, "next_url": next_url})
 
     customers = Customer.objects.filter(is_active=True).order_by("name")
 
+    # Export links carry the current filters (minus the page cursor)
+    export_params = request.GET.copy()
+    export_params.pop("cursor", None)
+
     return render(request, "sales/list.html", {
         "sales": sales,
+        "next_url": next_url,
+        "can_export": is_manager(request.user),
+        "export_query": export_params.urlencode(),
+        # Posted by the background export form
+        "export_fields": [(key, request.GET[key]) for key in EXPORT_FILTERS if request.GET.get(key)],
         "customers": customers,
         "q": q,
         "status": status,
@@ -87,6 +75,38 @@ def sales_list(request):
     })
 
 
+@login_required
+@replica_reads
+def sales_export(request, kind: str):
+    """
+    Streams sales / sale lines / payments as CSV, filtered with the same
+    query params as sales_list (the list page links here with its filters).
+    """
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can export data.")
+    if kind not in EXPORTS:
+        raise Http404("Unknown export")
+    filename, header, rows = EXPORTS[kind](request.GET)
+    return csv_response(filename, header, rows)
+
+
+@login_required
+@require_POST
+def sales_export_queue(request, kind: str):
+    """
+    Same export as sales_export, written to a file by a background job
+    (core.jobs) instead of streamed; for ranges too big to wait on.
+    """
+    if not is_manager(request.user):
+        raise PermissionDenied("Only Managers can export data.")
+    if kind not in EXPORTS:
+        raise Http404("Unknown export")
+    params = {key: request.POST[key] for key in EXPORT_FILTERS if request.POST.get(key)}
+    job = enqueue("sales.export", {"kind": kind, "params": params}, user=request.user, unique=True)
+    messages.success(request, f"Export queued as job #{job.pk}; download it from here when it's done.")
+    return redirect("job_detail", pk=job.pk)
+
+
 @login_required
 def sale_create(request):
     sale = Sale()
@@ -95,34 +115,23 @@ def sale_create(request):
 
     if request.method == "POST" and form.is_valid() and formset.is_valid():
         try:
-            with transaction.atomic():
-                sale = form.save()
-                formset.instance = sale
-                formset.save()
-                
-                # validate stock before applying movements
-                qty_by_item = build_qty_by_item_from_formset(formset)
-                validate_no_negative_stock(qty_by_item)
-
-                compute_sale_totals(sale)
-                apply_sale_stock_movements_on_create(sale)
+            # One checkout transaction; query count doesn't grow with the number of lines.
+            with CHECKOUT_SECONDS.time(operation="create"):
+                sale = create_sale(form.save(commit=False), sale_lines_from_formset(formset))
 
             messages.success(request, f"Sale #{sale.pk} created.")
             return redirect("sales:detail", pk=sale.pk)
 
+        except InsufficientStock as e:
+            STOCK_REJECTIONS.inc()
+            messages.error(request, str(e))
         except ValueError as e:
             messages.error(request, str(e))
 
-    price_map_json=json.dumps({
-            str(i.id): str(i.sell_price)
-            for i in Item.objects.all().only("id", "sell_price")
-    })
-
     return render(request, "sales/sale_form.html", {
         "mode": "create",
         "form": form,
         "formset": formset,
-        "price_map_json": price_map_json,        
     })
 
 
@@ -145,21 +154,8 @@ def sale_edit(request, pk: int):
 
     if request.method == "POST" and form.is_valid() and formset.is_valid():
         try:
-            with transaction.atomic():
-                sale = form.save()
-                formset.save()
-
-                # Validate stock (your existing no-negative-stock logic)
-                old_qty_by_item = defaultdict(int)
-                for ol in old_lines:
-                    old_qty_by_item[ol["item_id"]] += int(ol["quantity"])
-
-                qty_by_item = build_qty_by_item_from_formset(formset)
-                validate_no_negative_stock(qty_by_item, extra_available_by_item=old_qty_by_item)
-
-                # Totals + stock movements
-                compute_sale_totals(sale)
-                apply_sale_stock_movements_on_edit(sale, old_lines)
+            with CHECKOUT_SECONDS.time(operation="edit"), transaction.atomic():
+                sale = edit_sale(form.save(commit=False), sale_lines_from_formset(formset), old_lines)
 
                 # ✅ Audit log if sale had payments OR if manager edited (we log only when payments exist)
                 if has_payments:
@@ -179,6 +175,9 @@ def sale_edit(request, pk: int):
             messages.success(request, f"Sale #{sale.pk} updated.")
             return redirect("sales:detail", pk=sale.pk)
 
+        except InsufficientStock as e:
+            STOCK_REJECTIONS.inc()
+            messages.error(request, str(e))
         except ValueError as e:
             messages.error(request, str(e))
 
@@ -222,10 +221,10 @@ def payment_create(request, pk: int):
     form = PaymentForm(request.POST or None)
 
     if request.method == "POST" and form.is_valid():
-        p = form.save(commit=False)
-        p.sale = sale
-        p.save()
-        sale.refresh_status(save=True)
+        with transaction.atomic():
+            p = form.save(commit=False)
+            p.sale = sale
+            p.save()  # bumps Sale.paid_amount with an F() update and refreshes the status
         messages.success(request, "Payment added.")
     else:
         messages.error(request, "Payment could not be added.")
@@ -238,63 +237,66 @@ def htmx_sale_item_row(request):
     """
     Returns an extra empty form row for the SaleItem formset.
     Used when clicking “+ Add item” without reloading.
+    ?index= is the current TOTAL_FORMS (the new row's position).
     """
-    # create an unbound formset with 1 extra row, and render only the last row
-    dummy_sale = Sale()
-    formset = SaleItemFormSet(instance=dummy_sale)
-    # last form is the extra one
-    html = render_to_string("sales/partials/sale_item_row.html", {"f": formset.forms[-1]})
+    try:
+        index = max(int(request.GET.get("index", 0)), 0)
+    except ValueError:
+        index = 0
+    # empty_form with the real prefix; an unsaved Sale means no line query at all
+    formset = SaleItemFormSet(instance=Sale())
+    form = formset.empty_form
+    form.prefix = formset.add_prefix(index)
+    html = render_to_string("sales/partials/sale_item_row.html", {"f": form})
     return HttpResponse(html)
 
 
 @login_required
+def htmx_item_search(request):
+    """
+    Typeahead for the sale form's item picker: top matches with price and
+    current stock, so the page never has to ship the whole catalog.
+    """
+    q = request.GET.get("q", "").strip()
+    items = []
+    if q:
+        items = ranked_search(
+            Item.objects.filter(is_active=True)
+            .annotate(stock=Coalesce("stock_balance__quantity", 0))
+            .order_by("name", "id"),
+            q,
+            "inventory_item_fts",
+            ["name", "sku", "brand", "vendor"],
+            limit=ITEM_SEARCH_LIMIT,
+        )
+    return render(request, "sales/partials/item_search_results.html", {"items": items, "q": q})
+
+
+@login_required
+@replica_reads
 def debts_view(request):
     # 1) Sales with debt (UNPAID or PARTIAL)
-    debt_sales = (
-        Sale.objects.select_related("customer")
-        .exclude(status=Sale.Status.PAID)
-        .order_by("-created_at")
-    )
-
-    # 2) Debt totals by customer (spent - paid)
-    # We compute in two queries to avoid join-multiplication.
-    spent_by_customer = dict(
-        Sale.objects.exclude(customer__isnull=True)
-        .values_list("customer_id")
-        .annotate(spent=Sum("total"))
-        .values_list("customer_id", "spent")
+    debt_sales, next_url = keyset_page(
+        request,
+        Sale.objects.select_related("customer").exclude(status=Sale.Status.PAID),
+        ["-created_at", "-id"],
     )
-
-    paid_by_customer = dict(
-        Payment.objects.exclude(sale__customer__isnull=True)
-        .values_list("sale__customer_id")
-        .annotate(paid=Sum("amount"))
-        .values_list("sale__customer_id", "paid")
+    if is_htmx(request) and request.GET.get("cursor"):
+        return render(request, "sales/partials/debt_sale_rows.html", {"debt_sales": debt_sales, "next_url": next_url})
+
+    # 2) Debt totals by customer: incrementally maintained account rows,
+    # so this is an indexed ORDER BY balance instead of two full aggregates.
+    rows = (
+        CustomerAccount.objects.filter(balance__gt=0, customer__is_active=True)
+        .select_related("customer")
+        .order_by("-balance")
     )
 
-    # Build customer debt rows
-    customer_ids = set(spent_by_customer.keys()) | set(paid_by_customer.keys())
-    customers = Customer.objects.filter(id__in=customer_ids, is_active=True)
-
-    rows = []
-    for c in customers:
-        spent = spent_by_customer.get(c.id, Decimal("0.00")) or Decimal("0.00")
-        paid = paid_by_customer.get(c.id, Decimal("0.00")) or Decimal("0.00")
-        balance = spent - paid
-        if balance > 0:
-            rows.append({
-                "customer": c,
-                "spent": spent,
-                "paid": paid,
-                "balance": balance,
-            })
-
-    rows.sort(key=lambda r: r["balance"], reverse=True)
-
-    total_outstanding = sum((r["balance"] for r in rows), Decimal("0.00"))
+    total_outstanding = rows.aggregate(s=Sum("balance"))["s"] or Decimal("0.00")
 
     return render(request, "sales/debts.html", {
         "customer_rows": rows,
         "debt_sales": debt_sales,
+        "next_url": next_url,
         "total_outstanding": total_outstanding,
     })
\ No newline at end of file